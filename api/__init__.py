@@ -15,6 +15,8 @@ Can start from console: uvicorn --host 127.0.0.1 --port 3100 api:app --workers 1
 :type postgresql_cfg: PostgreSQLConfig
 :var postgres_logger_cfg: An instance of PostgreSQLLoggingConfig used for configuring PostgreSQL logging settings
 :type postgres_logger_cfg: PostgreSQLLoggingConfig
+:var postgres_trace_params: Slow query threshold, sample rate and payload length of the query log from postgres_logger_cfg
+:type postgres_trace_params: Dict[str, SecretStr]
 :var postgres_logger: A logger for PostgreSQL interactions, configured using postgres_logger_cfg settings
 :type postgres_logger: logging.Logger
 :var bd: An instance of ClientPotgreSQL with PostgreSQLConfig settings and PostgreSQL logger
@@ -58,8 +60,9 @@ api_logger = get_logger(**api_logger_cfg.dict())
 
 postgresql_cfg = PostgreSQLConfig()
 postgres_logger_cfg = PostgreSQLLoggingConfig()
-postgres_logger = get_logger(**postgres_logger_cfg.dict())
-bd = ClientPostgreSQL(postgresql_cfg.dict(), postgres_logger)
+postgres_trace_params = postgres_logger_cfg.dict(include = {"slow_query_seconds", "sample_rate", "max_payload"})
+postgres_logger = get_logger(**postgres_logger_cfg.dict(exclude = set(postgres_trace_params)))
+bd = ClientPostgreSQL(postgresql_cfg.dict(), postgres_logger, postgres_trace_params)
 
 app = FastAPI()
 app.logger = api_logger
@@ -18,6 +18,7 @@ from .methods.get.taro_types import setup as method_get_taro_types_setup
 #from .methods.get.taro_request import setup as method_get_taro_request_setup
 #from .methods.get.taro_cards import setup as method_get_taro_cards_setup
 from .methods.get.taro_answer import setup as method_get_taro_answer_setup
+from .methods.get.db_stats import setup as method_get_db_stats_setup
 
 app.middleware("http")(log_stuff)
 app.add_middleware(     # Добавляем CORS-мидлвэр для обработки CORS-заголовков
@@ -34,6 +35,7 @@ method_get_taro_types_setup(app)
 #method_get_taro_request_setup(app, bd)
 #method_get_taro_cards_setup(app, bd)
 method_get_taro_answer_setup(app, bd)
+method_get_db_stats_setup(app, bd, api_cfg.stats_token.get_secret_value())
 
 uvicorn.run(
     api_cfg.app.get_secret_value(),
@@ -23,6 +23,8 @@ class ApiConfig(BaseSettings):
     :type allow_methods: SecretStr
     :cvar allow_headers: Allowed headers
     :type allow_headers: SecretStr
+    :cvar stats_token: Token in the X-Stats-Token header required by '/api_taro/get_db_stats', empty allows only local requests (default empty)
+    :type stats_token: SecretStr
     """
 
     class Config:
@@ -48,6 +50,7 @@ class ApiConfig(BaseSettings):
     allow_origins: SecretStr
     allow_methods: SecretStr
     allow_headers: SecretStr
+    stats_token: SecretStr = SecretStr("")
 
 class ApiLoggingConfig(BaseSettings):
     """Represents the API logging configuration.
@@ -112,6 +115,18 @@ class PostgreSQLConfig(BaseSettings):
     :type max_size: SecretStr
     :cvar max_queries: The maximum number of requests that can be made on a single connection before it is returned to the pool
     :type max_queries: SecretStr
+    :cvar replicas: Comma-separated DSNs of read replicas, reads are routed to them (default none)
+    :type replicas: SecretStr
+    :cvar replica_max_lag: Replicas lagging more seconds are skipped, reads within this time after a write go to the primary (default 1)
+    :type replica_max_lag: SecretStr
+    :cvar replica_check_interval: Seconds between checks of the replication lag (default 5)
+    :type replica_check_interval: SecretStr
+    :cvar retry_attempts: Retries of a serialization failure or a lost connection (default 3)
+    :type retry_attempts: SecretStr
+    :cvar breaker_threshold: Connection failures in a row after which queries fail fast (default 5)
+    :type breaker_threshold: SecretStr
+    :cvar breaker_reset_timeout: Seconds queries fail fast before the next try (default 10)
+    :type breaker_reset_timeout: SecretStr
     """
 
     class Config:
@@ -138,6 +153,12 @@ class PostgreSQLConfig(BaseSettings):
     min_size: SecretStr
     max_size: SecretStr
     max_queries: SecretStr
+    replicas: SecretStr = SecretStr("")
+    replica_max_lag: SecretStr = SecretStr("1")
+    replica_check_interval: SecretStr = SecretStr("5")
+    retry_attempts: SecretStr = SecretStr("3")
+    breaker_threshold: SecretStr = SecretStr("5")
+    breaker_reset_timeout: SecretStr = SecretStr("10")
 
 # Конфигурация логирования для PostgreSQL
 class PostgreSQLLoggingConfig(BaseSettings):
@@ -157,6 +178,12 @@ class PostgreSQLLoggingConfig(BaseSettings):
     :type max_bytes: SecretStr
     :cvar backup_count: Maximum number of files
     :type backup_count: SecretStr
+    :cvar slow_query_seconds: Queries slower than this are always logged as warnings, 0 disables (default 0.5)
+    :type slow_query_seconds: SecretStr
+    :cvar sample_rate: Share of other queries logged at DEBUG level, from 0 to 1 (default 1)
+    :type sample_rate: SecretStr
+    :cvar max_payload: Maximum length of the query, arguments and result in a log message (default 1000)
+    :type max_payload: SecretStr
     """
 
     class Config:
@@ -182,5 +209,8 @@ class PostgreSQLLoggingConfig(BaseSettings):
     path: SecretStr
     max_bytes: SecretStr
     backup_count: SecretStr
+    slow_query_seconds: SecretStr = SecretStr("0.5")
+    sample_rate: SecretStr = SecretStr("1")
+    max_payload: SecretStr = SecretStr("1000")
 
 
@@ -0,0 +1,5 @@
+"""
+Module for db_stats request
+"""
+
+from .route import setup
@@ -0,0 +1,74 @@
+"""
+Main functions for '/api_taro/get_db_stats' request
+"""
+
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from hmac import compare_digest
+
+from utils.helper import get_log
+
+from postgresql import ClientPostgreSQL
+
+local_hosts = ("127.0.0.1", "::1", "localhost")
+
+# Функция проверяет доступ к статистике: по токену в заголовке X-Stats-Token или, если токен не задан, только с локального адреса
+
+def is_allowed(request: Request, token: str) -> bool:
+    """
+    Check the request may read the stats of the database.
+
+    :param request: Request from user
+    :type request: Request
+    :param token: Required value of the X-Stats-Token header, empty allows only local requests.
+    :type token: str
+    :return: True if the token matches or, without a token, the request is local.
+    :rtype: bool
+    """
+
+    if token:
+        return compare_digest(request.headers.get("X-Stats-Token", "").encode(), token.encode())
+    return request.client is not None and request.client.host in local_hosts
+
+def get_db_stats(bd: ClientPostgreSQL, token: str = ""):
+    """
+    Route for '/api_taro/get_db_stats' request
+
+    Examination: curl -H "X-Stats-Token: <API_stats_token>" http://127.0.0.1:3100/api_taro/get_db_stats
+
+    :param bd: An instance of the ClientPotgreSQL class representing the PostgreSQL database.
+    :type bd: ClientPostgreSQL
+    :param token: Required value of the X-Stats-Token header, empty allows only local requests.
+    :type token: str
+    """
+
+    async def route(request: Request):
+        """
+        Body of route
+
+        :param request: Request from user
+        :type request: Request
+        """
+
+        response = {}
+
+        if not is_allowed(request = request, token = token):
+            request.app.logger.warning(get_log(s = "?", text = f"Denied stats to {request.client.host if request.client else 'unknown'}"))
+            return JSONResponse(content = {"error": "Forbidden"}, status_code = 403)
+
+        try:
+            response = {"data": bd.get_stats()}
+        except Exception as e:
+            request.app.logger.error(get_log(s = "-", text = e))
+            response = {"error": str(e)}
+
+        return JSONResponse(content=response)
+    return route
+
+def setup(app: FastAPI, bd: ClientPostgreSQL, token: str = ""):
+    """
+    Func for setup get_db_stats route
+    """
+
+    app.add_api_route("/api_taro/get_db_stats", get_db_stats(bd, token), methods=["GET"])
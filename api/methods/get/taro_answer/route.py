@@ -36,6 +36,8 @@ def get_taro_answer(bd: ClientPostgreSQL):
             counter_cards = 0
             id = int(request.path_params['id'])
             item = await get_request_by_id(bd = bd, id = id)
+            if item is None:
+                return JSONResponse(content = {"error": f"Request {id} not found"}, status_code = 404)
 
             data = f"""<h1 class="fade-in">Карты</h1>
             <div class="cards">"""
@@ -74,9 +76,12 @@ def get_taro_answer(bd: ClientPostgreSQL):
             </div>
         """
             response = {"data": data}
+        except ClientPostgreSQL.Unavailable as e:
+            request.app.logger.error(get_log(s = "-", text = e))
+            return JSONResponse(content = {"error": "Database is unavailable"}, status_code = 503)
         except Exception as e:
             request.app.logger.error(get_log(s = "-", text = e))
-            response = {"error": e}
+            response = {"error": str(e)}
 
         return JSONResponse(content=response)
     return route
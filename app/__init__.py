@@ -7,10 +7,16 @@ Module for Telegram-bot
 :type postgresql_cfg: PostgreSQLConfig
 :var postgres_logger_cfg: An instance of PostgreSQLLoggingConfig used for configuring PostgreSQL logging settings
 :type postgres_logger_cfg: PostgreSQLLoggingConfig
+:var postgres_trace_params: Slow query threshold, sample rate and payload length of the query log from postgres_logger_cfg
+:type postgres_trace_params: Dict[str, SecretStr]
 :var postgres_logger: A logger for PostgreSQL interactions, configured using postgres_logger_cfg settings
 :type postgres_logger: logging.Logger
 :var bd: An instance of ClientPotgreSQL with PostgreSQLConfig settings and PostgreSQL logger
 :type bd: ClientPotgreSQL
+:var cache_cfg: Settings from CacheConfig (sizes and time to live of the in-process caches)
+:type cache_cfg: CacheConfig
+:var users_writes: Write-behind buffer of updates of users or None if it's disabled
+:type users_writes: Optional[WriteBehind]
 :var telegram_cfg: An instance of TelegramConfig used for configuring Telegram settings
 :type telegram_cfg: TelegramConfig
 :var telegram_logger_cfg: An instance of TelegramLoggingConfig used for configuring Telegram logging settings
@@ -25,6 +31,14 @@ Module for Telegram-bot
 :type proxy_cfg: ProxyConfig
 :var openai_cfg: Settings from OpenAIConfig
 :type openai_cfg: OpenAIConfig
+:var llm_settings: Settings of OpenAI requests resolved once from proxy_cfg and openai_cfg
+:type llm_settings: LLMSettings
+:var llm: Pooled HTTP session for OpenAI requests through the proxy, shared by all handlers
+:type llm: LLMClient
+:var llm_scheduler: Bounded priority queue of readings requesting OpenAI
+:type llm_scheduler: LLMScheduler
+:var llm_speculation: Acceptance rate of check_quest and cost of speculative readings by spread size
+:type llm_speculation: SpeculationStats
 """
 
 from custom_classes import Bot_
@@ -35,13 +49,22 @@ from .core.config import TelegramLoggingConfig
 from .core.config import TelegramConfig
 from .core.config import PostgreSQLLoggingConfig
 from .core.config import PostgreSQLConfig
+from .core.config import CacheConfig
 from .core.config import ProxyConfig
 from .core.config import OpenAIConfig
+from .core.config import LLMSettings
 from .core.logger import get_logger
 from postgresql import ClientPostgreSQL
+from postgresql import MigrationRunner
 from utils.helper import get_log
-from .utils.templates.users import table_users
-from .utils.templates.requests import table_requests
+from .utils.templates.migrations import migrations
+from .utils.postgresql.users import cache as users_cache
+from .utils.postgresql.users import channel as users_channel
+from .utils.postgresql.users import on_user_changed
+from .utils.postgresql.users import setup_write_behind
+from .utils.llm import LLMClient
+from .utils.llm import SpeculationStats
+from .utils.scheduler import LLMScheduler
 
 async def set_default_commands(dp: Dispatcher):
     """
@@ -60,15 +83,20 @@ async def set_default_commands(dp: Dispatcher):
 
 async def start_bd(bd_var: ClientPostgreSQL):
     """
-    Asynchronously starts the PostgreSQL database connection and performs initial setup
+    Asynchronously starts the PostgreSQL database connection, applies pending migrations of the schema
+    and subscribes the users cache to changes of users made by other processes, starts the write-behind buffer of users
 
     :param bd_var: An instance of the ClientPotgreSQL class representing the PostgreSQL database.
     :type bd_var: ClientPostgreSQL    
+
+    :raises ClientPostgreSQL.Error: If a migration failed (the schema may be half-migrated, so startup is aborted).
     """
 
     await bd_var.create_pool()
-    await bd_var.check_table(**table_users())
-    await bd_var.check_table(**table_requests())
+    if await MigrationRunner(bd_var, migrations()).run() is None:
+        raise ClientPostgreSQL.Error("Migrations of the schema failed, the bot isn't started")
+    await bd_var.listen(users_channel, on_user_changed)
+    users_writes.start() if users_writes else None
 
 async def on_startup(dp: Dispatcher):
     """
@@ -79,6 +107,7 @@ async def on_startup(dp: Dispatcher):
     """
 
     await start_bd(bd_var = bd)
+    await llm.start()
     await bot.set_webhook(telegram_cfg.webhook_url.get_secret_value()) # Comment this line for polling !!!
     await set_default_commands(dp)
     logger.info(get_log('=', "<-START->"))
@@ -91,15 +120,23 @@ async def on_shutdown(dp: Dispatcher):
     :type dp: Dispatcher
     """
 
+    await users_writes.stop() if users_writes else None
     await bd.close_pool()
     await dp.bot.close_tasks()
+    await llm.close() # После завершения задач обработчиков, которые используют общую сессию
     await bot.delete_webhook() # Comment this line for polling !!!
     logger.info(get_log('=', "<-STOP->"))
 
 postgresql_cfg = PostgreSQLConfig()
 postgres_logger_cfg = PostgreSQLLoggingConfig()
-postgres_logger = get_logger(**postgres_logger_cfg.dict())
-bd = ClientPostgreSQL(postgresql_cfg.dict(), postgres_logger)
+postgres_trace_params = postgres_logger_cfg.dict(include = {"slow_query_seconds", "sample_rate", "max_payload"})
+postgres_logger = get_logger(**postgres_logger_cfg.dict(exclude = set(postgres_trace_params)))
+bd = ClientPostgreSQL(postgresql_cfg.dict(), postgres_logger, postgres_trace_params)
+
+cache_cfg = CacheConfig()
+users_cache.max_size = int(cache_cfg.users_max_size.get_secret_value())
+users_cache.ttl = float(cache_cfg.users_ttl.get_secret_value())
+users_writes = setup_write_behind(bd, float(cache_cfg.users_write_interval.get_secret_value()))
 
 telegram_cfg = TelegramConfig()
 telegram_logger_cfg = TelegramLoggingConfig()
@@ -109,6 +146,19 @@ dp = Dispatcher(bot) # Диспетчер
 
 proxy_cfg = ProxyConfig()
 openai_cfg = OpenAIConfig()
+llm_settings = LLMSettings.from_configs(proxy_cfg = proxy_cfg, openai_cfg = openai_cfg)
+llm = LLMClient(
+    proxy_url = llm_settings.proxy_url,
+    limit = llm_settings.http_limit,
+    keepalive_timeout = llm_settings.http_keepalive,
+    dns_ttl = llm_settings.http_dns_ttl
+)
+llm_scheduler = LLMScheduler(
+    concurrency = llm_settings.concurrency,
+    max_queue = llm_settings.queue_size,
+    notify_depth = llm_settings.queue_notify
+)
+llm_speculation = SpeculationStats()
 
 
 
@@ -15,13 +15,17 @@ from . import telegram_cfg
 
 from app.handlers.commands.start import setup as handler_command_start_setup
 from app.handlers.commands.help import setup as handler_command_help_setup
+from app.handlers.commands.stats import setup as handler_command_stats_setup
 from app.handlers.messages.text import setup as handler_messages_text_setup
 from app.handlers.messages.web_app_data import setup as handler_messages_web_app_data 
+from app.handlers.errors.database import setup as handler_errors_database_setup
 
 handler_command_start_setup(dp)
 handler_command_help_setup(dp)
+handler_command_stats_setup(dp)
 handler_messages_text_setup(dp)
 handler_messages_web_app_data(dp)
+handler_errors_database_setup(dp)
 
 start_webhook(
 	dispatcher=dp,
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 
 """
-Telegram, PostgreSQL, Proxy, OpenAI and their Loggers Configuration Classes
+Telegram, PostgreSQL, Cache, Proxy, OpenAI and their Loggers Configuration Classes, runtime settings of OpenAI requests
 """
 
-from pydantic import BaseSettings, SecretStr
+from pydantic import BaseModel, BaseSettings, SecretStr, Field, validator
+
+from typing import Tuple
+
+from ..utils.llm import reading_mode_two_step
+from ..utils.llm import reading_mode_single
 
 # Конфигурация Telegram бота
 class TelegramConfig(BaseSettings):
@@ -111,6 +116,18 @@ class PostgreSQLConfig(BaseSettings):
     :type max_size: SecretStr
     :cvar max_queries: The maximum number of requests that can be made on a single connection before it is returned to the pool
     :type max_queries: SecretStr
+    :cvar replicas: Comma-separated DSNs of read replicas, reads are routed to them (default none)
+    :type replicas: SecretStr
+    :cvar replica_max_lag: Replicas lagging more seconds are skipped, reads within this time after a write go to the primary (default 1)
+    :type replica_max_lag: SecretStr
+    :cvar replica_check_interval: Seconds between checks of the replication lag (default 5)
+    :type replica_check_interval: SecretStr
+    :cvar retry_attempts: Retries of a serialization failure or a lost connection (default 3)
+    :type retry_attempts: SecretStr
+    :cvar breaker_threshold: Connection failures in a row after which queries fail fast (default 5)
+    :type breaker_threshold: SecretStr
+    :cvar breaker_reset_timeout: Seconds queries fail fast before the next try (default 10)
+    :type breaker_reset_timeout: SecretStr
     """
 
     class Config:
@@ -137,6 +154,12 @@ class PostgreSQLConfig(BaseSettings):
     min_size: SecretStr
     max_size: SecretStr
     max_queries: SecretStr
+    replicas: SecretStr = SecretStr("")
+    replica_max_lag: SecretStr = SecretStr("1")
+    replica_check_interval: SecretStr = SecretStr("5")
+    retry_attempts: SecretStr = SecretStr("3")
+    breaker_threshold: SecretStr = SecretStr("5")
+    breaker_reset_timeout: SecretStr = SecretStr("10")
 
 # Конфигурация логирования для PostgreSQL
 class PostgreSQLLoggingConfig(BaseSettings):
@@ -156,6 +179,12 @@ class PostgreSQLLoggingConfig(BaseSettings):
     :type max_bytes: SecretStr
     :cvar backup_count: Maximum number of files
     :type backup_count: SecretStr
+    :cvar slow_query_seconds: Queries slower than this are always logged as warnings, 0 disables (default 0.5)
+    :type slow_query_seconds: SecretStr
+    :cvar sample_rate: Share of other queries logged at DEBUG level, from 0 to 1 (default 1)
+    :type sample_rate: SecretStr
+    :cvar max_payload: Maximum length of the query, arguments and result in a log message (default 1000)
+    :type max_payload: SecretStr
     """
 
     class Config:
@@ -181,6 +210,41 @@ class PostgreSQLLoggingConfig(BaseSettings):
     path: SecretStr
     max_bytes: SecretStr
     backup_count: SecretStr
+    slow_query_seconds: SecretStr = SecretStr("0.5")
+    sample_rate: SecretStr = SecretStr("1")
+    max_payload: SecretStr = SecretStr("1000")
+
+# Конфигурация кэшей в памяти процесса
+class CacheConfig(BaseSettings):
+    """Represents the in-process caches configuration.
+
+    :cvar users_max_size: Maximum number of cached rows of users, 0 disables the cache (default 10000)
+    :type users_max_size: SecretStr
+    :cvar users_ttl: Seconds a cached row of a user is used (default 30)
+    :type users_ttl: SecretStr
+    :cvar users_write_interval: Seconds updates of username and state of users are buffered and merged before one batched write, 0 writes them at once (default 0.5)
+    :type users_write_interval: SecretStr
+    """
+
+    class Config:
+        """
+        Represents parameters for reading configuration
+
+        :cvar env_prefix: Parameter prefix in the file
+        :type env_prefix: str
+        :cvar env_file: Configuration file name
+        :type env_file: str
+        :cvar env_file_encoding: Configuration file encoding
+        :type env_file_encoding: str
+        """
+
+        env_prefix = "CACHE_"
+        env_file = '.env'
+        env_file_encoding = 'utf-8'
+
+    users_max_size: SecretStr = SecretStr("10000")
+    users_ttl: SecretStr = SecretStr("30")
+    users_write_interval: SecretStr = SecretStr("0.5")
 
 # Конфигурация прокси
 class ProxyConfig(BaseSettings):
@@ -228,6 +292,26 @@ class OpenAIConfig(BaseSettings):
     :type api_token: SecretStr
     :cvar model: GPT model
     :type model: SecretStr
+    :cvar check_model: GPT model checking the request, empty uses model (default empty)
+    :type check_model: SecretStr
+    :cvar reading_mode: 'two_step' checks the request and then makes the reading, 'single' does both with one structured request and falls back to 'two_step' on a malformed response (default two_step)
+    :type reading_mode: SecretStr
+    :cvar speculative_sizes: Comma-separated spread sizes for which analyze_cards runs together with check_quest in the two-step mode and is cancelled if the request is rejected (default none)
+    :type speculative_sizes: SecretStr
+    :cvar request_timeout: Seconds to wait for a response of OpenAI (default 600)
+    :type request_timeout: SecretStr
+    :cvar http_limit: Maximum number of simultaneous connections to OpenAI through the proxy (default 20)
+    :type http_limit: SecretStr
+    :cvar http_keepalive: Seconds an idle connection to OpenAI is kept open for the next request (default 60)
+    :type http_keepalive: SecretStr
+    :cvar http_dns_ttl: Seconds the resolved address of the proxy is cached (default 300)
+    :type http_dns_ttl: SecretStr
+    :cvar concurrency: Maximum number of OpenAI requests at once (a speculative reading takes two), the other readings wait in the queue (default 4)
+    :type concurrency: SecretStr
+    :cvar queue_size: Maximum number of readings waiting in the queue, the next ones are rejected (default 100)
+    :type queue_size: SecretStr
+    :cvar queue_notify: Position in the queue from which the user is told about it (default 1)
+    :type queue_notify: SecretStr
     """
 
     class Config:
@@ -248,9 +332,126 @@ class OpenAIConfig(BaseSettings):
 
     api_token: SecretStr
     model: SecretStr
+    check_model: SecretStr = SecretStr("")
+    reading_mode: SecretStr = SecretStr("two_step")
+    speculative_sizes: SecretStr = SecretStr("")
+    request_timeout: SecretStr = SecretStr("600")
+    http_limit: SecretStr = SecretStr("20")
+    http_keepalive: SecretStr = SecretStr("60")
+    http_dns_ttl: SecretStr = SecretStr("300")
+    concurrency: SecretStr = SecretStr("4")
+    queue_size: SecretStr = SecretStr("100")
+    queue_notify: SecretStr = SecretStr("1")
+
+
+
+
+
+
+
+
+# Настройки запросов к OpenAI, разобранные один раз при запуске
+class LLMSettings(BaseModel):
+    """Represents the resolved settings of OpenAI requests (immutable, shared by all handlers).
+
+    :cvar proxy_url: URL of the SOCKS proxy with its password (hidden from repr)
+    :type proxy_url: str
+    :cvar api_key: OpenAI API key
+    :type api_key: SecretStr
+    :cvar model: GPT model of the reading
+    :type model: str
+    :cvar check_model: GPT model checking the request
+    :type check_model: str
+    :cvar reading_mode: 'two_step' or 'single'
+    :type reading_mode: str
+    :cvar speculative_sizes: Spread sizes with speculative readings
+    :type speculative_sizes: Tuple[int, ...]
+    :cvar request_timeout: Seconds to wait for a response
+    :type request_timeout: float
+    :cvar http_limit: Maximum number of simultaneous connections
+    :type http_limit: int
+    :cvar http_keepalive: Seconds an idle connection is kept open
+    :type http_keepalive: float
+    :cvar http_dns_ttl: Seconds the resolved address of the proxy is cached
+    :type http_dns_ttl: int
+    :cvar concurrency: Maximum number of OpenAI requests at once
+    :type concurrency: int
+    :cvar queue_size: Maximum number of readings waiting in the queue
+    :type queue_size: int
+    :cvar queue_notify: Position in the queue from which the user is told about it
+    :type queue_notify: int
+    """
+
+    class Config:
+        """
+        Represents parameters of the model
 
+        :cvar frozen: Fields can't be changed
+        :type frozen: bool
+        """
 
+        frozen = True
+
+    proxy_url: str = Field(repr = False)
+    api_key: SecretStr
+    model: str
+    check_model: str
+    reading_mode: str
+    speculative_sizes: Tuple[int, ...]
+    request_timeout: float
+    http_limit: int
+    http_keepalive: float
+    http_dns_ttl: int
+    concurrency: int
+    queue_size: int
+    queue_notify: int
+
+    # Проверка режима расклада
+    @validator("reading_mode")
+    def check_reading_mode(cls, value: str) -> str:
+        """
+        Reject an unknown reading mode instead of falling back to the two-step one.
 
+        :param value: Reading mode.
+        :type value: str
+        :return: Reading mode.
+        :rtype: str
 
+        :raises ValueError: If the mode is not 'two_step' or 'single'.
+        """
 
+        if value not in (reading_mode_two_step, reading_mode_single):
+            raise ValueError(f"Unknown reading mode {value!r}, expected {reading_mode_two_step!r} or {reading_mode_single!r}")
+        return value
+
+    # Разбор настроек прокси и OpenAI
+    @classmethod
+    def from_configs(cls, proxy_cfg: ProxyConfig, openai_cfg: OpenAIConfig) -> 'LLMSettings':
+        """
+        Unwrap the secrets and build the proxy URL once.
+
+        :param proxy_cfg: Settings from ProxyConfig.
+        :type proxy_cfg: ProxyConfig
+        :param openai_cfg: Settings from OpenAIConfig.
+        :type openai_cfg: OpenAIConfig
+        :return: Resolved settings.
+        :rtype: LLMSettings
+        """
 
+        proxy = {key: value.get_secret_value() for key, value in proxy_cfg}
+        openai = {key: value.get_secret_value() for key, value in openai_cfg}
+        return cls(
+            proxy_url = f"{proxy['socks']}://{proxy['user']}:{proxy['password']}@{proxy['host']}:{proxy['port']}",
+            api_key = openai["api_token"],
+            model = openai["model"],
+            check_model = openai["check_model"] or openai["model"],
+            reading_mode = openai["reading_mode"].strip().lower(),
+            speculative_sizes = tuple(int(size) for size in openai["speculative_sizes"].split(",") if size.strip()),
+            request_timeout = openai["request_timeout"],
+            http_limit = openai["http_limit"],
+            http_keepalive = openai["http_keepalive"],
+            http_dns_ttl = openai["http_dns_ttl"],
+            concurrency = openai["concurrency"],
+            queue_size = openai["queue_size"],
+            queue_notify = openai["queue_notify"]
+        )
\ No newline at end of file
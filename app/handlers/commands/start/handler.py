@@ -13,16 +13,14 @@ from asyncio.exceptions import CancelledError
 
 from utils.helper import get_log_with_id
 from utils.helper import isInt
-from app.utils.postgresql.users import get_user_by_id
+from app.utils.postgresql.users import load_user_context
 from app.utils.postgresql.users import set_user
-from app.utils.postgresql.users import isAccess
-from app.utils.postgresql.users import isAdmin
 from app.utils.postgresql.users import update_user
-from app.utils.postgresql.users import isState
-from app.utils.postgresql.users import update_state
 from app.utils.templates.users import json_user
 from app.utils.handlers.shared_messages import send_error_message
 from app.utils.handlers.shared_messages import send_block_message
+from app.utils.handlers.shared_messages import send_unavailable_message
+from postgresql import ClientPostgreSQL
 from .messages import send_cmd_start_message
 
 async def cmd_start(message: Message, dp: Dispatcher, bot_name: Optional[str] = None):
@@ -37,6 +35,9 @@ async def cmd_start(message: Message, dp: Dispatcher, bot_name: Optional[str] =
 	:param bot_name: Optional parameter representing the bot's name.
 	:type bot_name: Optional[str]
 
+	The response is sent only after the changes of the user are committed, if the database is unavailable
+	the user gets the unavailable message instead of the error one.
+
 	:raises CancelledError: If the coroutine is cancelled.
 	:raises Exception: If an unexpected error occurs during command processing.
 	"""
@@ -53,34 +54,42 @@ async def cmd_start(message: Message, dp: Dispatcher, bot_name: Optional[str] =
 		logger.info(get_log_with_id(id = id, s = '=', text = "Pressed '/start'"))
 
 		try:
-			user = await get_user_by_id(bd = bd, id = id)
-
-			if not user:
-				user = json_user()
-				user["id"] = id
-				user["username"] = username
-
-				await set_user(bd = bd, item = user)
-				logger.info(get_log_with_id(id = id, s = '+', text = "Append new user"))
-			else:
-				if await isAccess(bd = bd, id = id):
-					await update_user(
-						bd = bd,
-						update_values = {
-							"username": username
-						},
-						id = id
-					)
-					await update_state(bd = bd, id = id, value = "main")
-					logger.info(get_log_with_id(id = id, s = '+', text = "Info about user updated"))
-
-			if await isAccess(bd = bd, id = id):
+			async with bd.unit_of_work():
+				user = await load_user_context(bd = bd, id = id)
+
+				if not user:
+					item = json_user()
+					item["id"] = id
+					item["username"] = username
+
+					await set_user(bd = bd, item = item)
+					access = item["access"]
+					logger.info(get_log_with_id(id = id, s = '+', text = "Append new user"))
+				else:
+					access = user.access
+					if access:
+						await update_user(
+							bd = bd,
+							update_values = {
+								"username": username,
+								"state": "main",
+								"state_param": None
+							},
+							id = id
+						)
+						logger.info(get_log_with_id(id = id, s = '+', text = "Info about user updated"))
+
+			# Ответ отправляется только после фиксации изменений пользователя
+			if access:
 				await send_cmd_start_message(bot = bot, message = message)
 			else:
 				await send_block_message(bot = bot, message = message)
 				logger.warning(get_log_with_id(id = id, s = '?', text = "Detected user without ACCESS"))
 		except CancelledError:
 			pass
+		except ClientPostgreSQL.Unavailable as e:
+			await send_unavailable_message(bot = bot, message = message)
+			logger.error(get_log_with_id(id = id, s = '-', text = f"Error: {e}"))
 		except Exception as e:
 			await send_error_message(bot = bot, message = message, e = e)
 			logger.error(get_log_with_id(id = id, s = '-', text = f"Error: {e}"))
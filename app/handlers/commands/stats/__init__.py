@@ -0,0 +1,5 @@
+"""
+Module for '/stats'
+"""
+
+from .handler import setup
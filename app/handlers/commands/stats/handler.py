@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+Handler for '/stats'
+"""
+
+from typing import Optional
+
+from aiogram import types
+from aiogram.types import Message
+from aiogram.dispatcher import Dispatcher
+from asyncio.exceptions import CancelledError
+
+from .messages import send_cmd_stats_message
+from app.utils.postgresql.users import isAdmin
+from app.utils.postgresql.users import cache as users_cache
+from app.utils.postgresql import users
+from app.utils.handlers.shared_messages import send_error_message
+from app.utils.handlers.shared_messages import send_block_message
+from utils.helper import get_log_with_id
+
+async def cmd_stats(message: Message, dp: Dispatcher, bot_name: Optional[str] = None):
+	"""
+	This function is a coroutine that processes the '/stats' command. It checks if the user is an admin
+	and sends the stats of the database client, the users cache, the queue of OpenAI requests and the outcomes of readings.
+
+	:param message: The incoming message that triggered the command.
+	:type message: Message
+	:param dp: The Dispatcher instance for handling updates.
+	:type dp: Dispatcher
+	:param bot_name: Optional parameter representing the bot's name.
+	:type bot_name: Optional[str]
+
+	:raises CancelledError: If the coroutine is cancelled.
+	:raises Exception: If an unexpected error occurs during command processing.
+	"""
+
+	@dp.async_task
+	async def handler():
+		from app import logger
+		from app import bd
+		from app import bot
+		from app import llm_scheduler
+		from app import llm_speculation
+
+		id = message.from_user.id
+		if await isAdmin(bd = bd, id = id):
+			logger.info(get_log_with_id(id = id, s = '=', text = "Pressed '/stats'"))
+			try:
+				await send_cmd_stats_message(bot = bot, message = message, stats = bd.get_stats(), users_cache = users_cache.to_dict(), users_writes = users.writes.to_dict() if users.writes else None, llm_queue = llm_scheduler.to_dict(), llm_readings = llm_speculation.to_dict())
+			except CancelledError:
+				pass
+			except Exception as e:
+				await send_error_message(bot = bot, message = message, e = e)
+				logger.error(get_log_with_id(id = id, s = '-', text = e))
+		else:
+			await send_block_message(bot = bot, message = message)
+
+	await handler()
+
+def setup(dp: Dispatcher, bot_name: Optional[str] = None):
+	"""
+	This function registers a message handler for the '/stats' command using the provided Dispatcher instance.
+
+	:param dp: The Dispatcher instance for handling updates.
+	:type dp: Dispatcher
+	:param bot_name: Optional parameter representing the bot's name.
+	:type bot_name: Optional[str]
+	"""
+
+	dp.register_message_handler(lambda message: cmd_stats(message, dp, bot_name), commands=['stats'])
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+Messages for '/stats'
+"""
+
+from typing import Dict
+from typing import Any
+from typing import Optional
+
+from aiogram import types
+from aiogram.types import Message
+from aiogram.utils.markdown import quote_html
+
+from custom_classes import Bot_
+
+async def send_cmd_stats_message(bot: Bot_, message: Message, stats: Dict[str, Any], users_cache: Dict[str, Any], users_writes: Optional[Dict[str, Any]] = None, llm_queue: Optional[Dict[str, Any]] = None, llm_readings: Optional[Dict[int, Dict[str, Any]]] = None) -> None:
+	"""
+	Sends the database stats (pool, acquire wait, slowest queries, errors), the users cache metrics, the queue of OpenAI requests and the outcomes of readings to an admin.
+
+	:param bot: The bot instance.
+	:type bot: Bot\_
+	:param message: The original message.
+	:type message: Message
+	:param stats: Stats from ClientPostgreSQL.get_stats().
+	:type stats: Dict[str, Any]
+	:param users_cache: Metrics from TTLCache.to_dict() of the users cache.
+	:type users_cache: Dict[str, Any]
+	:param users_writes: Counters from WriteBehind.to_dict() of the users or None if it's disabled.
+	:type users_writes: Optional[Dict[str, Any]]
+	:param llm_queue: Metrics from LLMScheduler.to_dict() or None.
+	:type llm_queue: Optional[Dict[str, Any]]
+	:param llm_readings: Outcomes of readings by spread size from SpeculationStats.to_dict() or None.
+	:type llm_readings: Optional[Dict[int, Dict[str, Any]]]
+	"""
+
+	pool = stats["pool"]
+	acquire_wait = stats["acquire_wait"]
+	cache = stats["cache"]
+	writes = f"{users_writes['updates']} обновлений ({users_writes['merged']} слито) → {users_writes['rows']} строк за {users_writes['flushes']} записей, ждут {users_writes['pending']}, ошибок {users_writes['failures']}" if users_writes else "выключена"
+	queue = f"{llm_queue['running']}/{llm_queue['concurrency']} слотов занято, ждут {llm_queue['depth']} (max {llm_queue['max_depth']}), ожидание avg {llm_queue['wait']['avg']:.1f} s, max {llm_queue['wait']['max']:.1f} s, отклонено {llm_queue['rejected']}" if llm_queue else "нет данных"
+	readings = ", ".join(f"{size} карт: принято {value['acceptance_rate'] * 100:.0f}% из {value['readings']}, спекулятивно {value['speculative']} (отменено {value['cancelled']}, впустую {value['wasted_tokens']} токенов)" for size, value in (llm_readings or {}).items()) or "нет"
+	queries = sorted(stats["queries"].items(), key = lambda item: item[1]["latency"]["avg"], reverse = True)[:5]
+
+	text = f"""<b>📊 PostgreSQL</b>
+
+<b>Пул:</b> {pool.get("in_use", 0)} занято / {pool.get("idle", 0)} свободно (min {pool.get("min_size", 0)}, max {pool.get("max_size", 0)})
+<b>Реплики:</b> {", ".join(f"#{replica['index']} {'✅' if replica['healthy'] else '❌'} lag {replica['lag'] or 0:.1f} s" for replica in stats["replicas"]) or "нет"}
+<b>Ожидание соединения:</b> avg {acquire_wait["avg"] * 1000:.2f} ms, max {acquire_wait["max"] * 1000:.2f} ms ({acquire_wait["count"]})
+<b>Кэш запросов:</b> {cache["query_hits"]} hit / {cache["query_misses"]} miss
+<b>Кэш пользователей:</b> {users_cache["size"]}/{users_cache["max_size"]}, hit rate {users_cache["hit_rate"] * 100:.1f}% ({users_cache["hits"]} hit / {users_cache["misses"]} miss, вытеснено {users_cache["evictions"]})
+<b>Отложенная запись пользователей:</b> {writes}
+<b>Очередь OpenAI:</b> {queue}
+<b>Расклады:</b> {readings}
+<b>Ошибки:</b> {", ".join(f"{key}: {value}" for key, value in stats["errors"].items()) or "нет"}
+<b>Повторы:</b> {", ".join(f"{key}: {value}" for key, value in stats["retries"].items()) or "нет"}, предохранитель: {stats["breaker"]["state"]} (отклонено {stats["breaker"]["rejected"]})
+
+<b>Самые медленные запросы:</b>
+"""
+	for query, value in queries:
+		text += f"""{value["latency"]["avg"] * 1000:.2f} ms ({value["latency"]["count"]}): <code>{quote_html(query[:200])}</code>
+"""
+
+	await bot.send_message(message.from_user.id, text = text, parse_mode = types.ParseMode.HTML)
@@ -0,0 +1,3 @@
+"""
+Module for errors raised by handlers
+"""
@@ -0,0 +1,5 @@
+"""
+Module for database unavailability
+"""
+
+from .handler import setup
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Handler for ClientPostgreSQL.Unavailable raised by other handlers
+"""
+
+from typing import Optional
+
+from aiogram import types
+from aiogram.dispatcher import Dispatcher
+
+from postgresql import ClientPostgreSQL
+from utils.helper import get_log
+from utils.helper import get_log_with_id
+from app.utils.handlers.shared_messages import send_unavailable_message
+
+async def database_unavailable(update: types.Update, exception: ClientPostgreSQL.Unavailable) -> bool:
+	"""
+	This function is a coroutine that answers the user when the database was unavailable
+	(e.g. isAccess couldn't check the access), instead of treating the user as blocked.
+
+	:param update: The update that was being processed (a message or a callback query).
+	:type update: types.Update
+	:param exception: The raised exception.
+	:type exception: ClientPostgreSQL.Unavailable
+	:return: True, the error is handled.
+	:rtype: bool
+	"""
+
+	from app import logger
+	from app import bot
+
+	message = update.message or update.callback_query
+	if message is None:
+		logger.error(get_log(s = '-', text = exception))
+		return True
+
+	id = message.from_user.id
+	logger.error(get_log_with_id(id = id, s = '-', text = exception))
+	await send_unavailable_message(bot = bot, message = message)
+	return True
+
+def setup(dp: Dispatcher, bot_name: Optional[str] = None):
+	"""
+	This function registers an errors handler for ClientPostgreSQL.Unavailable using the provided Dispatcher instance.
+
+	:param dp: The Dispatcher instance for handling updates.
+	:type dp: Dispatcher
+	:param bot_name: Optional parameter representing the bot's name.
+	:type bot_name: Optional[str]
+	"""
+
+	dp.register_errors_handler(database_unavailable, exception = ClientPostgreSQL.Unavailable)
@@ -5,40 +5,96 @@ Handler for text
 """
 
 from typing import Optional
+from typing import List
+from typing import Dict
+from typing import Tuple
 
 from aiogram import types
 from aiogram.types import Message
 from aiogram.dispatcher import Dispatcher
 import openai
-from aiohttp import ClientSession
-from aiohttp import TCPConnector
-from aiohttp_socks import ProxyConnector
 from json import dumps
 import random
 import requests
 from asyncio.exceptions import CancelledError
+import asyncio
 
 from . import analyze_cards
 #from . import analyze_prompt
 from . import check_quest
+from . import analyze_reading
 #from .messages import send_taro_message
 #from .messages import send_cards_message
 from .messages import send_bad_request_message
 from .messages import send_show_message
+from .messages import send_queue_message
+from .messages import send_busy_message
 
-from app.utils.postgresql.users import isAccess
-from app.utils.postgresql.users import isState
-from app.utils.postgresql.users import isAdmin
-from app.utils.postgresql.users import inState
-from app.utils.postgresql.users import get_state
-from app.utils.postgresql.users import update_state
+from app.utils.postgresql.users import load_user_context
+from app.utils.postgresql.users import get_spread_size
 from app.utils.postgresql.requests import set_request
+from app.utils.postgresql.user_stats import get_user_stats
+from app.utils.scheduler import LLMScheduler
+from app.utils.scheduler import priority_admin
+from app.utils.scheduler import priority_returning
+from app.utils.scheduler import priority_new
+from app.utils.llm import reading_mode_single
+from app.utils.llm import parse_reading
+from app.utils.llm import estimate_tokens
+from app.utils.llm import discard_reading
+from postgresql import ClientPostgreSQL
 
 from utils.helper import get_log_with_id
 from utils.file import get_json_data
 from utils.file import write_json_data
 from app.utils.handlers.shared_messages import send_block_message
 from app.utils.handlers.shared_messages import send_error_message
+from app.utils.handlers.shared_messages import send_unavailable_message
+
+async def request_chat(id: int, name: str, model: str, messages: List[Dict[str, str]]) -> Tuple[str, int]:
+	"""
+	Sends a chat request to OpenAI through the shared session, logs OpenAI errors and raises them with the model and the name of the request.
+
+	:param id: The user's ID for logs.
+	:type id: int
+	:param name: Name of the request for errors (e.g. 'check_quest').
+	:type name: str
+	:param model: GPT model.
+	:type model: str
+	:param messages: Messages of the chat.
+	:type messages: List[Dict[str, str]]
+	:return: Content of the response and its total tokens.
+	:rtype: Tuple[str, int]
+
+	:raises Exception: If the request failed.
+	"""
+
+	from app import logger
+	from app import llm
+	from app import llm_settings
+
+	try:
+		return await llm.complete(
+			model=model,
+			messages=messages,
+			request_timeout=llm_settings.request_timeout,
+			api_key=llm_settings.api_key.get_secret_value()
+		)
+	except openai.error.Timeout as e:
+		logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком долго сервер не отвечает -> {e}"))
+		raise Exception(f"{model} {name} ({e})")
+	except openai.error.InvalidRequestError as e:
+		logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком много токенов -> {e}"))
+		raise Exception(f"{model} {name} ({e})")
+	except openai.error.RateLimitError as e:
+		logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком частые сообщения -> {e}"))
+		raise Exception(f"{model} {name} ({e})")
+	except openai.error.APIError as e:
+		logger.warning(get_log_with_id(id = id, s = '-', text = f"Ошибка сервера -> {e}"))
+		raise Exception(f"{model} {name} ({e})")
+	except Exception as e:
+		logger.warning(get_log_with_id(id = id, s = '-', text = f"Неизвестная ошибка -> {e}"))
+		raise Exception(f"{model} {name} ({e})")
 
 async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional[str] = None):
 	"""
@@ -60,32 +116,24 @@ async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional
 		from app import logger
 		from app import bd
 		from app import bot
-		from app import proxy_cfg
-		from app import openai_cfg
+		from app import llm_settings
+		from app import llm_scheduler
+		from app import llm_speculation
 
 		id = message.from_user.id
 		text = message.text
 		action = None
 		action_message_id = message.message_id
 
-		proxy_cfg = proxy_cfg.dict()
-		openai_cfg = openai_cfg.dict()
+		api_key = llm_settings.api_key.get_secret_value()
+		model_gpt = llm_settings.model
 
-		for x in proxy_cfg.keys():
-			proxy_cfg[x] = proxy_cfg[x].get_secret_value()
+		user = await load_user_context(bd = bd, id = id)
 
-		proxy_url = f"{proxy_cfg['socks']}://{proxy_cfg['user']}:{proxy_cfg['password']}@{proxy_cfg['host']}:{proxy_cfg['port']}"
-		api_key = openai_cfg["api_token"].get_secret_value()
-		model_gpt = openai_cfg["model"].get_secret_value()
-
-		if await isAccess(bd = bd, id = id):
+		if user and user.access:
 			logger.info(get_log_with_id(id = id, s = '=', text = f"Text message: {text}"))
 			try:
-				count_cards = 5
-
-				if await inState(bd = bd, id = id, value = "cards_\d+"):
-					state = await get_state(bd = bd, id = id)
-					count_cards = int(state.split("_")[-1])
+				count_cards = get_spread_size(user = user)
 
 				action = types.ChatActions.TYPING
 				cards_dict = get_json_data(file_name = "data/cards.json")
@@ -112,69 +160,69 @@ async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional
 
 				await bot.send_chat_action(chat_id = message.from_user.id, action = action, action_message_id = action_message_id)
 
-				check = None
-				try:
-					connector = ProxyConnector.from_url(proxy_url)
-					async with ClientSession(connector=connector) as session:
-						openai.aiosession.set(session)
-						check = await openai.ChatCompletion.acreate(
-							model=model_gpt,
-							messages=[
-								{"role": "user", "content": check_quest + "\n" + text}
-							],
-							request_timeout=600,
-							api_key=api_key
-						)
-						check = check.choices[0].message.content
-				except openai.error.Timeout as e:
-					logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком долго сервер не отвечает -> {e}"))
-					raise Exception(f"{model_gpt} check_quest ({e})")
-				except openai.error.InvalidRequestError as e:
-					logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком много токенов -> {e}"))
-					raise Exception(f"{model_gpt}check_quest ({e})")
-				except openai.error.RateLimitError as e:
-					logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком частые сообщения -> {e}"))
-					raise Exception(f"{model_gpt} check_quest ({e})")
-				except openai.error.APIError as e:
-					logger.warning(get_log_with_id(id = id, s = '-', text = f"Ошибка сервера -> {e}"))
-					raise Exception(f"{model_gpt} check_quest ({e})")
-				except Exception as e:
-					logger.warning(get_log_with_id(id = id, s = '-', text = f"Неизвестная ошибка -> {e}"))
-					raise Exception(f"{model_gpt} check_quest ({e})")
-
-				if "CORRECT" in check:
-					#await send_cards_message(bot = bot, message = message, cards = random_cards, reply_to_message_id = message.message_id)
+				# Спекулятивный расклад отправляет два запроса одновременно и занимает два слота
+				speculative = llm_settings.reading_mode != reading_mode_single and count_cards in llm_settings.speculative_sizes
+				weight = 2 if speculative else 1
 
+				priority = priority_new
+				if llm_scheduler.is_busy(weight = weight):
+					if user.admin:
+						priority = priority_admin
+					elif await get_user_stats(bd = bd, user_id = id):
+						priority = priority_returning
+
+				async def on_queued(position: int) -> None:
+					logger.info(get_log_with_id(id = id, s = '=', text = f"Queued at #{position}"))
+					await send_queue_message(bot = bot, message = message, position = position, reply_to_message_id = message.message_id)
+
+				async with llm_scheduler.slot(priority = priority, on_queued = on_queued, weight = weight):
+					spread = "Расклад:" + "\n" + "\n".join(key for key in random_cards) + "Запрос:" + "\n" + text
+					check = None
 					chat = None
-					try:
-						connector = ProxyConnector.from_url(proxy_url)
-						async with ClientSession(connector=connector) as session:
-							openai.aiosession.set(session)
-							chat = await openai.ChatCompletion.acreate(
-								model=model_gpt,
-								messages=[
-									{"role": "system", "content": analyze_cards},
-									{"role": "user", "content": "Расклад:" + "\n" + "\n".join(key for key in random_cards) + "Запрос:" + "\n" + text}
-								],
-								request_timeout=600,
-								api_key=api_key
-							)
-							chat = chat.choices[0].message.content
-					except openai.error.Timeout as e:
-						logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком долго сервер не отвечает -> {e}"))
-						raise Exception(f"{model_gpt} analyze_cards ({e})")
-					except openai.error.InvalidRequestError as e:
-						logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком много токенов -> {e}"))
-						raise Exception(f"{model_gpt} analyze_cards ({e})")
-					except openai.error.RateLimitError as e:
-						logger.warning(get_log_with_id(id = id, s = '-', text = f"Слишком частые сообщения -> {e}"))
-						raise Exception(f"{model_gpt} analyze_cards ({e})")
-					except openai.error.APIError as e:
-						logger.warning(get_log_with_id(id = id, s = '-', text = f"Ошибка сервера -> {e}"))
-						raise Exception(f"{model_gpt} analyze_cards ({e})")
-					except Exception as e:
-						logger.warning(get_log_with_id(id = id, s = '-', text = f"Неизвестная ошибка -> {e}"))
-						raise Exception(f"{model_gpt} analyze_cards ({e})")
+					if llm_settings.reading_mode == reading_mode_single:
+						content, _ = await request_chat(id = id, name = "analyze_reading", model = model_gpt, messages = [
+							{"role": "system", "content": analyze_reading},
+							{"role": "user", "content": spread}
+						])
+						try:
+							accepted, answer = parse_reading(content = content)
+							if accepted:
+								chat = answer
+							else:
+								check = answer
+						except ValueError as e:
+							logger.warning(get_log_with_id(id = id, s = '-', text = f"{e}, falling back to check_quest and analyze_cards"))
+
+					if check is None and chat is None:
+						reading = None
+						reading_messages = [
+							{"role": "system", "content": analyze_cards},
+							{"role": "user", "content": spread}
+						]
+						if speculative:
+							reading = asyncio.ensure_future(request_chat(id = id, name = "analyze_cards", model = model_gpt, messages = reading_messages))
+						try:
+							check, _ = await request_chat(id = id, name = "check_quest", model = llm_settings.check_model, messages = [
+								{"role": "user", "content": check_quest + "\n" + text}
+							])
+						except BaseException:
+							if reading is not None:
+								await discard_reading(reading = reading, prompt_tokens = estimate_tokens(messages = reading_messages))
+							raise
+						if "CORRECT" in check:
+							llm_speculation.record(size = count_cards, accepted = True, speculative = speculative)
+							if reading is not None:
+								chat, _ = await reading
+							else:
+								chat, _ = await request_chat(id = id, name = "analyze_cards", model = model_gpt, messages = reading_messages)
+						elif reading is not None:
+							cancelled, wasted_tokens = await discard_reading(reading = reading, prompt_tokens = estimate_tokens(messages = reading_messages))
+							llm_speculation.record(size = count_cards, accepted = False, speculative = True, cancelled = cancelled, wasted_tokens = wasted_tokens)
+						else:
+							llm_speculation.record(size = count_cards, accepted = False)
+
+				if chat is not None:
+					#await send_cards_message(bot = bot, message = message, cards = random_cards, reply_to_message_id = message.message_id)
 
 					request_id = await set_request(bd = bd, item = {
 							"user_id": id,
@@ -187,7 +235,7 @@ async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional
 
 					"""prompt = None
 					try:
-						connector = ProxyConnector.from_url(proxy_url)
+						connector = ProxyConnector.from_url(llm_settings.proxy_url)
 						async with ClientSession(connector=connector) as session:
 							openai.aiosession.set(session)
 							prompt = await openai.ChatCompletion.acreate(
@@ -217,7 +265,7 @@ async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional
 
 					response = None
 					try:
-						connector = ProxyConnector.from_url(proxy_url)
+						connector = ProxyConnector.from_url(llm_settings.proxy_url)
 						async with ClientSession(connector=connector) as session:
 							openai.aiosession.set(session)
 							response = await openai.Image.acreate(
@@ -240,6 +288,12 @@ async def handle_text(message: types.Message, dp: Dispatcher, bot_name: Optional
 					await send_bad_request_message(bot = bot, message = message, text = check, action = action, action_message_id = action_message_id, reply_to_message_id = message.message_id)
 			except CancelledError:
 				pass
+			except LLMScheduler.Full as e:
+				await send_busy_message(bot = bot, message = message, action = action, action_message_id = action_message_id, reply_to_message_id = message.message_id)
+				logger.warning(get_log_with_id(id = id, s = '-', text = e))
+			except ClientPostgreSQL.Unavailable as e:
+				await send_unavailable_message(bot = bot, message = message, action = action, action_message_id = action_message_id)
+				logger.error(get_log_with_id(id = id, s = '-', text = e))
 			except Exception as e:
 				await send_error_message(bot = bot, message = message, e = e, action = action, action_message_id = action_message_id)
 				logger.error(get_log_with_id(id = id, s = '-', text = e))
@@ -102,6 +102,36 @@ async def send_show_message(bot: Bot_, message: Message, request_id: int, action
 
 	await bot.send_message(message.from_user.id, text = "<b>🧙‍♀ Расклад готов!</b>", action = action, action_message_id = action_message_id, reply_to_message_id = reply_to_message_id, reply_markup = get_show_buttons(request_id = request_id), parse_mode=types.ParseMode.HTML)
 
+async def send_queue_message(bot: Bot_, message: Message, position: int, reply_to_message_id: int) -> None:
+	"""
+	Sends a message with the position of the reading in the queue.
 
+	:param bot: The bot instance.
+	:type bot: Bot\_
+	:param message: The original message.
+	:type message: Message
+	:param position: Position in the queue from 1.
+	:type position: int
+	:param reply_to_message_id: The ID of the message to reply to.
+	:type reply_to_message_id: int
+	"""
+
+	await bot.send_message(message.from_user.id, text = f"<b>⏳ Сейчас много желающих, вы #{position} в очереди</b>", reply_to_message_id = reply_to_message_id, parse_mode=types.ParseMode.HTML)
+
+async def send_busy_message(bot: Bot_, message: Message, action: str, action_message_id: int, reply_to_message_id: int) -> None:
+	"""
+	Sends a message that the queue is full.
 
+	:param bot: The bot instance.
+	:type bot: Bot\_
+	:param message: The original message.
+	:type message: Message
+	:param action: The action to be performed.
+	:type action: str
+	:param action_message_id: The ID of the message to associate with the action.
+	:type action_message_id: int
+	:param reply_to_message_id: The ID of the message to reply to.
+	:type reply_to_message_id: int
+	"""
 
+	await bot.send_message(message.from_user.id, text = "<b>😵 Очередь переполнена, попробуйте повторить запрос через несколько минут</b>", action = action, action_message_id = action_message_id, reply_to_message_id = reply_to_message_id, parse_mode=types.ParseMode.HTML)
@@ -14,10 +14,12 @@ from asyncio.exceptions import CancelledError
 
 from utils.helper import get_log_with_id
 from utils.file import get_json_data
-from app.utils.postgresql.users import isAccess
-from app.utils.postgresql.users import isState
+from app.utils.postgresql.users import load_user_context
 from app.utils.postgresql.users import update_state
+from app.utils.templates.users import parse_state
+from postgresql import ClientPostgreSQL
 from app.utils.handlers.shared_messages import send_error_message
+from app.utils.handlers.shared_messages import send_unavailable_message
 from app.utils.handlers.shared_messages import send_block_message
 from .messages import send_choise_type_taro_message
 
@@ -47,11 +49,14 @@ async def web_app_data(webAppMes: Message, dp: Dispatcher, bot_name: Optional[st
 
         logger.info(get_log_with_id(id = id, s = '=', text = f"web_app_data: {data}"))
 
-        if await isAccess(bd = bd, id = id):
+        user = await load_user_context(bd = bd, id = id)
+
+        if user and user.access:
             try:
                 if data['type'] == 'choise_type_taro':
                     type_taro = data["name"]
-                    await update_state(bd = bd, id = id, value = type_taro)
+                    state, param = parse_state(value = type_taro)
+                    await update_state(bd = bd, id = id, value = state, param = param)
 
                     json_data = get_json_data(file_name = "data/types_taro.json")
 
@@ -61,6 +66,9 @@ async def web_app_data(webAppMes: Message, dp: Dispatcher, bot_name: Optional[st
                     logger.warning(get_log_with_id(id = id, s = '?', text = "Detected user without ACCESS"))
             except CancelledError:
                 pass
+            except ClientPostgreSQL.Unavailable as e:
+                await send_unavailable_message(bot = bot, message = webAppMes)
+                logger.error(get_log_with_id(id = id, s = '-', text = e))
             except Exception as e:
                 await send_error_message(bot = bot, message = webAppMes, e = e)
                 logger.error(get_log_with_id(id = id, s = '-', text = f"Error: {e}"))
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process cache with a size bound (LRU) and a time to live
+"""
+
+from collections import OrderedDict
+from time import monotonic
+
+from typing import Dict
+from typing import Any
+from typing import Hashable
+from typing import Optional
+
+class TTLCache(object):
+    """
+    Bounded cache: the least recently used entry is evicted when the cache is full,
+    an entry older than ttl seconds is treated as missing.
+
+    Invalidations are numbered. A reader takes the current number (get_generation) before going
+    to the database and passes it to put(), so a value read before a concurrent write is not stored
+    over the invalidation.
+
+    :ivar max_size: Maximum number of entries.
+    :type max_size: int
+    :ivar ttl: Time to live of an entry in seconds.
+    :type ttl: float
+    :ivar entries: Entries (time of storing, value) from the least to the most recently used.
+    :type entries: OrderedDict[Hashable, Tuple[float, Any]]
+    :ivar generation: Number of the last invalidation.
+    :type generation: int
+    :ivar invalidated: Number of the last invalidation of each key (at most max_size keys are remembered).
+    :type invalidated: Dict[Hashable, int]
+    :ivar floor: Number of the last invalidation of forgotten keys.
+    :type floor: int
+    :ivar hits: Number of found entries.
+    :type hits: int
+    :ivar misses: Number of missing or expired entries.
+    :type misses: int
+    :ivar evictions: Number of entries evicted because the cache was full.
+    :type evictions: int
+    :ivar invalidations: Number of invalidated keys.
+    :type invalidations: int
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0) -> None:
+        """
+        Initialization TTLCache object.
+
+        :param max_size: Maximum number of entries with default value 10000.
+        :type max_size: int
+        :param ttl: Time to live of an entry in seconds with default value 30.
+        :type ttl: float
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.invalidated = {}
+        self.floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a value and mark it as recently used.
+
+        :param key: Key of the entry.
+        :type key: Hashable
+        :return: Value or None if the entry is missing or expired.
+        :rtype: Optional[Any]
+        """
+
+        entry = self.entries.get(key)
+        if entry is None or monotonic() - entry[0] >= self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def get_generation(self) -> int:
+        """
+        Get the number of the last invalidation (take it before reading the value from the database).
+
+        :return: Number of the last invalidation.
+        :rtype: int
+        """
+
+        return self.generation
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        :param key: Key of the entry.
+        :type key: Hashable
+        :param value: Value of the entry (None values are not stored).
+        :type value: Any
+        :param generation: get_generation() taken before the value was read with default value None (don't check).
+        :type generation: Optional[int]
+        :return: True if the value was stored, False if the key was invalidated after the value was read.
+        :rtype: bool
+        """
+
+        if value is None or self.max_size <= 0:
+            return False
+        if generation is not None and self.invalidated.get(key, self.floor) > generation:
+            return False
+        self.entries[key] = (monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove an entry, so values of the key read before are not stored.
+
+        :param key: Key of the entry.
+        :type key: Hashable
+        """
+
+        self.entries.pop(key, None)
+        self.generation += 1
+        self.invalidations += 1
+        if len(self.invalidated) >= self.max_size:
+            self.invalidated.clear()
+            self.floor = self.generation
+        self.invalidated[key] = self.generation
+
+    def clear(self) -> None:
+        """
+        Remove all entries, so values read before are not stored.
+        """
+
+        self.entries.clear()
+        self.invalidated.clear()
+        self.generation += 1
+        self.floor = self.generation
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the metrics of the cache.
+
+        :return: Size, hits, misses, hit rate, evictions and invalidations.
+        :rtype: Dict[str, Any]
+        """
+
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
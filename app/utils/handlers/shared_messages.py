@@ -56,5 +56,20 @@ async def send_block_message(bot: Bot_, message: Message) -> None:
 
     await bot.send_message(message.from_user.id, text = f"<b>😨 У вас нет прав доступа, обратитесь к администраторам</b>", parse_mode = types.ParseMode.HTML)
 
+# Функция выдающая пользователю сообщение о временной недоступности базы данных (в отличие от отсутствия прав доступа)
 
+async def send_unavailable_message(bot: Bot_, message: Message, action: Optional[base.String] = None, action_message_id: Optional[int] = None) -> None:
+    """
+    This function sends a message to the user indicating that the service is temporarily unavailable.
+
+    :param bot: The Bot\_ instance for sending the message.
+    :type bot: Bot\_
+    :param message: The original incoming message.
+    :type message: Message
+    :param action: Name of action
+    :type action: Optional[base.String]
+    :param action_message_id: Action message's id
+    :type action_message_id: Optional[int]
+    """
 
+    await bot.send_message(message.from_user.id, text = f"<b>⏳ Сервис временно недоступен, попробуйте повторить запрос через минуту</b>", parse_mode = types.ParseMode.HTML, action = action, action_message_id = action_message_id)
@@ -13,9 +13,11 @@ from typing import Dict
 from typing import Any
 from typing import List
 from typing import Optional
+from typing import AsyncIterator
 
 from postgresql.model import ClientPostgreSQL
 from app.utils.templates.requests import table_requests
+from app.utils.templates.requests import RequestRow
 
 # Задает переменную table со значением названия таблицы запросов
 
@@ -23,7 +25,7 @@ table = table_requests()["table"]
 
 # Получает информацию о запросе по его идентификатору. Возвращает словарь с данными запроса или None, если запрос не найден
 
-async def get_request_by_id(bd: ClientPostgreSQL, id: int) -> Optional[Dict[str, Any]]:
+async def get_request_by_id(bd: ClientPostgreSQL, id: int) -> Optional[RequestRow]:
     """
     Retrieves user information by their ID from the database.
 
@@ -31,12 +33,13 @@ async def get_request_by_id(bd: ClientPostgreSQL, id: int) -> Optional[Dict[str,
     :type bd: ClientPostgreSQL
     :param id: requests ID.
     :type id: int
-    :return: User information as a dictionary or None if not found.
-    :rtype: Optional[Dict[str, Any]]
+    :return: Request information as a row or None if not found.
+    :rtype: Optional[RequestRow]
     """ 
     
     result = await bd.get_items(
         table = table,
+        record_class = RequestRow,
         by_values = {
             "id": id
         }
@@ -48,12 +51,70 @@ async def get_request_by_id(bd: ClientPostgreSQL, id: int) -> Optional[Dict[str,
         result = None
     return result
 
+# Получает информацию о нескольких запросах одним запросом к базе. Возвращает словарь с данными запросов по их идентификаторам (ненайденных запросов в нем нет)
+
+async def get_requests_by_ids(bd: ClientPostgreSQL, ids: List[int]) -> Optional[Dict[int, RequestRow]]:
+    """
+    Retrieves information about many requests by their IDs with one query.
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param ids: Requests IDs.
+    :type ids: List[int]
+    :return: Requests information as rows keyed by ID (missing requests are skipped) or None on error.
+    :rtype: Optional[Dict[int, RequestRow]]
+    """
+
+    result = await bd.get_items_many(
+        table = table,
+        record_class = RequestRow,
+        by_column = "id",
+        values = ids,
+        value_type = "integer"
+    )
+
+    return result
+
+# Получает страницу истории запросов пользователя, начиная с самых новых. Следующая страница запрашивается с after_id равным id последнего запроса страницы
+
+async def get_user_requests(bd: ClientPostgreSQL, user_id: int, after_id: Optional[int] = None, limit: int = 10) -> Optional[List[RequestRow]]:
+    """
+    Retrieves one page of the user's requests, newest first (keyset pagination).
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param user_id: User ID.
+    :type user_id: int
+    :param after_id: ID of the last request of the previous page, None for the first page.
+    :type after_id: Optional[int]
+    :param limit: Maximum number of requests in the page.
+    :type limit: int
+    :return: Requests of the page as rows (empty list after the last page) or None on error.
+    :rtype: Optional[List[RequestRow]]
+    """
+
+    result = await bd.get_items_page(
+        table = table,
+        record_class = RequestRow,
+        by_values = {
+            "user_id": user_id
+        },
+        order_by = "id",
+        after = after_id,
+        limit = limit,
+        descending = True
+    )
+
+    return result
+
 # Добавляет новый запрос в базу данных. Принимает словарь с информацией о запросе. Возвращает результат операции или None
 
 async def set_request(bd: ClientPostgreSQL, item: Dict[str, Any]) -> Optional[int]:
     """
     Adds a new request to the database.
 
+    The stats of the user (see user_stats.get_user_stats) are updated by a trigger in the same transaction.
+
     :param bd: PostgreSQL database client.
     :type bd: ClientPostgreSQL
     :param item: Request information as a dictionary.
@@ -62,7 +123,7 @@ async def set_request(bd: ClientPostgreSQL, item: Dict[str, Any]) -> Optional[in
     :rtype: Optional[int]
     """
 
-    result = await bd.append_item(
+    result = await bd.upsert_item(
         table = table,
         item = item,
         returning_columns = ["id"]
@@ -71,4 +132,54 @@ async def set_request(bd: ClientPostgreSQL, item: Dict[str, Any]) -> Optional[in
     if result:
         return result[0]["id"]
 
-    return None
\ No newline at end of file
+    return None
+
+# Добавляет много запросов в базу данных одной командой COPY (для импорта и восстановления архива). Возвращает количество добавленных запросов или None
+
+async def set_requests(bd: ClientPostgreSQL, items: List[Dict[str, Any]], chunk_size: Optional[int] = 10000) -> Optional[int]:
+    """
+    Adds many requests to the database with bulk COPY.
+
+    The stats of the users are updated once per chunk by a statement-level trigger.
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param items: Requests information as dictionaries with the same keys.
+    :type items: List[Dict[str, Any]]
+    :param chunk_size: Maximum number of requests copied in one transaction.
+    :type chunk_size: Optional[int]
+    :return: Number of appended requests or None.
+    :rtype: Optional[int]
+    """
+
+    result = await bd.append_items(
+        table = table,
+        items = items,
+        chunk_size = chunk_size
+    )
+
+    return result
+
+# Перебирает запросы (все или одного пользователя) по одному через серверный курсор, не загружая таблицу в память целиком. Нужна для выгрузки и анализа
+
+async def iterate_requests(bd: ClientPostgreSQL, user_id: Optional[int] = None, batch_size: int = 1000) -> AsyncIterator[RequestRow]:
+    """
+    Iterates over requests with constant memory (server-side cursor).
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param user_id: User ID to export only his requests, None for all requests.
+    :type user_id: Optional[int]
+    :param batch_size: Number of requests fetched per round trip.
+    :type batch_size: int
+    :return: Requests information as rows one by one.
+    :rtype: AsyncIterator[RequestRow]
+    """
+
+    async for item in bd.iterate_items(
+        table = table,
+        record_class = RequestRow,
+        by_values = {"user_id": user_id} if user_id is not None else {},
+        batch_size = batch_size
+    ):
+        yield item
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Functions for table user_stats (the table is maintained by a trigger of table requests, see templates.user_stats)
+
+:var table: Name of table user_stats
+:type table: str
+"""
+
+from json import loads
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from postgresql.model import ClientPostgreSQL
+from app.utils.templates.user_stats import table_user_stats
+from app.utils.templates.user_stats import UserStatsRow
+
+# Задает переменную table со значением названия таблицы статистики пользователей
+
+table = table_user_stats()["table"]
+
+# Получает статистику пользователя (число раскладов, последний запрос и его время, раскладов каждого размера) одной строкой, без подсчета по таблице запросов. Возвращает строку статистики или None, если пользователь еще не делал раскладов
+
+async def get_user_stats(bd: ClientPostgreSQL, user_id: int) -> Optional[UserStatsRow]:
+    """
+    Retrieves the reading stats of a user with one row read.
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param user_id: User ID.
+    :type user_id: int
+    :return: Stats as a row (requests, last_request_id, last_request_at, spread_sizes) or None if the user has no requests.
+    :rtype: Optional[UserStatsRow]
+
+    :raises ClientPostgreSQL.Unavailable: If the database is unavailable.
+    """
+
+    result = await bd.get_items(
+        table = table,
+        record_class = UserStatsRow,
+        by_values = {
+            "user_id": user_id
+        }
+    )
+
+    if result:
+        result = result[0]
+    else:
+        result = None
+    return result
+
+# Получает статистику нескольких пользователей одним запросом. Возвращает словарь строк статистики по идентификаторам пользователей (пользователей без раскладов в нем нет)
+
+async def get_users_stats(bd: ClientPostgreSQL, user_ids: List[int]) -> Optional[Dict[int, UserStatsRow]]:
+    """
+    Retrieves the reading stats of many users with one query.
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param user_ids: Users IDs.
+    :type user_ids: List[int]
+    :return: Stats as rows keyed by user ID (users without requests are skipped) or None on error.
+    :rtype: Optional[Dict[int, UserStatsRow]]
+    """
+
+    result = await bd.get_items_many(
+        table = table,
+        record_class = UserStatsRow,
+        by_column = "user_id",
+        values = user_ids,
+        value_type = "bigint"
+    )
+
+    return result
+
+# Возвращает гистограмму размеров раскладов пользователя из строки статистики: число раскладов по числу карт
+
+def get_spread_histogram(stats: Optional[UserStatsRow]) -> Dict[int, int]:
+    """
+    Gets the number of readings per spread size from a stats row.
+
+    :param stats: Stats row or None.
+    :type stats: Optional[UserStatsRow]
+    :return: Number of readings by number of cards (empty if there are no stats).
+    :rtype: Dict[int, int]
+    """
+
+    if stats is None or not stats["spread_sizes"]:
+        return {}
+    return {int(size): count for size, count in sorted(loads(stats["spread_sizes"]).items(), key = lambda item: int(item[0]))}
@@ -5,6 +5,14 @@ Functions for table users
 
 :var table: Name of table users
 :type table: str
+:var cache: Rows of users by their IDs, written through by set_user, update_user and update_state
+:type cache: TTLCache
+:var channel: Channel of notifications about changed users (payload is the user ID), sent by a trigger of the table
+:type channel: str
+:var writes: Write-behind buffer of update_user and update_state or None if updates are written at once (see setup_write_behind)
+:type writes: Optional[WriteBehind]
+:var deferred_columns: Columns that may be written behind (access and admin are always written at once)
+:type deferred_columns: Set[str]
 """
 
 from re import findall
@@ -13,61 +21,244 @@ from typing import Dict
 from typing import Any
 from typing import List
 from typing import Optional
+from typing import Union
 
 from postgresql.model import ClientPostgreSQL
+from postgresql.model import RowOverlay
+from postgresql.model import WriteBehind
+from postgresql.model import get_column_types
 from app.utils.templates.users import table_users
+from app.utils.templates.users import UserRow
+from app.utils.templates.users import state_cards
+from app.utils.templates.users import default_spread_size
+from app.utils.cache import TTLCache
 
 # Задает переменную table со значением названия таблицы пользователей
 
 table = table_users()["table"]
 
-# Получает информацию о пользователе по его идентификатору. Возвращает словарь с данными пользователя или None, если пользователь не найден
+# Кэш строк пользователей в памяти процесса: строки читаются на каждое обновление, а меняются редко
 
-async def get_user_by_id(bd: ClientPostgreSQL, id: int) -> Optional[Dict[str, Any]]:
+cache = TTLCache()
+
+# Канал уведомлений об изменении строк пользователей (их шлет триггер таблицы, в том числе из других процессов)
+
+channel = f"{table}_changed"
+
+# Буфер отложенной записи обновлений пользователей (None, пока он не включен через setup_write_behind). Отложенно пишутся только колонки, потеря которых при падении процесса не страшна (доступ и права админа пишутся сразу)
+
+writes = None
+deferred_columns = {"username", "state", "state_param"}
+
+# Сбрасывает строку пользователя в кэше по уведомлению из другого процесса (например, админ заблокировал пользователя). None означает, что уведомления могли потеряться, и кэш очищается целиком
+
+def on_user_changed(payload: Optional[str]) -> None:
+    """
+    Invalidates a cached user's row on a notification of the users channel (see ClientPostgreSQL.listen).
+
+    :param payload: User ID or None if notifications could be missed (then the whole cache is cleared).
+    :type payload: Optional[str]
     """
-    Retrieves user information by their ID from the database.
+
+    if payload is None:
+        cache.clear()
+    else:
+        cache.invalidate(int(payload))
+
+# Запоминает записанную строку пользователя в кэше (write-through). Внутри единицы работы строка попадает в кэш только после коммита
+
+def remember_user(bd: ClientPostgreSQL, id: int, row: Optional[UserRow]) -> None:
+    """
+    Writes a user's row through to the cache after a write to the database.
+
+    The old entry is invalidated at once. The new row is stored immediately, or after the commit
+    if the write is a part of a unit of work (a rolled back row never gets to the cache).
 
     :param bd: PostgreSQL database client.
     :type bd: ClientPostgreSQL
     :param id: User ID.
     :type id: int
-    :return: User information as a dictionary or None if not found.
-    :rtype: Optional[Dict[str, Any]]
-    """ 
-    
-    result = await bd.get_items(
-        table = table,
-        by_values = {
-            "id": id
-        }
-    )
+    :param row: Written row (RETURNING) or None if it's unknown (then the entry is only invalidated).
+    :type row: Optional[UserRow]
+    """
 
-    if result:
-        result = result[0]
+    cache.invalidate(id)
+    generation = cache.get_generation()
+    unit_of_work = bd.get_unit_of_work()
+    if unit_of_work is None:
+        cache.put(id, row, generation)
     else:
-        result = None
+        unit_of_work.after_commit(lambda: cache.put(id, row, generation))
+
+# Включает отложенную запись обновлений пользователей: обновления одного пользователя сливаются и пишутся одним запросом раз в interval секунд (0 выключает буфер). Возвращает буфер, который надо запустить и остановить вместе с приложением
+
+def setup_write_behind(bd: ClientPostgreSQL, interval: float) -> Optional[WriteBehind]:
+    """
+    Enables the write-behind buffer of update_user and update_state.
+
+    Updates made outside a unit of work are merged per user and written in batches,
+    the written rows are put into the cache.
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param interval: Seconds between flushes, 0 writes updates at once.
+    :type interval: float
+    :return: Buffer to start() at startup and stop() at shutdown, None if it's disabled.
+    :rtype: Optional[WriteBehind]
+    """
+
+    global writes
+    writes = None
+    if interval > 0:
+        writes = WriteBehind(
+            client = bd,
+            table = table,
+            key = "id",
+            types = get_column_types(columns = table_users()["columns"]),
+            interval = interval,
+            returning_columns = list(UserRow.columns),
+            record_class = UserRow,
+            on_flush = lambda rows: [remember_user(bd = bd, id = row["id"], row = row) for row in rows]
+        )
+    return writes
+
+# Получает информацию о пользователе по его идентификатору (из кэша, если строка там есть). Возвращает строку пользователя или None, если пользователь не найден
+
+async def get_user_by_id(bd: ClientPostgreSQL, id: int) -> Optional[Union[UserRow, RowOverlay]]:
+    """
+    Retrieves user information by their ID from the cache or from the database.
+
+    A missing row is read from the primary: a lagging replica could return the row as it was before
+    the invalidation, and it would be cached for the whole time to live.
+    A row read inside a unit of work is not cached: it may contain writes that are not committed yet.
+    Updates waiting in the write-behind buffer are applied to the row (read-your-writes).
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param id: User ID.
+    :type id: int
+    :return: User information as a row (RowOverlay if there are pending updates) or None if not found.
+    :rtype: Optional[Union[UserRow, RowOverlay]]
+
+    :raises ClientPostgreSQL.Unavailable: If the database is unavailable.
+    """
+
+    result = cache.get(id)
+    if result is None:
+        generation = cache.get_generation()
+        result = await bd.get_items(
+            table = table,
+            record_class = UserRow,
+            columns = list(UserRow.columns),
+            by_values = {
+                "id": id
+            },
+            readonly = False
+        )
+
+        if result:
+            result = result[0]
+            if bd.get_unit_of_work() is None:
+                cache.put(id, result, generation)
+        else:
+            result = None
+
+    if writes is not None:
+        result = writes.overlay(key = id, row = result)
+    return result
+
+# Загружает все, что обработчикам нужно знать о пользователе на каждое обновление (доступ, админ, состояние, имя), одним запросом или из кэша. Возвращает строку пользователя или None, если пользователь не найден
+
+async def load_user_context(bd: ClientPostgreSQL, id: int) -> Optional[Union[UserRow, RowOverlay]]:
+    """
+    Loads access, admin, state and username of a user with one query or from the cache (instead of isAccess, isAdmin, get_state...).
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param id: User ID.
+    :type id: int
+    :return: User context as a row (user.access, user.admin, user.state, user.username) or None if not found.
+    :rtype: Optional[Union[UserRow, RowOverlay]]
+
+    :raises ClientPostgreSQL.Unavailable: If the database is unavailable.
+    """
+
+    return await get_user_by_id(bd = bd, id = id)
+
+# Получает информацию о нескольких пользователях: строки из кэша, остальные одним запросом. Возвращает словарь с данными пользователей по их идентификаторам (ненайденных пользователей в нем нет)
+
+async def get_users_by_ids(bd: ClientPostgreSQL, ids: List[int]) -> Optional[Dict[int, Union[UserRow, RowOverlay]]]:
+    """
+    Retrieves information about many users by their IDs from the cache and the missing ones with one query.
+
+    The missing rows are read from the primary and cached like in get_user_by_id.
+    Updates waiting in the write-behind buffer are applied to the rows (read-your-writes).
+
+    :param bd: PostgreSQL database client.
+    :type bd: ClientPostgreSQL
+    :param ids: Users IDs.
+    :type ids: List[int]
+    :return: Users information as rows (RowOverlay if there are pending updates) keyed by ID (missing users are skipped) or None on error.
+    :rtype: Optional[Dict[int, Union[UserRow, RowOverlay]]]
+
+    :raises ClientPostgreSQL.Unavailable: If the database is unavailable.
+    """
+
+    result = {}
+    missing = []
+    for id in dict.fromkeys(ids):
+        row = cache.get(id)
+        if row is None:
+            missing.append(id)
+        else:
+            result[id] = row
+
+    if missing:
+        generation = cache.get_generation()
+        rows = await bd.get_items_many(
+            table = table,
+            record_class = UserRow,
+            columns = list(UserRow.columns),
+            by_column = "id",
+            values = missing,
+            value_type = "bigint",
+            readonly = False
+        )
+
+        if rows is None:
+            return None
+        for id, row in rows.items():
+            result[id] = row
+            if bd.get_unit_of_work() is None:
+                cache.put(id, row, generation)
+
+    if writes is not None:
+        result = {id: writes.overlay(key = id, row = row) for id, row in result.items()}
     return result
 
-# Добавляет нового пользователя в базу данных. Принимает словарь с информацией о пользователе. Возвращает результат операции или None
+# Добавляет нового пользователя в базу данных одним запросом (INSERT ... ON CONFLICT DO NOTHING) и запоминает его строку в кэше. Принимает словарь с информацией о пользователе. Возвращает результат операции или None
 
-async def set_user(bd: ClientPostgreSQL, item: Dict[str, Any]) -> Optional[str]:
+async def set_user(bd: ClientPostgreSQL, item: Dict[str, Any]) -> Optional[List[UserRow]]:
     """
-    Adds a new user to the database.
+    Adds a new user to the database, keeping the existing row if the user is already registered.
 
     :param bd: PostgreSQL database client.
     :type bd: ClientPostgreSQL
     :param item: User information as a dictionary.
     :type item: Dict[str, Any]
-    :return: Result of the operation or None.
-    :rtype: Optional[str]
+    :return: Inserted row (empty list if the user was already registered) or None.
+    :rtype: Optional[List[UserRow]]
     """
 
-    result = await bd.append_item(
+    result = await bd.upsert_item(
         table = table,
         item = item,
-        check_twin_colums = ["id"]
+        conflict_columns = ["id"],
+        returning_columns = list(UserRow.columns),
+        record_class = UserRow
     )
 
+    remember_user(bd = bd, id = item["id"], row = result[0] if result else None)
     return result
 
 # Проверяет, имеет ли пользователь права доступа. Возвращает True, если пользователь имеет доступ, и False в противном случае
@@ -82,20 +273,14 @@ async def isAccess(bd: ClientPostgreSQL, id: int) -> bool:
     :type id: int
     :return: True if the user has access, False otherwise.
     :rtype: bool
+
+    :raises ClientPostgreSQL.Unavailable: If the database is unavailable (the access is unknown, not denied).
     """
 
-    result = await bd.get_items(
-        table = table,
-        columns = {
-            "access"
-        },
-        by_values = {
-            "id": id
-        }
-    )
+    result = await get_user_by_id(bd = bd, id = id)
 
     if result:
-        result = result[0]["access"]
+        result = result["access"]
     else:
         result = False
     
@@ -115,52 +300,57 @@ async def isAdmin(bd: ClientPostgreSQL, id: int) -> bool:
     :rtype: bool
     """
 
-    result = await bd.get_items(
-        table = table,
-        columns = {
-            "admin"
-        },
-        by_values = {
-            "id": id
-        }
-    )
+    result = await get_user_by_id(bd = bd, id = id)
 
     if result:
-        result = result[0]["admin"]
+        result = result["admin"]
     else:
         result = False
     
     return result
 
-# Обновляет информацию о пользователе в базе данных. Принимает словарь с обновляемыми значениями и идентификатор пользователя. Возвращает сообщение об ошибке, если обновление не удалось, и None в случае успеха
+# Обновляет информацию о пользователе в базе данных и записывает обновленную строку в кэш. Имя и состояние вне единицы работы пишутся через буфер отложенной записи, если он включен. Принимает словарь с обновляемыми значениями и идентификатор пользователя. Возвращает обновленную строку или None
 
-async def update_user(bd: ClientPostgreSQL, update_values: Dict[str, Any], id: int) -> Optional[str]:
+async def update_user(bd: ClientPostgreSQL, update_values: Dict[str, Any], id: int) -> Optional[List[UserRow]]:
     """
     Updates user information in the database.
 
+    If the write-behind buffer is enabled, updates of only deferred_columns made outside a unit of work
+    are buffered (they are visible to get_user_by_id at once). Other updates are written at once
+    and drop the pending values of their columns.
+
     :param bd: PostgreSQL database client.
     :type bd: ClientPostgreSQL
     :param update_values: Dictionary containing the columns to be updated and their new values.
     :type update_values: Dict[str, Any]
     :param id: User ID.
     :type id: int
-    :return: Optional error message, None if the update is successful.
-    :rtype: Optional[str]
+    :return: Updated row (empty list if the user is not found) or None on error or if the update is buffered.
+    :rtype: Optional[List[UserRow]]
     """
 
+    if writes is not None:
+        if set(update_values) <= deferred_columns and bd.get_unit_of_work() is None:
+            if writes.update(key = id, values = update_values):
+                return None
+        writes.discard(key = id, columns = list(update_values))
+
     result = await bd.update_item(
         table = table,
         update_values = update_values,
         by_values = {
             "id": id
-        }
+        },
+        returning_columns = list(UserRow.columns),
+        record_class = UserRow
     )
-    
+
+    remember_user(bd = bd, id = id, row = result[0] if result else None)
     return result
 
-#  Обновляет состояние пользователя в базе данных. Принимает новое значение состояния и идентификатор пользователя. Возвращает сообщение об ошибке или None, в случае успеха
+#  Обновляет состояние пользователя в базе данных. Принимает вид состояния, его целочисленный параметр и идентификатор пользователя. Возвращает обновленную строку или None
 
-async def update_state(bd: ClientPostgreSQL, id: int, value: str) -> Optional[str]:
+async def update_state(bd: ClientPostgreSQL, id: int, value: str, param: Optional[int] = None) -> Optional[List[UserRow]]:
     """
     Updates the state of a user in the database.
 
@@ -168,29 +358,30 @@ async def update_state(bd: ClientPostgreSQL, id: int, value: str) -> Optional[st
     :type bd: ClientPostgreSQL
     :param id: User ID.
     :type id: int
-    :param value: New state value.
+    :param value: Kind of the new state (e.g. 'main' or state_cards).
     :type value: str
-    :return: Optional error message, None if the update is successful.
-    :rtype: Optional[str]
+    :param param: Integer parameter of the state (e.g. the number of cards) with default value None.
+    :type param: Optional[int]
+    :return: Updated row (empty list if the user is not found) or None on error or if the update is buffered.
+    :rtype: Optional[List[UserRow]]
     """
 
-    result = await bd.update_item(
-        table = table,
+    result = await update_user(
+        bd = bd,
         update_values = {
-            "state": value
+            "state": value,
+            "state_param": param
         },
-        by_values = {
-            "id": id
-        }
+        id = id
     )
     
     return result
 
-# Получает текущее состояние пользователя из базы данных. Возвращает состояние пользователя или None, если пользователь не найден
+# Получает текущее состояние пользователя. Возвращает состояние пользователя или None, если пользователь не найден
 
 async def get_state(bd: ClientPostgreSQL, id: int) -> Optional[str]:
     """
-    Retrieves the state of a user from the database.
+    Retrieves the state of a user.
 
     :param bd: PostgreSQL database client.
     :type bd: ClientPostgreSQL
@@ -200,23 +391,31 @@ async def get_state(bd: ClientPostgreSQL, id: int) -> Optional[str]:
     :rtype: Optional[str]
     """
 
-    result = await bd.get_items(
-        table = table,
-        columns = [
-            "state"
-        ],
-        by_values = {
-            "id": id
-        }
-    )
+    result = await get_user_by_id(bd = bd, id = id)
 
     if result:
-        result = result[0]["state"]
+        result = result["state"]
     else:
         result = None
 
     return result
 
+# Возвращает число карт расклада, выбранного пользователем, по уже загруженной строке пользователя (без запроса), или число карт по умолчанию
+
+def get_spread_size(user: Optional[Union[UserRow, RowOverlay]]) -> int:
+    """
+    Gets the number of cards of the spread chosen by a user from the user's row.
+
+    :param user: User's row (e.g. from load_user_context) or None.
+    :type user: Optional[Union[UserRow, RowOverlay]]
+    :return: Parameter of the state if the user chose a spread, otherwise default_spread_size.
+    :rtype: int
+    """
+
+    if user is not None and user["state"] == state_cards and user["state_param"]:
+        return user["state_param"]
+    return default_spread_size
+
 # Проверяет, соответствует ли текущее состояние пользователя указанному значению. Возвращает True, если состояние соответствует, и False в противном случае
 
 async def isState(bd: ClientPostgreSQL, id: int, value: str) -> bool:
@@ -233,20 +432,7 @@ async def isState(bd: ClientPostgreSQL, id: int, value: str) -> bool:
     :rtype: bool
     """
 
-    result = await bd.get_items(
-        table = table,
-        columns = [
-            "state"
-        ],
-        by_values = {
-            "id": id
-        }
-    )
-
-    if result:
-        result = result[0]["state"]
-    else:
-        result = None
+    result = await get_state(bd = bd, id = id)
 
     return result == value
 
@@ -266,19 +452,6 @@ async def inState(bd: ClientPostgreSQL, id: int, value: str) -> bool:
     :rtype: bool
     """
 
-    result = await bd.get_items(
-        table = table,
-        columns = [
-            "state"
-        ],
-        by_values = {
-            "id": id
-        }
-    )
-
-    if result:
-        result = result[0]["state"]
-    else:
-        result = None
+    result = await get_state(bd = bd, id = id)
 
-    return (len(findall(value, result)) == 1)
\ No newline at end of file
+    return (len(findall(value, result or "")) == 1)
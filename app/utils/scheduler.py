@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bounded queue of OpenAI requests with priorities
+
+:var priority_admin: Priority of administrators (served first)
+:type priority_admin: int
+:var priority_returning: Priority of users who already have readings
+:type priority_returning: int
+:var priority_new: Priority of new users
+:type priority_new: int
+"""
+
+import asyncio
+
+from contextlib import asynccontextmanager
+from heapq import heappush
+from heapq import heappop
+from heapq import heapify
+from itertools import count
+from time import monotonic
+
+from typing import Dict
+from typing import Any
+from typing import List
+from typing import Callable
+from typing import Awaitable
+from typing import Optional
+from typing import AsyncIterator
+
+priority_admin = 0
+priority_returning = 1
+priority_new = 2
+
+class LLMScheduler(object):
+    """
+    Lets at most concurrency requests talk to OpenAI at once, the other readings wait in a bounded queue
+    ordered by priority (lower first) and then by arrival. When the queue is full, new readings are rejected
+    at once instead of piling up into rate limit errors and hung tasks.
+
+    A reading takes as many slots as requests it sends at once (weight), e.g. 2 for a speculative reading.
+    The first waiting reading is served first, the others don't pass it even if they fit into free slots.
+
+    :ivar concurrency: Maximum number of slots (requests running at once).
+    :type concurrency: int
+    :ivar max_queue: Maximum number of waiting readings.
+    :type max_queue: int
+    :ivar notify_depth: Position in the queue from which the user is told about it.
+    :type notify_depth: int
+    :ivar running: Number of taken slots.
+    :type running: int
+    :ivar waiters: Heap of waiting readings [priority, number, future, weight].
+    :type waiters: List[List[Any]]
+    :ivar counter: Numbers of arrival.
+    :type counter: itertools.count
+    :ivar stats: Counters of started, queued, rejected and cancelled readings, maximum queue depth.
+    :type stats: Dict[str, int]
+    :ivar waits: Number of readings that got a slot after waiting.
+    :type waits: int
+    :ivar wait_total: Total seconds spent in the queue.
+    :type wait_total: float
+    :ivar wait_max: Maximum seconds spent in the queue.
+    :type wait_max: float
+    """
+
+    class Full(Exception):
+        """
+        Raised when the queue is full.
+        """
+
+    def __init__(self, concurrency: int = 4, max_queue: int = 100, notify_depth: int = 1) -> None:
+        """
+        Initialization LLMScheduler object.
+
+        :param concurrency: Maximum number of slots (requests running at once) with default value 4.
+        :type concurrency: int
+        :param max_queue: Maximum number of waiting readings with default value 100.
+        :type max_queue: int
+        :param notify_depth: Position in the queue from which the user is told about it with default value 1.
+        :type notify_depth: int
+        """
+
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.notify_depth = notify_depth
+        self.running = 0
+        self.waiters = []
+        self.counter = count()
+        self.stats = {
+            "started": 0,
+            "queued": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "max_depth": 0
+        }
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def get_weight(self, weight: int) -> int:
+        """
+        Get the number of slots taken by a reading, a reading heavier than all slots takes all of them.
+
+        :param weight: Number of requests the reading sends at once.
+        :type weight: int
+        :return: Number of slots from 1 to concurrency.
+        :rtype: int
+        """
+
+        return max(1, min(weight, self.concurrency))
+
+    def is_busy(self, weight: int = 1) -> bool:
+        """
+        Check whether a new reading would have to wait.
+
+        :param weight: Number of slots of the reading with default value 1.
+        :type weight: int
+        :return: True if there aren't enough free slots or somebody is waiting.
+        :rtype: bool
+        """
+
+        return self.running + self.get_weight(weight = weight) > self.concurrency or bool(self.waiters)
+
+    def get_position(self, entry: List[Any]) -> int:
+        """
+        Get the position of a waiting reading in the queue.
+
+        :param entry: Entry of the reading [priority, number, future, weight].
+        :type entry: List[Any]
+        :return: Position from 1.
+        :rtype: int
+        """
+
+        return 1 + sum(1 for waiter in self.waiters if waiter[:2] < entry[:2])
+
+    async def acquire(self, priority: int = priority_new, on_queued: Optional[Callable[[int], Awaitable[Any]]] = None, weight: int = 1) -> None:
+        """
+        Take slots, waiting in the queue if there aren't enough free slots.
+
+        :param priority: Priority of the reading (priority_admin, priority_returning or priority_new) with default value priority_new.
+        :type priority: int
+        :param on_queued: Function awaited with the position when the reading has to wait at position notify_depth or further with default value None.
+        :type on_queued: Optional[Callable[[int], Awaitable[Any]]]
+        :param weight: Number of slots (requests sent at once) with default value 1.
+        :type weight: int
+
+        :raises LLMScheduler.Full: If the queue is full.
+        """
+
+        weight = self.get_weight(weight = weight)
+        if not self.is_busy(weight = weight):
+            self.running += weight
+            self.stats["started"] += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise self.Full(f"LLM queue is full ({len(self.waiters)} waiting)")
+        entry = [priority, next(self.counter), asyncio.get_running_loop().create_future(), weight]
+        heappush(self.waiters, entry)
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self.waiters))
+        start = monotonic()
+        try:
+            position = self.get_position(entry = entry)
+            if on_queued is not None and position >= self.notify_depth:
+                await on_queued(position)
+            await entry[2]
+        except BaseException:
+            if entry[2].done() and not entry[2].cancelled():
+                self.release(weight = weight)
+            else:
+                entry[2].cancel()
+                if entry in self.waiters:
+                    self.waiters.remove(entry)
+                    heapify(self.waiters)
+                    self.wake()
+            self.stats["cancelled"] += 1
+            raise
+        wait = monotonic() - start
+        self.waits += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def release(self, weight: int = 1) -> None:
+        """
+        Free the slots of a reading and give them to the waiting readings.
+
+        :param weight: Number of slots of the reading with default value 1.
+        :type weight: int
+        """
+
+        self.running -= self.get_weight(weight = weight)
+        self.wake()
+
+    def wake(self) -> None:
+        """
+        Give free slots to the waiting readings in the order of the queue while the first of them fits.
+        """
+
+        while self.waiters:
+            entry = self.waiters[0]
+            if entry[2].done():
+                heappop(self.waiters)
+                continue
+            if self.running + entry[3] > self.concurrency:
+                return
+            heappop(self.waiters)
+            self.running += entry[3]
+            entry[2].set_result(None)
+            self.stats["started"] += 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = priority_new, on_queued: Optional[Callable[[int], Awaitable[Any]]] = None, weight: int = 1) -> AsyncIterator[None]:
+        """
+        Hold slots for the requests of one reading.
+
+        :param priority: Priority of the reading with default value priority_new.
+        :type priority: int
+        :param on_queued: Function awaited with the position when the reading has to wait with default value None.
+        :type on_queued: Optional[Callable[[int], Awaitable[Any]]]
+        :param weight: Number of slots (requests sent at once) with default value 1.
+        :type weight: int
+
+        :raises LLMScheduler.Full: If the queue is full.
+        """
+
+        await self.acquire(priority = priority, on_queued = on_queued, weight = weight)
+        try:
+            yield
+        finally:
+            self.release(weight = weight)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the metrics of the queue.
+
+        :return: Slots, taken slots, waiting readings, counters and time spent in the queue.
+        :rtype: Dict[str, Any]
+        """
+
+        stats = dict(self.stats)
+        stats.update({
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "depth": len(self.waiters),
+            "wait": {
+                "avg": self.wait_total / self.waits if self.waits else 0.0,
+                "max": self.wait_max
+            }
+        })
+        return stats
@@ -0,0 +1,80 @@
+"""
+Migrations of the database schema
+"""
+
+from typing import List
+
+from postgresql import Migration
+from .user_stats import trigger_user_stats
+
+# Функция возвращает миграции схемы в порядке версий (новые миграции добавляются в конец)
+
+def migrations() -> List[Migration]:
+    """
+    Returns migrations of the database schema.
+
+    Applied migrations must never be changed, a change of the schema is a new migration with the next version.
+    So the columns of created tables are written out literally (table_users(), table_requests() and table_user_stats() have the current columns).
+
+    :return: Migrations of the database schema.
+    :rtype: List[Migration]
+    """
+
+    return [
+        Migration.create_table(
+            version = 1,
+            table = "users",
+            columns = [
+                "id BIGINT PRIMARY KEY",
+                "username TEXT",
+                "access BOOLEAN NOT NULL",
+                "admin BOOLEAN NOT NULL",
+                "state TEXT"
+            ]
+        ),
+        Migration.create_table(
+            version = 2,
+            table = "requests",
+            columns = [
+                "id serial PRIMARY KEY",
+                "user_id BIGINT",
+                "cards TEXT[] NOT NULL",
+                "request TEXT",
+                "response TEXT"
+            ]
+        ),
+        Migration.create_index(version = 3, table = "requests", columns = ["user_id"]),
+        Migration.create_index(version = 4, table = "requests", columns = ["user_id", "id"]),
+        Migration.create_notify_trigger(version = 5, table = "users"),
+        Migration.create_notify_trigger(version = 6, table = "requests", column = "user_id"),
+        Migration(
+            version = 7,
+            name = "split state of users into kind and parameter",
+            statements = [
+                "ALTER TABLE users ADD COLUMN IF NOT EXISTS state_param INTEGER;",
+                "UPDATE users SET state = split_part(state, '_', 1), state_param = split_part(state, '_', 2)::integer WHERE state ~ '^[a-z]+_[0-9]+$';"
+            ]
+        ),
+        Migration.create_table(
+            version = 8,
+            table = "user_stats",
+            columns = [
+                "user_id BIGINT PRIMARY KEY",
+                "requests INTEGER NOT NULL DEFAULT 0",
+                "last_request_id INTEGER",
+                "last_request_at TIMESTAMPTZ",
+                "spread_sizes JSONB NOT NULL DEFAULT '{}'"
+            ]
+        ),
+        Migration(version = 9, name = "maintain user_stats from requests", statements = trigger_user_stats()),
+        # requests(user_id, id) of version 4 serves the lookups by user_id too
+        Migration.drop_index(version = 10, table = "requests", columns = ["user_id"]),
+        # Версия 7 пропустила состояния с несколькими подчеркиваниями, они делятся по последнему подчеркиванию, как в parse_state
+        Migration(
+            version = 11,
+            name = "split states of users on the last underscore",
+            statements = [
+                "UPDATE users SET state = substring(state from '^(.+)_[0-9]+$'), state_param = substring(state from '_([0-9]+)$')::integer WHERE state ~ '^.+_[0-9]+$' AND state_param IS NULL;"
+            ]
+        )
+    ]
@@ -6,6 +6,8 @@ from typing import Dict
 from typing import Any
 from typing import List
 
+from postgresql import row_class
+
 # Функция возвращает шаблон для запроса в виде словаря
 
 def json_requests() -> Dict[str, Any]:
@@ -43,4 +45,8 @@ def table_requests() -> Dict[str, List[str]]:
             "request TEXT",
             "response TEXT"
         ]
-    }
\ No newline at end of file
+    }
+
+# Класс строки таблицы запросов: строки возвращаются базой без копирования в словари, колонки доступны как row["column"] и row.column
+
+RequestRow = row_class(**table_requests())
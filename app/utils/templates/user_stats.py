@@ -0,0 +1,84 @@
+"""
+User stats table and struct
+"""
+
+from typing import Dict
+from typing import List
+
+from postgresql import row_class
+
+# Функция возвращает название и колонки с типами для таблицы статистики пользователей (одна строка на пользователя, поддерживается триггером таблицы запросов)
+
+def table_user_stats() -> Dict[str, List[str]]:
+    """
+    Returns a dictionary template for creating a user stats table in a database.
+
+    :return: Dictionary template for creating a user stats table.
+    :rtype: Dict[str, str]
+    """
+
+    return {
+        "table": "user_stats",
+        "columns": [
+            "user_id BIGINT PRIMARY KEY",
+            "requests INTEGER NOT NULL DEFAULT 0",
+            "last_request_id INTEGER",
+            "last_request_at TIMESTAMPTZ",
+            "spread_sizes JSONB NOT NULL DEFAULT '{}'"
+        ]
+    }
+
+# Функция возвращает команды, которые заполняют статистику по уже сделанным запросам и вешают на таблицу запросов триггер, обновляющий статистику в той же транзакции, что и вставка запросов
+
+def trigger_user_stats() -> List[str]:
+    """
+    Returns statements maintaining the user stats table from the requests table.
+
+    A statement-level trigger aggregates the inserted requests (one upsert per user even for COPY)
+    in the transaction of the insert. Existing requests are counted once (their time is unknown).
+    Inserts into requests are locked while the statements run, so no request is missed or counted twice.
+
+    :return: SQL statements for one transactional migration.
+    :rtype: List[str]
+    """
+
+    sizes = """SELECT user_id, cardinality(cards) AS size, count(*) AS count, max(id) AS last_id
+        FROM {source}
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, cardinality(cards)"""
+
+    return [
+        "LOCK TABLE requests IN SHARE ROW EXCLUSIVE MODE;",
+        f"""CREATE OR REPLACE FUNCTION update_user_stats() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO user_stats AS s (user_id, requests, last_request_id, last_request_at, spread_sizes)
+    SELECT user_id, sum(count), max(last_id), now(), jsonb_object_agg(size, count)
+    FROM (
+        {sizes.format(source = "inserted")}
+    ) AS sizes
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        requests = s.requests + EXCLUDED.requests,
+        last_request_id = GREATEST(s.last_request_id, EXCLUDED.last_request_id),
+        last_request_at = EXCLUDED.last_request_at,
+        spread_sizes = (
+            SELECT jsonb_object_agg(key, COALESCE((s.spread_sizes ->> key)::integer, 0) + COALESCE((EXCLUDED.spread_sizes ->> key)::integer, 0))
+            FROM jsonb_object_keys(s.spread_sizes || EXCLUDED.spread_sizes) AS key
+        );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;""",
+        "DROP TRIGGER IF EXISTS requests_user_stats ON requests;",
+        "CREATE TRIGGER requests_user_stats AFTER INSERT ON requests REFERENCING NEW TABLE AS inserted FOR EACH STATEMENT EXECUTE FUNCTION update_user_stats();",
+        f"""INSERT INTO user_stats (user_id, requests, last_request_id, spread_sizes)
+    SELECT user_id, sum(count), max(last_id), jsonb_object_agg(size, count)
+    FROM (
+        {sizes.format(source = "requests")}
+    ) AS sizes
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO NOTHING;"""
+    ]
+
+# Класс строки таблицы статистики пользователей: строки возвращаются базой без копирования в словари, колонки доступны как row["column"] и row.column
+
+UserStatsRow = row_class(**table_user_stats())
@@ -1,10 +1,19 @@
 """
 Users table and struct
+
+:var state_cards: Kind of the state of a user who chose a spread, its parameter is the number of cards
+:type state_cards: str
+:var default_spread_size: Number of cards if the user didn't choose a spread
+:type default_spread_size: int
 """
 
 from typing import Dict
 from typing import Any
 from typing import List
+from typing import Optional
+from typing import Tuple
+
+from postgresql import row_class
 
 # Функция возвращает шаблон для пользователя в виде словаря
 
@@ -21,7 +30,8 @@ def json_user() -> Dict[str, Any]:
         "username": "username",
         "access": True,
         "admin": False,
-        "state": "main"
+        "state": "main",
+        "state_param": None
     }
 
 # Функция возвращает название и колонки с типами для таблицы пользователей
@@ -41,6 +51,35 @@ def table_users() -> Dict[str, List[str]]:
             "username TEXT",
             "access BOOLEAN NOT NULL",
             "admin BOOLEAN NOT NULL",
-            "state TEXT"
+            "state TEXT",
+            "state_param INTEGER"
         ]
-    }
\ No newline at end of file
+    }
+
+# Вид состояния пользователя, выбравшего расклад (параметр состояния - число карт), и число карт по умолчанию
+
+state_cards = "cards"
+default_spread_size = 5
+
+# Функция разбирает имя состояния из веб-приложения ('cards_5') на вид и целочисленный параметр
+
+def parse_state(value: str) -> Tuple[str, Optional[int]]:
+    """
+    Splits a state name of the web app into the kind and the integer parameter.
+
+    Example: parse_state("cards_5") == ("cards", 5), parse_state("main") == ("main", None)
+
+    :param value: State name.
+    :type value: str
+    :return: Kind of the state and its parameter (None if there is none).
+    :rtype: Tuple[str, Optional[int]]
+    """
+
+    kind, _, param = value.rpartition("_")
+    if kind and param.isdigit():
+        return kind, int(param)
+    return value, None
+
+# Класс строки таблицы пользователей: строки возвращаются базой без копирования в словари, колонки доступны как row["column"] и row.column
+
+UserRow = row_class(**table_users())
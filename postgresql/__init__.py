@@ -8,4 +8,11 @@ Module for creating a BD object
 #from .core.config import DefaultPostgreSQLConfig
 #default_postgresql_cfg = DefaultPostgreSQLConfig()
 
-from .model import ClientPostgreSQL
\ No newline at end of file
+from .model import ClientPostgreSQL
+from .model import Migration
+from .model import MigrationRunner
+from .model import Row
+from .model import row_class
+from .model import RowOverlay
+from .model import get_column_types
+from .model import WriteBehind
@@ -2,4 +2,12 @@
 Module for classes (models) responsible for interaction with DB
 """
 
-from .client import ClientPostgreSQL
\ No newline at end of file
+from .client import ClientPostgreSQL
+from .client import UnitOfWork
+from .migrations import Migration
+from .migrations import MigrationRunner
+from .rows import Row
+from .rows import row_class
+from .rows import RowOverlay
+from .rows import get_column_types
+from .write_behind import WriteBehind
@@ -10,14 +10,196 @@ creating tables, appending items, updating items, deleting items, and managing a
 import asyncpg
 import asyncio
 import logging
+import reprlib
+
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from itertools import chain
+from itertools import islice
+from random import random
+from time import perf_counter
+from time import monotonic
 
 from typing import Dict
 from typing import Any
 from typing import List
 from typing import Optional
+from typing import Tuple
+from typing import Callable
+from typing import Iterable
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Type
+from typing import Union
 
 from utils.helper import get_log
 from utils.helper import isInt
+from .stats import ClientStats
+from .resilience import CircuitBreaker
+from .resilience import classify_error
+from .resilience import get_backoff
+from .rows import Row
+
+class UnitOfWork(object):
+    """
+    Connection pinned by ClientPostgreSQL.unit_of_work() for a sequence of operations.
+
+    :ivar client: Client that opened the unit of work.
+    :type client: ClientPostgreSQL
+    :ivar connection: Connection inside the transaction of the unit of work.
+    :type connection: asyncpg.connection.Connection
+    :ivar failed: An operation failed, so the unit of work will be rolled back.
+    :type failed: bool
+    :ivar callbacks: Functions called after the commit (e.g. updating caches with the written values).
+    :type callbacks: List[Callable[[], Any]]
+    """
+
+    def __init__(self, client: 'ClientPostgreSQL', connection: asyncpg.connection.Connection) -> None:
+        """
+        Initialization UnitOfWork object.
+
+        :param client: Client that opened the unit of work.
+        :type client: ClientPostgreSQL
+        :param connection: Connection inside the transaction of the unit of work.
+        :type connection: asyncpg.connection.Connection
+        """
+
+        self.client = client
+        self.connection = connection
+        self.failed = False
+        self.callbacks = []
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """
+        Call a function after the unit of work is committed (it's not called on rollback).
+
+        :param callback: Function without arguments.
+        :type callback: Callable[[], Any]
+        """
+
+        self.callbacks.append(callback)
+
+class QueryTrace(object):
+    """
+    Log message of a query, formatted only when the logging record is emitted.
+
+    Arguments and results are shortened with reprlib, so a large result is never turned into a string as a whole.
+
+    :ivar s: Mood of the log (see get_log).
+    :type s: str
+    :ivar title: Text before the fields.
+    :type title: str
+    :ivar fields: Fields of the message (query, args, result, ...).
+    :type fields: Dict[str, Any]
+    :ivar max_payload: Maximum length of each field in the message.
+    :type max_payload: int
+    """
+
+    __slots__ = ("s", "title", "fields", "max_payload")
+
+    def __init__(self, s: str, title: str, fields: Dict[str, Any], max_payload: int) -> None:
+        """
+        Initialization QueryTrace object.
+
+        :param s: Mood of the log (see get_log).
+        :type s: str
+        :param title: Text before the fields.
+        :type title: str
+        :param fields: Fields of the message (query, args, result, ...).
+        :type fields: Dict[str, Any]
+        :param max_payload: Maximum length of each field in the message.
+        :type max_payload: int
+        """
+
+        self.s = s
+        self.title = title
+        self.fields = fields
+        self.max_payload = max_payload
+
+    @staticmethod
+    def truncate(value: Any, max_payload: int) -> str:
+        """
+        Get a shortened representation of the value.
+
+        :param value: Value to represent (SQL is kept as is, other values are shortened by reprlib).
+        :type value: Any
+        :param max_payload: Maximum length of the representation.
+        :type max_payload: int
+        :return: Representation not longer than max_payload (plus the number of cut characters).
+        :rtype: str
+        """
+
+        if isinstance(value, str):
+            text = value
+        else:
+            short = reprlib.Repr()
+            short.maxstring = short.maxother = max_payload
+            text = short.repr(value)
+        if len(text) > max_payload:
+            text = f"{text[:max_payload]}... (+{len(text) - max_payload} chars)"
+        return text
+
+    def __str__(self) -> str:
+        """
+        Format the message.
+
+        :return: Message in the form: [s] title<field>: value, ...
+        :rtype: str
+        """
+
+        payload = ", ".join(f"<{key}>: {self.truncate(value = value, max_payload = self.max_payload)}" for key, value in self.fields.items())
+        return get_log(self.s, f"{self.title}{payload}")
+
+class Replica(object):
+    """
+    Pool of a read replica and its replication lag.
+
+    :ivar index: Number of the replica in the configuration.
+    :type index: int
+    :ivar dsn: Connection string of the replica.
+    :type dsn: str
+    :ivar pool: Connection pool of the replica (None if it couldn't be created).
+    :type pool: Optional[asyncpg.Pool]
+    :ivar lag: Last measured replication lag in seconds.
+    :type lag: Optional[float]
+    :ivar healthy: The replica answered and its lag is acceptable.
+    :type healthy: bool
+    :ivar checked_at: Time of the last check (time.monotonic()).
+    :type checked_at: Optional[float]
+    """
+
+    def __init__(self, index: int, dsn: str) -> None:
+        """
+        Initialization Replica object.
+
+        :param index: Number of the replica in the configuration.
+        :type index: int
+        :param dsn: Connection string of the replica.
+        :type dsn: str
+        """
+
+        self.index = index
+        self.dsn = dsn
+        self.pool = None
+        self.lag = None
+        self.healthy = False
+        self.checked_at = None
+
+# Текущая единица работы (своя у каждой задачи asyncio)
+
+current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("current_unit_of_work", default = None)
+
+# Время последней записи в текущей задаче (после записи чтения идут в основную базу)
+
+last_write: ContextVar[Optional[float]] = ContextVar("last_write", default = None)
+
+# Запрос задержки репликации в секундах (0, если реплика получила весь WAL или это не реплика)
+
+replica_lag_query = """SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END::float8"""
 
 class ClientPostgreSQL(object):
     """
@@ -29,6 +211,38 @@ class ClientPostgreSQL(object):
     :type params: Dict[str, Any]
     :ivar logger: Logger for recording events.
     :type logger: Optional[logging.Logger]
+    :ivar queries: Generated SQL memoized by query shape (operation, table, columns, where keys).
+    :type queries: Dict[Tuple[Any, ...], str]
+    :ivar cache_stats: Hit/miss counters of the query shape cache.
+    :type cache_stats: Dict[str, int]
+    :ivar stats: Pool acquire wait, per query shape latency/row-count histograms and error counters.
+    :type stats: ClientStats
+    :ivar slow_query_seconds: Queries slower than this are always logged as warnings (0 disables).
+    :type slow_query_seconds: float
+    :ivar sample_rate: Share of other queries logged at DEBUG level (0..1).
+    :type sample_rate: float
+    :ivar max_payload: Maximum length of the query, arguments and result in a log message.
+    :type max_payload: int
+    :ivar replicas: Read replicas, reads are routed to them.
+    :type replicas: List[Replica]
+    :ivar replica_max_lag: Replicas lagging more are skipped, reads within this time after a write go to the primary.
+    :type replica_max_lag: float
+    :ivar replica_check_interval: Seconds between checks of the replication lag.
+    :type replica_check_interval: float
+    :ivar retry_attempts: Retries of a transient error (see retry).
+    :type retry_attempts: int
+    :ivar breaker: Circuit breaker failing fast while the database is down.
+    :type breaker: CircuitBreaker
+    :ivar listeners: Callbacks of LISTEN subscriptions by channels.
+    :type listeners: Dict[str, List[Callable[[Optional[str]], Any]]]
+    :ivar listen_connection: Dedicated connection of the LISTEN subscriptions (outside the pool).
+    :type listen_connection: Optional[asyncpg.connection.Connection]
+    :ivar listen_task: Task reconnecting the lost connection of the subscriptions.
+    :type listen_task: Optional[asyncio.Task]
+    :ivar listen_reconnects: Number of reconnections of the subscriptions.
+    :type listen_reconnects: int
+    :ivar backend_pids: Server process ids of the open pooled connections (their notifications are skipped).
+    :type backend_pids: Set[int]
     """
 
     class Error(Exception):
@@ -50,7 +264,27 @@ class ClientPostgreSQL(object):
             super().__init__(message)
             self.message = message
 
-    def __init__(self, params: Dict[str, Any], logger: Optional[logging.Logger] = None) -> None:
+    class Unavailable(Exception):
+        """
+        The database is unavailable: a connection or serialization error persisted after retries,
+        or the circuit breaker is open. Unlike an empty result, it doesn't mean the item wasn't found.
+
+        :ivar message: message of error
+        :type message: str
+        """
+
+        def __init__(self, message: str):
+            """
+            Initialization Unavailable object.
+
+            :param message: message of error
+            :type message: str
+            """
+
+            super().__init__(message)
+            self.message = message
+
+    def __init__(self, params: Dict[str, Any], logger: Optional[logging.Logger] = None, trace_params: Dict[str, Any] = {}) -> None:
         """
         Initialization Error object.
 
@@ -58,21 +292,47 @@ class ClientPostgreSQL(object):
         :type params: Dict[str, Any]
         :param logger: object for logging with default value None
         :type logger: Optional[logging.Logger]
+        :param trace_params: slow_query_seconds, sample_rate and max_payload of the query log with default value {}
+        :type trace_params: Dict[str, Any]
         """
 
         self.params = params
 
         for x in self.params.keys():
             try:
-                if x in ['min_size', 'max_size', 'max_queries']:
+                if x in ['min_size', 'max_size', 'max_queries', 'statement_cache_size']:
                     self.params[x] = int(self.params[x].get_secret_value())
                 else:
                     self.params[x] = self.params[x].get_secret_value()
             except AttributeError:
                 pass
 
+        replicas = self.params.pop("replicas", "") or ""
+        self.replicas = [Replica(index = index, dsn = dsn.strip()) for index, dsn in enumerate(replicas.split(",")) if dsn.strip()]
+        self.replica_max_lag = float(self.params.pop("replica_max_lag", 1.0))
+        self.replica_check_interval = float(self.params.pop("replica_check_interval", 5.0))
+        self.retry_attempts = int(self.params.pop("retry_attempts", 3))
+        self.breaker = CircuitBreaker(threshold = int(self.params.pop("breaker_threshold", 5)), reset_timeout = float(self.params.pop("breaker_reset_timeout", 10.0)))
+
         self.pool = None
         self.logger = logger
+        self.queries = {}
+        self.cache_stats = {
+            "query_hits": 0,
+            "query_misses": 0
+        }
+        self.stats = ClientStats()
+
+        trace_params = {key: getattr(value, "get_secret_value", lambda: value)() for key, value in trace_params.items()}
+        self.slow_query_seconds = float(trace_params.get("slow_query_seconds", 0.5))
+        self.sample_rate = float(trace_params.get("sample_rate", 1.0))
+        self.max_payload = int(trace_params.get("max_payload", 1000))
+
+        self.listeners = {}
+        self.listen_connection = None
+        self.listen_task = None
+        self.listen_reconnects = 0
+        self.backend_pids = set()
 
     def __setattr__(self, key: Any, value: Any) -> None:
         """
@@ -86,82 +346,565 @@ class ClientPostgreSQL(object):
 
         self.__dict__[key] = value
 
-    async def execute(self, query: str, args: List[Any] = []) -> Optional[str]:
+    def trace(self, seconds: Optional[float], **fields: Any) -> None:
         """
-        Executes a SQL query with optional parameters.
+        Log a finished query.
+
+        A query slower than slow_query_seconds is always logged as a warning,
+        other queries are logged at DEBUG level with probability sample_rate.
+        The message is formatted only if it's emitted.
+
+        :param seconds: Latency of the query or None if it failed.
+        :type seconds: Optional[float]
+        :param fields: Fields of the message (query, args, result, ...).
+        :type fields: Any
+        """
+
+        if not self.logger:
+            return
+        if seconds is not None and 0 < self.slow_query_seconds <= seconds:
+            self.logger.warning("%s", QueryTrace('!', f"Slow query ({seconds * 1000:.1f} ms) ", fields, self.max_payload))
+        elif self.logger.isEnabledFor(logging.DEBUG) and random() < self.sample_rate:
+            self.logger.debug("%s", QueryTrace('+', "", fields, self.max_payload))
+
+    def get_query(self, shape: Tuple[Any, ...], build: Callable[[], str]) -> str:
+        """
+        Get the SQL for a query shape, building it only on the first call.
+
+        :param shape: Hashable description of the query (operation, table, columns, where keys).
+        :type shape: Tuple[Any, ...]
+        :param build: Function that builds the SQL for this shape.
+        :type build: Callable[[], str]
+        :return: SQL of the query.
+        :rtype: str
+        """
+
+        query = self.queries.get(shape)
+        if query is None:
+            query = self.queries[shape] = build()
+            self.cache_stats["query_misses"] += 1
+        else:
+            self.cache_stats["query_hits"] += 1
+        return query
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Get counters of the query shape cache.
+
+        Memoized SQL is byte-identical for a shape, so it's parsed once per connection by the statement cache
+        of asyncpg, which doesn't report its hits.
+
+        :return: Hit/miss counters and the number of cached shapes.
+        :rtype: Dict[str, int]
+        """
+
+        stats = dict(self.cache_stats)
+        stats["queries"] = len(self.queries)
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get instrumentation of the client for publishing (bot command, API route).
+
+        :return: Pool gauges, acquire wait histogram, per query shape histograms, error and cache counters.
+        :rtype: Dict[str, Any]
+        """
+
+        stats = self.stats.to_dict()
+        stats["pool"] = {}
+        if self.pool is not None:
+            size = self.pool.get_size()
+            idle = self.pool.get_idle_size()
+            stats["pool"] = {
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size(),
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle
+            }
+        stats["replicas"] = [
+            {
+                "index": replica.index,
+                "healthy": replica.healthy,
+                "lag": replica.lag,
+                "size": replica.pool.get_size() if replica.pool is not None else 0,
+                "idle": replica.pool.get_idle_size() if replica.pool is not None else 0
+            }
+            for replica in self.replicas
+        ]
+        stats["breaker"] = self.breaker.to_dict()
+        stats["listen"] = {
+            "connected": self.listen_connection is not None,
+            "channels": sorted(self.listeners),
+            "reconnects": self.listen_reconnects
+        }
+        stats["cache"] = self.get_cache_stats()
+        return stats
+
+    @staticmethod
+    def get_query_name(query: str, prepared: bool = False) -> str:
+        """
+        Get the shape of a query for the stats.
+
+        Memoized queries are recorded by their SQL, other queries by their first keyword
+        (their SQL may contain interpolated values).
+
+        :param query: SQL of the query.
+        :type query: str
+        :param prepared: The query is memoized by shape.
+        :type prepared: bool
+        :return: Name of the query shape.
+        :rtype: str
+        """
+
+        if prepared:
+            return query
+        words = query.split(None, 1)
+        return words[0].upper() if words else ""
+
+    def track_backend(self, connection: asyncpg.connection.Connection) -> None:
+        """
+        Remember the server process id of a pooled connection until the connection is closed.
+
+        The id is forgotten by a termination listener (the pool closes connections after max_queries,
+        max_inactive_connection_lifetime or a lost connection), so a process id reused by the server
+        for a backend of another process doesn't hide its notifications.
+
+        :param connection: Acquired connection of the primary pool.
+        :type connection: asyncpg.connection.Connection
+        """
+
+        pid = connection.get_server_pid()
+        if pid not in self.backend_pids:
+            self.backend_pids.add(pid)
+            connection.add_termination_listener(lambda connection, pid = pid: self.backend_pids.discard(pid))
+
+    @asynccontextmanager
+    async def acquire_from_pool(self, pool: Optional[asyncpg.Pool] = None) -> AsyncIterator[asyncpg.connection.Connection]:
+        """
+        Acquire a connection from the pool and record the wait.
+
+        :param pool: Pool of a replica with default value None (the primary).
+        :type pool: Optional[asyncpg.Pool]
+        :return: Acquired connection.
+        :rtype: AsyncIterator[asyncpg.connection.Connection]
+        """
+
+        start = perf_counter()
+        async with (pool or self.pool).acquire() as connection:
+            self.stats.observe_acquire(perf_counter() - start)
+            if pool is None:
+                self.track_backend(connection = connection)
+            yield connection
+
+    async def check_replica(self, replica: Replica) -> bool:
+        """
+        Check whether a replica can serve reads, measuring its lag at most once per replica_check_interval.
+
+        :param replica: Checked replica.
+        :type replica: Replica
+        :return: The replica answers and lags no more than replica_max_lag.
+        :rtype: bool
+        """
+
+        if replica.pool is None:
+            return False
+        now = monotonic()
+        if replica.checked_at is not None and now - replica.checked_at < self.replica_check_interval:
+            return replica.healthy
+        replica.checked_at = now
+        try:
+            async with replica.pool.acquire() as connection:
+                replica.lag = await connection.fetchval(replica_lag_query)
+            replica.healthy = replica.lag <= self.replica_max_lag
+            if not replica.healthy:
+                self.logger.warning(get_log('-', f"Replica {replica.index} lags {replica.lag:.1f} s, reads go to the primary")) if self.logger else None
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            replica.healthy = False
+            self.logger.error(get_log('-', f"Replica {replica.index} is unavailable: {e}")) if self.logger else None
+        return replica.healthy
+
+    async def get_replica(self) -> Optional[Replica]:
+        """
+        Choose a replica for a read (round robin over healthy replicas).
+
+        Reads within replica_max_lag seconds after a write of the current task stay on the primary,
+        so the task reads its own writes.
+
+        :return: Replica or None if the read must go to the primary.
+        :rtype: Optional[Replica]
+        """
+
+        if not self.replicas:
+            return None
+        written = last_write.get()
+        if written is not None and monotonic() - written < self.replica_max_lag:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[0]
+            self.replicas.append(self.replicas.pop(0))
+            if await self.check_replica(replica = replica):
+                return replica
+        return None
+
+    def get_unit_of_work(self) -> Optional[UnitOfWork]:
+        """
+        Get the unit of work of this client opened in the current task.
+
+        :return: Current unit of work or None.
+        :rtype: Optional[UnitOfWork]
+        """
+
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None and unit_of_work.client is self:
+            return unit_of_work
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, connection: Optional[asyncpg.connection.Connection] = None, readonly: bool = False) -> AsyncIterator[asyncpg.connection.Connection]:
+        """
+        Acquire a connection from the pool, or reuse the given one or the one of the current unit of work.
+
+        Read-only operations go to a replica if there is a healthy one (see get_replica),
+        other operations go to the primary and are remembered as writes of the current task.
+
+        :param connection: Already acquired connection with default value None.
+        :type connection: Optional[asyncpg.connection.Connection]
+        :param readonly: The operation only reads with default value False.
+        :type readonly: bool
+        :return: Connection for the queries.
+        :rtype: AsyncIterator[asyncpg.connection.Connection]
+
+        :raises asyncpg.PostgresError: If there is an error during the PostgreSQL execution (marks the unit of work as failed).
+        """
+
+        unit_of_work = self.get_unit_of_work()
+        if not readonly:
+            last_write.set(monotonic())
+        if connection is not None:
+            yield connection
+        elif unit_of_work is not None:
+            try:
+                yield unit_of_work.connection
+            except asyncpg.PostgresError:
+                unit_of_work.failed = True
+                raise
+        else:
+            replica = await self.get_replica() if readonly else None
+            async with AsyncExitStack() as stack:
+                connection = None
+                if replica is not None:
+                    try:
+                        connection = await stack.enter_async_context(self.acquire_from_pool(pool = replica.pool))
+                    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                        replica.healthy = False
+                        self.logger.error(get_log('-', f"Replica {replica.index} is unavailable: {e}")) if self.logger else None
+                if connection is None:
+                    connection = await stack.enter_async_context(self.acquire_from_pool())
+                yield connection
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[UnitOfWork]:
+        """
+        Pin one connection and one transaction for a sequence of operations.
+
+        Every method of the client called inside the block (in the same task) runs on this connection
+        and the transaction is committed once at the end. If an operation failed or an exception was raised,
+        the transaction is rolled back. A nested unit_of_work() joins the outer one.
+        Operations inside the block must not run concurrently (e.g. with asyncio.gather).
+
+        Example: async with bd.unit_of_work() as tx: await bd.update_item(...)
+
+        :return: Current unit of work.
+        :rtype: AsyncIterator[UnitOfWork]
+
+        :raises Unavailable: If the database is unavailable (the whole unit of work may be repeated later).
+        """
+
+        unit_of_work = self.get_unit_of_work()
+        if unit_of_work is not None:
+            yield unit_of_work
+            return
+
+        if not self.breaker.allow():
+            raise self.Unavailable("Database is unavailable (circuit breaker is open), <unit of work>")
+        stack = AsyncExitStack()
+        try:
+            connection = await stack.enter_async_context(self.acquire_from_pool())
+            transaction = connection.transaction()
+            await transaction.start()
+        except Exception as e:
+            await stack.aclose()
+            if classify_error(e) != "connection":
+                self.breaker.trial = False
+                raise
+            self.breaker.record_failure()
+            raise self.Unavailable(f"Database is unavailable ({e})") from e
+        self.breaker.record_success()
+
+        async with stack:
+            unit_of_work = UnitOfWork(client = self, connection = connection)
+            token = current_unit_of_work.set(unit_of_work)
+            try:
+                yield unit_of_work
+            except BaseException:
+                try:
+                    await transaction.rollback()
+                except Exception as e:
+                    if classify_error(e) != "connection":
+                        raise
+                    self.logger.error(get_log('-', f"Unit of work wasn't rolled back, connection is lost: {e}")) if self.logger else None
+                raise
+            else:
+                if unit_of_work.failed:
+                    await transaction.rollback()
+                    self.logger.warning(get_log('-', "Unit of work was rolled back")) if self.logger else None
+                else:
+                    await transaction.commit()
+                    for callback in unit_of_work.callbacks:
+                        callback()
+            finally:
+                current_unit_of_work.reset(token)
+
+    @asynccontextmanager
+    async def snapshot(self) -> AsyncIterator[asyncpg.connection.Connection]:
+        """
+        Pin a connection in a read-only REPEATABLE READ transaction.
+
+        Reads passed this connection see one consistent snapshot of the database.
+        Single reads don't need it: fetch and fetchrow run in autocommit.
+        The snapshot is taken on a replica unless the current task has just written (see get_replica).
+
+        Example: async with bd.snapshot() as connection: await bd.fetch(query, connection = connection)
+
+        :return: Connection inside the snapshot transaction.
+        :rtype: AsyncIterator[asyncpg.connection.Connection]
+        """
+
+        replica = await self.get_replica()
+        async with self.acquire_from_pool(pool = replica.pool if replica is not None else None) as connection:
+            async with connection.transaction(isolation = "repeatable_read", readonly = True):
+                yield connection
+
+    @staticmethod
+    def get_where_query(keys: Tuple[str, ...], start: int = 0) -> str:
+        """
+        Build the WHERE clause for equality on the given columns.
+
+        :param keys: Columns of the conditions.
+        :type keys: Tuple[str, ...]
+        :param start: Number of query arguments placed before the conditions.
+        :type start: int
+        :return: WHERE clause or empty string if there are no conditions.
+        :rtype: str
+        """
+
+        if not keys:
+            return ""
+        return " WHERE " + " AND ".join(f"{key} = ${start + index + 1}" for index, key in enumerate(keys))
+
+    async def retry(self, operation: Callable[[], Awaitable[Any]], name: str, idempotent: Callable[[], bool]) -> Any:
+        """
+        Run a database operation with retries of transient errors behind the circuit breaker.
+
+        Serialization failures and deadlocks are retried (the transaction was rolled back),
+        connection errors are retried only if idempotent() is True (the statement wasn't sent or only reads).
+        Nothing is retried inside a unit of work: it must be repeated as a whole.
+
+        :param operation: Coroutine function running the operation.
+        :type operation: Callable[[], Awaitable[Any]]
+        :param name: Query shape for the stats.
+        :type name: str
+        :param idempotent: Function telling whether the failed attempt can be repeated after a connection error.
+        :type idempotent: Callable[[], bool]
+        :return: Result of the operation.
+        :rtype: Any
+
+        :raises Unavailable: If the breaker is open or the transient error persists.
+        :raises asyncpg.PostgresError: If the operation failed with a permanent error.
+        """
+
+        if not self.breaker.allow():
+            raise self.Unavailable(f"Database is unavailable (circuit breaker is open), <query>: {name}")
+        attempt = 0
+        while True:
+            try:
+                result = await operation()
+            except asyncio.CancelledError:
+                self.breaker.trial = False
+                raise
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None:
+                    if isinstance(e, asyncpg.PostgresError):
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.trial = False
+                    raise
+                self.stats.observe_error(error = e, name = name)
+                if kind == "connection":
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                retryable = self.get_unit_of_work() is None and attempt < self.retry_attempts and (kind == "serialization" or idempotent())
+                if not retryable or not self.breaker.allow():
+                    self.logger.error(get_log('-', f"{kind} error after {attempt + 1} attempts: {e}")) if self.logger else None
+                    raise self.Unavailable(f"Database is unavailable ({e})") from e
+                self.stats.observe_retry(kind = kind)
+                delay = get_backoff(attempt = attempt)
+                self.logger.warning(get_log('?', f"Retry {attempt + 1} in {delay * 1000:.0f} ms after {kind} error: {e}")) if self.logger else None
+                await asyncio.sleep(delay)
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def execute(self, query: str, args: List[Any] = [], prepared: bool = False) -> Optional[str]:
+        """
+        Executes a SQL query with optional parameters in a transaction (or in the current unit of work).
 
         :param query: The SQL query to execute.
         :param args: List of parameters to substitute into the query.
+        :param prepared: The query is memoized by shape (recorded in the stats by its SQL).
         :return: The result of the query, if any.
         :rtype: Optional[str]
         
         :raises asyncpg.PostgresError: If there is an error during the PostgreSQL execution.
+        :raises Unavailable: If the database is unavailable (see retry).
         """
 
         result = None
-        try:
-            async with self.pool.acquire() as connection:
-                async with connection.transaction():
+        seconds = None
+        sent = False
+        name = self.get_query_name(query = query, prepared = prepared)
+
+        async def operation() -> str:
+            nonlocal seconds, sent
+            sent = False
+            async with self.acquire() as connection:
+                sent = True
+                start = perf_counter()
+                if connection.is_in_transaction():
                     result = await connection.execute(query, *args)
+                else:
+                    async with connection.transaction():
+                        result = await connection.execute(query, *args)
+                seconds = perf_counter() - start
+                rows = result.split()[-1] if result else ""
+                self.stats.observe_query(name = name, seconds = seconds, rows = int(rows) if rows.isdigit() else None)
+            return result
+
+        try:
+            result = await self.retry(operation = operation, name = name, idempotent = lambda: not sent)
         except asyncpg.PostgresError as e:
+            self.stats.observe_error(error = e, name = name)
             self.logger.error(get_log('-', e)) if self.logger else None
-        self.logger.debug(get_log('+', f"<query>: {query}, <args>: {args}, <result>: {result}")) if self.logger else None
+        self.trace(seconds, query = query, args = args, result = result)
 
         return result
 
-    async def fetch(self, query: str, args: List[Any] = []) -> Optional[List[Dict[Any, Any]]]:
+    async def fetch(self, query: str, args: List[Any] = [], prepared: bool = False, connection: Optional[asyncpg.connection.Connection] = None, readonly: bool = False, record_class: Optional[Type[Row]] = None) -> Optional[List[Any]]:
         """
         Fetch results for a query.
 
+        The query runs in autocommit (no BEGIN/COMMIT round trips), which is atomic for a single statement.
+
         :param query: PostgreSQL query.
         :type query: str
         :param args: List of arguments for the query with default value [].
         :type args: List[Any]
-        :return: List of dictionaries representing the query results.
-        :rtype: Optional[List[Dict[Any, Any]]]
+        :param prepared: The query is memoized by shape (recorded in the stats by its SQL).
+        :type prepared: bool
+        :param connection: Connection to run the query on (e.g. from snapshot()) with default value None.
+        :type connection: Optional[asyncpg.connection.Connection]
+        :param readonly: The query only reads and may go to a replica with default value False.
+        :type readonly: bool
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: List of dictionaries (or rows of record_class) representing the query results.
+        :rtype: Optional[List[Any]]
 
         :raises Error: If there is an error fetching results.
+        :raises Unavailable: If the database is unavailable (see retry).
         """
 
         results = None
+        seconds = None
+        sent = False
+        name = self.get_query_name(query = query, prepared = prepared)
+
+        async def operation() -> List[Any]:
+            nonlocal seconds, sent
+            sent = False
+            async with self.acquire(connection = connection, readonly = readonly) as acquired:
+                sent = True
+                start = perf_counter()
+                results = await acquired.fetch(query, *args, record_class = record_class)
+                seconds = perf_counter() - start
+                self.stats.observe_query(name = name, seconds = seconds, rows = len(results))
+                if results and record_class is None:
+                    results = [dict(result) for result in results]
+            return results
+
         try:
-            async with self.pool.acquire() as connection:
-                async with connection.transaction():
-                    results = await connection.fetch(query, *args)
-                    if results:
-                        results = [dict(result) for result in results]
+            results = await self.retry(operation = operation, name = name, idempotent = lambda: readonly or not sent)
         except asyncpg.PostgresError as e:
+            self.stats.observe_error(error = e, name = name)
             self.logger.error(get_log('-', e)) if self.logger else None
-        self.logger.debug(get_log('+', f"<query>: {query}, <args>: {args}, <result>: {results}")) if self.logger else None
+        self.trace(seconds, query = query, args = args, result = results)
 
         return results
 
-    async def fetchrow(self, query: str, args: List[Any] = []) -> Optional[Dict[Any, Any]]:
+    async def fetchrow(self, query: str, args: List[Any] = [], prepared: bool = False, connection: Optional[asyncpg.connection.Connection] = None, readonly: bool = False, record_class: Optional[Type[Row]] = None) -> Optional[Any]:
         """
         Execute a PostgreSQL query and fetch a single row as a dictionary.
 
+        The query runs in autocommit (no BEGIN/COMMIT round trips), which is atomic for a single statement.
+
         :param query: The PostgreSQL query to execute.
         :type query: str
         :param args: A list of arguments to replace placeholders in the query.
         :type args: List[Any]
-        :return: A dictionary representing the fetched row, or None if no rows are returned.
-        :rtype: Optional[Dict[Any, Any]]
+        :param prepared: The query is memoized by shape (recorded in the stats by its SQL).
+        :type prepared: bool
+        :param connection: Connection to run the query on (e.g. from snapshot()) with default value None.
+        :type connection: Optional[asyncpg.connection.Connection]
+        :param readonly: The query only reads and may go to a replica with default value False.
+        :type readonly: bool
+        :param record_class: Row class (see rows.row_class) to return the row without copying it into a dictionary with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: A dictionary representing the fetched row ({} if no rows are returned),
+                 or a row of record_class (None if no rows are returned).
+        :rtype: Optional[Any]
 
         :raises asyncpg.PostgresError: If an error occurs while executing the query.
+        :raises Unavailable: If the database is unavailable (see retry).
         """
 
         result = None
+        seconds = None
+        sent = False
+        name = self.get_query_name(query = query, prepared = prepared)
+
+        async def operation() -> Optional[Any]:
+            nonlocal seconds, sent
+            sent = False
+            async with self.acquire(connection = connection, readonly = readonly) as acquired:
+                sent = True
+                start = perf_counter()
+                result = await acquired.fetchrow(query, *args, record_class = record_class)
+                seconds = perf_counter() - start
+                self.stats.observe_query(name = name, seconds = seconds, rows = 1 if result else 0)
+                if record_class is None:
+                    result = dict(result) if result else {}
+            return result
+
         try:
-            async with self.pool.acquire() as connection:
-                async with connection.transaction():
-                    result = await connection.fetchrow(query, *args)
-                    if result:
-                        result = dict(result)
-                    else:
-                        result = {}
+            result = await self.retry(operation = operation, name = name, idempotent = lambda: readonly or not sent)
         except asyncpg.PostgresError as e:
+            self.stats.observe_error(error = e, name = name)
             self.logger.error(get_log('-', e)) if self.logger else None
-        self.logger.debug(get_log('+', f"<query>: {query}, <args>: {args}, <result>: {result}")) if self.logger else None
+        self.trace(seconds, query = query, args = args, result = result)
 
         return result
 
@@ -177,8 +920,8 @@ class ClientPostgreSQL(object):
 
         result = None
         database = self.params["database"]
-        query = f"SELECT * FROM information_schema.tables WHERE table_name = '{table}' AND table_catalog = '{database}';"
-        result = await self.fetch(query = query)
+        query = "SELECT * FROM information_schema.tables WHERE table_name = $1 AND table_catalog = $2;"
+        result = await self.fetch(query = query, args = [table, database])
         if result:
             self.logger.info(get_log('+', f"Table '{table}' was detected")) if self.logger else None
         return result
@@ -251,26 +994,18 @@ class ClientPostgreSQL(object):
                         else:
                             by_values[column] = item[column]
                 if not check_twin_colums or not await self.get_items(table=table, columns=["id"], by_values=by_values):
-                    values_query = []
-                    args = []
-                    variables_query = []
-                    returning_query = []
-                    for key, value in item.items():
-                        args.append(value)
-                        values_query.append(f"${len(args)}")
-                        variables_query.append(key)
-
-                    for column in returning_columns:
-                        returning_query.append(column)
-                    returning_query = " RETURNING " + ", ".join(returning_query) if returning_query else ""
-                    variables_query = ", ".join(variables_query)
-                    values_query = f"VALUES({', '.join(values_query)})"
-                    query = f"INSERT INTO {table} ({variables_query}) {values_query}{returning_query};"
-                    results = await self.fetch(query = query, args = args)
+                    columns = tuple(item.keys())
+                    returning = tuple(returning_columns)
+
+                    def build() -> str:
+                        values_query = ", ".join(f"${index + 1}" for index in range(len(columns)))
+                        returning_query = " RETURNING " + ", ".join(returning) if returning else ""
+                        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES({values_query}){returning_query};"
+
+                    query = self.get_query(shape = ("insert", table, columns, returning), build = build)
+                    results = await self.fetch(query = query, args = list(item.values()), prepared = True)
                     if results:
                         self.logger.info(get_log('+', f"Append item in {table}: {item}")) if self.logger else None
-                        if results != []:
-                            results = [dict(result) for result in results]
                 else:
                     self.logger.info(get_log('?', f"Impossible to append item in {table}: {item} will be Twin by columns {check_twin_colums}!")) if self.logger else None
             else:
@@ -279,7 +1014,134 @@ class ClientPostgreSQL(object):
             self.logger.warning(get_log('-', e)) if self.logger else None
         return results
 
-    async def get_items(self, table: str, columns: List[str] = [], by_values: Dict[str, Any] = {}) -> Optional[List[Dict[str, Any]]]:
+    async def append_items(self, table: str, items: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None) -> Optional[int]:
+        """
+        Append many items to the specified table with binary COPY.
+
+        Columns are taken from the first item, every item must have the same keys.
+        Each chunk is copied in its own transaction, so a failed chunk doesn't roll back the previous ones.
+        Every chunk goes through retry: a chunk is repeated only if it wasn't committed (see retry),
+        the copied chunks are never repeated.
+
+        :param table: Table name.
+        :type table: str
+        :param items: Dictionaries representing the items to be appended.
+        :type items: Iterable[Dict[str, Any]]
+        :param chunk_size: Maximum number of items in one COPY with default value None (all items at once).
+        :type chunk_size: Optional[int]
+        :return: Number of appended items or None on error.
+        :rtype: Optional[int]
+
+        :raises Error: If there is an error during the execution of the method.
+        :raises Unavailable: If the database is unavailable (see retry), the chunks copied before stay appended.
+        """
+
+        result = None
+        count = 0
+        name = f"COPY {table}"
+        try:
+            items = iter(items)
+            first = next(items, None)
+            if first is None:
+                raise self.Error(f"Impossible to append empty items in {table}!")
+            columns = list(first.keys())
+            items = chain([first], items)
+
+            while True:
+                chunk = list(islice(items, chunk_size)) if chunk_size else list(items)
+                if not chunk:
+                    break
+                try:
+                    records = [tuple(item[column] for column in columns) for item in chunk]
+                except KeyError as e:
+                    raise self.Error(f"Can't append item without value of column {e}!")
+                seconds = None
+                sent = False
+
+                async def operation() -> str:
+                    nonlocal seconds, sent
+                    sent = False
+                    async with self.acquire() as connection:
+                        sent = True
+                        start = perf_counter()
+                        async with connection.transaction():
+                            status = await connection.copy_records_to_table(table, records = records, columns = columns)
+                        seconds = perf_counter() - start
+                    return status
+
+                status = await self.retry(operation = operation, name = name, idempotent = lambda: not sent)
+                count += int(status.split()[-1])
+                self.stats.observe_query(name = name, seconds = seconds, rows = int(status.split()[-1]))
+                self.trace(seconds, copy = table, columns = columns, result = status)
+            result = count
+            self.logger.info(get_log('+', f"Append {count} items in {table}")) if self.logger else None
+        except self.Error as e:
+            self.logger.warning(get_log('-', e)) if self.logger else None
+        except asyncpg.PostgresError as e:
+            self.stats.observe_error(error = e, name = name)
+            self.logger.error(get_log('-', f"{e} (appended {count} items in {table} before error)")) if self.logger else None
+        return result
+
+    async def upsert_item(self, table: str, item: Dict[str, Any], conflict_columns: List[str] = [], update_columns: List[str] = [], returning_columns: List[str] = [], record_class: Optional[Type[Row]] = None) -> Optional[List[Any]]:
+        """
+        Insert an item in one round trip using INSERT ... ON CONFLICT.
+
+        Without update_columns the conflicting row is kept (DO NOTHING), otherwise
+        the listed columns of the conflicting row are overwritten (DO UPDATE).
+        Without conflict_columns any unique violation is ignored.
+
+        :param table: Table name.
+        :type table: str
+        :param item: Dictionary representing the item to be inserted.
+        :type item: Dict[str, Any]
+        :param conflict_columns: Columns of the unique constraint to check for twin items.
+        :type conflict_columns: List[str]
+        :param update_columns: Columns to overwrite if a twin item already exists.
+        :type update_columns: List[str]
+        :param returning_columns: List of columns to return after inserting or updating.
+        :type returning_columns: List[str]
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: Returned rows (empty list if the twin item was kept) or None on error.
+        :rtype: Optional[List[Any]]
+
+        :raises Error: If there is an error during the execution of the method.
+        """
+
+        results = None
+        try:
+            if not item:
+                raise self.Error(f"Impossible to upsert empty item in {table}!")
+            for column in conflict_columns + update_columns:
+                if column not in item.keys():
+                    raise self.Error(f"Can't check column '{column}' without value!")
+            if update_columns and not conflict_columns:
+                raise self.Error(f"Can't update item in {table} without conflict columns!")
+
+            columns = tuple(item.keys())
+            conflict = tuple(conflict_columns)
+            update = tuple(update_columns)
+            returning = tuple(returning_columns)
+
+            def build() -> str:
+                values_query = ", ".join(f"${index + 1}" for index in range(len(columns)))
+                conflict_query = f" ON CONFLICT ({', '.join(conflict)})" if conflict else " ON CONFLICT"
+                if update:
+                    conflict_query += " DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update)
+                else:
+                    conflict_query += " DO NOTHING"
+                returning_query = " RETURNING " + ", ".join(returning) if returning else ""
+                return f"INSERT INTO {table} ({', '.join(columns)}) VALUES({values_query}){conflict_query}{returning_query};"
+
+            query = self.get_query(shape = ("upsert", table, columns, conflict, update, returning), build = build)
+            results = await self.fetch(query = query, args = list(item.values()), prepared = True, record_class = record_class)
+            if results:
+                self.logger.info(get_log('+', f"Upsert item in {table}: {item}")) if self.logger else None
+        except self.Error as e:
+            self.logger.warning(get_log('-', e)) if self.logger else None
+        return results
+
+    async def get_items(self, table: str, columns: List[str] = [], by_values: Dict[str, Any] = {}, record_class: Optional[Type[Row]] = None, readonly: bool = True) -> Optional[List[Any]]:
         """
         Get items from a table based on specified conditions.
 
@@ -289,32 +1151,283 @@ class ClientPostgreSQL(object):
         :type columns: List[str]
         :param by_values: Dictionary of column-value pairs to filter results with default value {}.
         :type by_values: Dict[str, Any]
-        :return: List of dictionaries representing the query results.
-        :rtype: Optional[List[Dict[str, Any]]]
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :param readonly: The query may be routed to a replica with default value True, False reads from the primary (e.g. to fill a cache).
+        :type readonly: bool
+        :return: List of dictionaries (or rows of record_class) representing the query results.
+        :rtype: Optional[List[Any]]
 
         :raises Error: If there is an error during the database operation.
         """
 
         results = None
         try:
-            selected_columns = '*'
-            if columns:
-                selected_columns = ", ".join(columns)
-            args = []
-            where_query = []
-            if by_values:
-                for key, value in by_values.items():
-                    args.append(value)
-                    where_query.append(f"{key}=${len(args)}")
-                where_query = " WHERE " + " AND ".join(where_query)
+            selected = tuple(columns)
+            keys = tuple(by_values.keys())
+
+            def build() -> str:
+                selected_columns = ", ".join(selected) if selected else '*'
+                return f"SELECT {selected_columns} FROM {table}{self.get_where_query(keys = keys)}"
+
+            query = self.get_query(shape = ("select", table, selected, keys), build = build)
+            results = await self.fetch(query = query, args = list(by_values.values()), prepared = True, readonly = readonly, record_class = record_class)
+        except self.Error as e:
+            self.logger.warning(get_log('-', e)) if self.logger else None
+        return results
+
+    async def get_items_page(self, table: str, by_values: Dict[str, Any] = {}, order_by: Union[str, List[str]] = "id", after: Optional[Any] = None, limit: int = 20, columns: List[str] = [], descending: bool = False, record_class: Optional[Type[Row]] = None) -> Optional[List[Any]]:
+        """
+        Get one page of items with keyset pagination (WHERE (order_by) > (after) ORDER BY order_by LIMIT limit).
+
+        Unlike OFFSET, the cost of a page doesn't depend on its position: with an index on
+        (by_values columns, order_by columns) the query reads only limit rows.
+        The next page starts after the order_by values of the last item of the page.
+
+        Example: page = await bd.get_items_page(table = "requests", by_values = {"user_id": 1}, after = page[-1]["id"])
+
+        :param table: Name of the table to query.
+        :type table: str
+        :param by_values: Dictionary of column-value pairs to filter results with default value {}.
+        :type by_values: Dict[str, Any]
+        :param order_by: Column or columns of the page order, unique together (e.g. 'id' or ['created', 'id']) with default value 'id'.
+        :type order_by: Union[str, List[str]]
+        :param after: Value (or tuple of values for several columns) of order_by of the last item of the previous page with default value None (first page).
+        :type after: Optional[Any]
+        :param limit: Maximum number of items in the page with default value 20.
+        :type limit: int
+        :param columns: List of columns to retrieve with default value [] (all columns, order_by columns are always added).
+        :type columns: List[str]
+        :param descending: Order from the largest values with default value False.
+        :type descending: bool
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: Items of the page (an empty list after the last page) or None on error.
+        :rtype: Optional[List[Any]]
+
+        :raises Error: If there is an error during the database operation.
+        """
+
+        results = None
+        try:
+            order = (order_by, ) if isinstance(order_by, str) else tuple(order_by)
+            if not order:
+                raise self.Error(f"Impossible to page {table} without order_by columns!")
+            if after is not None and not isinstance(after, (tuple, list)):
+                after = (after, )
+            if after is not None and len(after) != len(order):
+                raise self.Error(f"Cursor {after} doesn't match order_by columns {order}!")
+            selected = tuple(columns) + tuple(column for column in order if column not in columns) if columns else ()
+            keys = tuple(by_values.keys())
+            has_after = after is not None
+
+            def build() -> str:
+                selected_columns = ", ".join(selected) if selected else '*'
+                conditions = [f"{key} = ${index + 1}" for index, key in enumerate(keys)]
+                if has_after:
+                    placeholders = ", ".join(f"${len(keys) + index + 1}" for index in range(len(order)))
+                    conditions.append(f"({', '.join(order)}) {'<' if descending else '>'} ({placeholders})")
+                where_query = " WHERE " + " AND ".join(conditions) if conditions else ""
+                direction = " DESC" if descending else ""
+                order_query = ", ".join(f"{column}{direction}" for column in order)
+                limit_index = len(keys) + (len(order) if has_after else 0) + 1
+                return f"SELECT {selected_columns} FROM {table}{where_query} ORDER BY {order_query} LIMIT ${limit_index}"
+
+            query = self.get_query(shape = ("page", table, selected, keys, order, descending, has_after), build = build)
+            args = list(by_values.values()) + (list(after) if has_after else []) + [limit]
+            results = await self.fetch(query = query, args = args, prepared = True, readonly = True, record_class = record_class)
+        except self.Error as e:
+            self.logger.warning(get_log('-', e)) if self.logger else None
+        return results
+
+    async def iterate_items(self, table: str, columns: List[str] = [], by_values: Dict[str, Any] = {}, batch_size: int = 1000, record_class: Optional[Type[Row]] = None) -> AsyncIterator[Any]:
+        """
+        Iterate over items of a table through a server-side cursor.
+
+        Only batch_size rows are held in memory at once, regardless of the table size.
+        The cursor lives in a read-only transaction (or in the current unit of work),
+        so the connection is held until the iteration ends.
+
+        The iteration runs behind the circuit breaker, but it isn't retried: the rows already yielded
+        can't be taken back, so a lost connection raises Unavailable and the caller repeats the iteration.
+
+        Example: async for item in bd.iterate_items(table = "requests"): ...
+
+        :param table: Name of the table to query.
+        :type table: str
+        :param columns: List of columns to retrieve with default value [].
+        :type columns: List[str]
+        :param by_values: Dictionary of column-value pairs to filter results with default value {}.
+        :type by_values: Dict[str, Any]
+        :param batch_size: Number of rows fetched from the cursor per round trip with default value 1000.
+        :type batch_size: int
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: Items one by one (dictionaries or rows of record_class).
+        :rtype: AsyncIterator[Any]
+
+        :raises Unavailable: If the breaker is open or the connection was lost.
+        """
+
+        selected = tuple(columns)
+        keys = tuple(by_values.keys())
+
+        def build() -> str:
+            selected_columns = ", ".join(selected) if selected else '*'
+            return f"SELECT {selected_columns} FROM {table}{self.get_where_query(keys = keys)}"
+
+        query = self.get_query(shape = ("select", table, selected, keys), build = build)
+        args = list(by_values.values())
+        count = 0
+        seconds = None
+        if not self.breaker.allow():
+            raise self.Unavailable(f"Database is unavailable (circuit breaker is open), <query>: CURSOR {query}")
+        start = perf_counter()
+        try:
+            async with self.acquire(readonly = True) as connection:
+                try:
+                    if connection.is_in_transaction():
+                        async for record in connection.cursor(query, *args, prefetch = batch_size, record_class = record_class):
+                            count += 1
+                            yield record if record_class is not None else dict(record)
+                    else:
+                        async with connection.transaction(readonly = True):
+                            async for record in connection.cursor(query, *args, prefetch = batch_size, record_class = record_class):
+                                count += 1
+                                yield record if record_class is not None else dict(record)
+                except asyncpg.InterfaceError as e:
+                    # Соединение, потерянное между порциями курсора, замечается только при следующем обращении к нему (пул уже мог его отсоединить)
+                    try:
+                        lost = connection.is_closed()
+                    except asyncpg.InterfaceError:
+                        lost = True
+                    if lost:
+                        raise asyncpg.ConnectionDoesNotExistError(f"Connection was lost during the iteration ({e})") from e
+                    raise
+            seconds = perf_counter() - start
+            self.stats.observe_query(name = f"CURSOR {query}", seconds = seconds, rows = count)
+            self.breaker.record_success()
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.trial = False
+            raise
+        except Exception as e:
+            kind = classify_error(e)
+            if kind is None and not isinstance(e, asyncpg.PostgresError):
+                self.breaker.trial = False
+                raise
+            self.stats.observe_error(error = e, name = f"CURSOR {query}")
+            if kind == "connection":
+                self.breaker.record_failure()
             else:
-                where_query = ""
-            query = f"SELECT {selected_columns} FROM {table}{where_query}"
-            results = await self.fetch(query = query, args = args)
+                self.breaker.record_success()
+            self.logger.error(get_log('-', f"{e} (iterated {count} items in {table} before error)")) if self.logger else None
+            if kind is not None:
+                raise self.Unavailable(f"Database is unavailable ({e})") from e
+        self.trace(seconds, cursor = query, args = args, rows = count)
+
+    async def get_items_many(self, table: str, by_column: str, values: List[Any], columns: List[str] = [], value_type: Optional[str] = None, record_class: Optional[Type[Row]] = None, readonly: bool = True) -> Optional[Dict[Any, Any]]:
+        """
+        Get items for many values of one column in a single query (WHERE column = ANY($1)).
+
+        :param table: Name of the table to query.
+        :type table: str
+        :param by_column: Column to filter and key the results by (usually 'id').
+        :type by_column: str
+        :param values: Values of the column to look up.
+        :type values: List[Any]
+        :param columns: List of columns to retrieve with default value [] (all columns).
+        :type columns: List[str]
+        :param value_type: PostgreSQL type of the column for the array cast (e.g. 'bigint') with default value None (inferred).
+        :type value_type: Optional[str]
+        :param record_class: Row class (see rows.row_class) to return rows without copying them into dictionaries with default value None.
+        :type record_class: Optional[Type[Row]]
+        :param readonly: The query may be routed to a replica with default value True, False reads from the primary (e.g. to fill a cache).
+        :type readonly: bool
+        :return: Dictionary of found items (dictionaries or rows of record_class) keyed by the value of by_column.
+        :rtype: Optional[Dict[Any, Any]]
+
+        :raises Error: If there is an error during the database operation.
+        """
+
+        results = None
+        try:
+            if not values:
+                return {}
+            selected = tuple(columns) if not columns or by_column in columns else (by_column, ) + tuple(columns)
+
+            def build() -> str:
+                selected_columns = ", ".join(selected) if selected else '*'
+                cast = f"::{value_type}[]" if value_type else ""
+                return f"SELECT {selected_columns} FROM {table} WHERE {by_column} = ANY($1{cast})"
+
+            query = self.get_query(shape = ("select_many", table, selected, by_column, value_type), build = build)
+            items = await self.fetch(query = query, args = [list(values)], prepared = True, readonly = readonly, record_class = record_class)
+            if items is not None:
+                results = {item[by_column]: item for item in items}
         except self.Error as e:
             self.logger.warning(get_log('-', e)) if self.logger else None
         return results
 
+    async def update_items(self, table: str, by_column: str, items: List[Dict[str, Any]], types: Dict[str, str], returning_columns: List[str] = [], record_class: Optional[Type[Row]] = None) -> Optional[Any]:
+        """
+        Update many items with different values in a single query (UPDATE ... FROM UNNEST).
+
+        Every item holds the same columns: by_column to find the row and the columns to set.
+        Array columns can't be updated this way (UNNEST flattens nested arrays).
+
+        :param table: Name of the table to update.
+        :type table: str
+        :param by_column: Column to find the rows by (usually 'id'), its values must be unique.
+        :type by_column: str
+        :param items: Dictionaries of by_column and the new values.
+        :type items: List[Dict[str, Any]]
+        :param types: PostgreSQL types of the columns for the array casts (e.g. {'id': 'bigint', 'state': 'text'}).
+        :type types: Dict[str, str]
+        :param returning_columns: Columns of the updated rows to return with default value [].
+        :type returning_columns: List[str]
+        :param record_class: Row class (see rows.row_class) for the returned rows with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: Status of the update operation, or the updated rows if returning_columns are given.
+        :rtype: Optional[Any]
+
+        :raises Error: If there is an error during the database operation.
+        """
+
+        result = None
+        try:
+            if not items:
+                return [] if returning_columns else None
+            columns = tuple(items[0].keys())
+            if by_column not in columns or len(columns) < 2:
+                raise self.Error(f"Can't update items in {table} without '{by_column}' and values!")
+            if any(tuple(item.keys()) != columns for item in items):
+                raise self.Error(f"Can't update items in {table} with different columns!")
+            updates = tuple(column for column in columns if column != by_column)
+            returning = tuple(returning_columns)
+            casts = tuple(types[column] for column in columns)
+            if any(cast.endswith("]") for cast in casts):
+                raise self.Error(f"Can't update array columns of items in {table} with UNNEST!")
+
+            def build() -> str:
+                arrays = ", ".join(f"${index + 1}::{cast}[]" for index, cast in enumerate(casts))
+                set_query = ", ".join(f"{column} = v.{column}" for column in updates)
+                returning_query = " RETURNING " + ", ".join(f"t.{column}" for column in returning) if returning else ""
+                return f"UPDATE {table} AS t SET {set_query} FROM UNNEST({arrays}) AS v({', '.join(columns)}) WHERE t.{by_column} = v.{by_column}{returning_query};"
+
+            query = self.get_query(shape = ("update_many", table, columns, by_column, casts, returning), build = build)
+            args = [[item[column] for item in items] for column in columns]
+            if returning:
+                result = await self.fetch(query = query, args = args, prepared = True, record_class = record_class)
+            else:
+                result = await self.execute(query = query, args = args, prepared = True)
+            if result is not None:
+                self.logger.info(get_log('+', f"Update {len(items)} items in table '{table}' by {by_column}")) if self.logger else None
+        except KeyError as e:
+            self.logger.warning(get_log('-', f"Can't update items in {table} without type of column {e}")) if self.logger else None
+        except self.Error as e:
+            self.logger.warning(get_log('-', e)) if self.logger else None
+        return result
+
     async def update_item_with_append(self, table: str, update_values: Dict[str, Any], by_values: Dict[str, Any]) -> Optional[str]:
         """
         Update an item in a table with additional append operation.
@@ -335,32 +1448,27 @@ class ClientPostgreSQL(object):
         try:
             if not update_values:
                 raise self.Error(f"Can't update item without values!")
-            args = []
-            set_query = []
-            where_query = []
-            for key, value in update_values.items():
-                args.append(value)
-                if isinstance(value, list):
-                    set_query.append(f"{key} = array_cat({key}, ${len(args)})")
-                else:
-                    set_query.append(f"{key} = ${len(args)}")
-            set_query = "SET " + ", ".join(set_query)
-            if by_values:
-                for key, value in by_values.items():
-                    args.append(value)
-                    where_query.append(f"{key} = ${len(args)}")
-                where_query = " WHERE " + " AND ".join(where_query)
-            else:
-                    where_query = ""
-            query = f"UPDATE {table} {set_query}{where_query};"
-            result = await self.execute(query = query, args = args)
+            updates = tuple((key, isinstance(value, list)) for key, value in update_values.items())
+            keys = tuple(by_values.keys())
+
+            def build() -> str:
+                set_query = []
+                for index, (key, append) in enumerate(updates):
+                    if append:
+                        set_query.append(f"{key} = array_cat({key}, ${index + 1})")
+                    else:
+                        set_query.append(f"{key} = ${index + 1}")
+                return f"UPDATE {table} SET {', '.join(set_query)}{self.get_where_query(keys = keys, start = len(updates))};"
+
+            query = self.get_query(shape = ("update_with_append", table, updates, keys), build = build)
+            result = await self.execute(query = query, args = list(update_values.values()) + list(by_values.values()), prepared = True)
             if result:
                 self.logger.info(get_log('+', f"Update values: {update_values} in table '{table}' where {by_values}")) if self.logger else None
         except self.Error as e:
             self.logger.warning(get_log('-', e)) if self.logger else None
         return result
 
-    async def update_item(self, table: str, update_values: Dict[str, Any], by_values: Dict[str, Any]) -> Optional[str]:
+    async def update_item(self, table: str, update_values: Dict[str, Any], by_values: Dict[str, Any], returning_columns: List[str] = [], record_class: Optional[Type[Row]] = None) -> Optional[Any]:
         """
         Update an item in a table.
 
@@ -370,8 +1478,12 @@ class ClientPostgreSQL(object):
         :type update_values: Dict[str, Any]
         :param by_values: Dictionary representing the conditions for the update.
         :type by_values: Dict[str, Any]
-        :return: Result of the update operation.
-        :rtype: Optional[str]
+        :param returning_columns: Columns of the updated rows to return (UPDATE ... RETURNING) with default value [].
+        :type returning_columns: List[str]
+        :param record_class: Row class (see rows.row_class) for the returned rows with default value None.
+        :type record_class: Optional[Type[Row]]
+        :return: Status of the update operation, or the updated rows if returning_columns are given.
+        :rtype: Optional[Any]
 
         :raises Error: If there is an error during the database operation.
         """
@@ -379,22 +1491,21 @@ class ClientPostgreSQL(object):
         try:
             if not update_values:
                 raise self.Error(f"Can't update item without values!")
-            args = []
-            set_query = []
-            where_query = []
-            for key, value in update_values.items():
-                args.append(value)
-                set_query.append(f"{key} = ${len(args)}")
-            set_query = "SET " + ", ".join(set_query)
-            if by_values:
-                for key, value in by_values.items():
-                    args.append(value)
-                    where_query.append(f"{key} = ${len(args)}")
-                where_query = " WHERE " + " AND ".join(where_query)
+            updates = tuple(update_values.keys())
+            keys = tuple(by_values.keys())
+            returning = tuple(returning_columns)
+
+            def build() -> str:
+                set_query = ", ".join(f"{key} = ${index + 1}" for index, key in enumerate(updates))
+                returning_query = " RETURNING " + ", ".join(returning) if returning else ""
+                return f"UPDATE {table} SET {set_query}{self.get_where_query(keys = keys, start = len(updates))}{returning_query};"
+
+            query = self.get_query(shape = ("update", table, updates, keys, returning), build = build)
+            args = list(update_values.values()) + list(by_values.values())
+            if returning:
+                result = await self.fetch(query = query, args = args, prepared = True, record_class = record_class)
             else:
-                    where_query = ""
-            query = f"UPDATE {table} {set_query}{where_query};"
-            result = await self.execute(query = query, args = args)
+                result = await self.execute(query = query, args = args, prepared = True)
             if result:
                 self.logger.info(get_log('+', f"Update values: {update_values} in table '{table}' where {by_values}")) if self.logger else None
         except self.Error as e:
@@ -417,37 +1528,232 @@ class ClientPostgreSQL(object):
 
         result = None
         try:
-            args = []
-            where_query = []
-            if by_values:
-                for key, value in by_values.items():
-                    args.append(value)
-                    where_query.append(f"{key}=${len(args)}")
-                where_query = "WHERE " + " AND ".join(where_query)
-            else:
-                where_query = ""
-            query = f"DELETE FROM {table} {where_query};"
-            result = await self.execute(query = query, args = args)
+            keys = tuple(by_values.keys())
+            query = self.get_query(shape = ("delete", table, keys), build = lambda: f"DELETE FROM {table}{self.get_where_query(keys = keys)};")
+            result = await self.execute(query = query, args = list(by_values.values()), prepared = True)
             if result:
                 self.logger.info(get_log('+', f"Delete items in table '{table}' where {by_values}")) if self.logger else None
         except self.Error as e:
             self.logger.warning(get_log('-', e)) if self.logger else None
         return result
 
+    def get_connect_params(self) -> Dict[str, Any]:
+        """
+        Get parameters of a single connection (the params without the pool settings).
+
+        :return: Parameters for asyncpg.connect.
+        :rtype: Dict[str, Any]
+        """
+
+        return {key: value for key, value in self.params.items() if key not in ['min_size', 'max_size', 'max_queries', 'max_inactive_connection_lifetime', 'setup', 'init']}
+
+    def call_listener(self, callback: Callable[[Optional[str]], Any], channel: str, payload: Optional[str]) -> None:
+        """
+        Call a callback of a subscription, a coroutine callback is run as a task.
+
+        :param callback: Callback of the subscription.
+        :type callback: Callable[[Optional[str]], Any]
+        :param channel: Channel of the notification.
+        :type channel: str
+        :param payload: Payload of the notification or None if notifications could be lost.
+        :type payload: Optional[str]
+        """
+
+        try:
+            result = callback(payload)
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            self.logger.error(get_log('-', f"Listener of '{channel}' failed: {e}")) if self.logger else None
+
+    def dispatch(self, connection: asyncpg.connection.Connection, pid: int, channel: str, payload: str) -> None:
+        """
+        Pass a notification to the callbacks of its channel (asyncpg listener).
+
+        Notifications sent by the pooled connections of this client are skipped:
+        the process already knows about its own writes.
+
+        :param connection: Connection of the subscriptions.
+        :type connection: asyncpg.connection.Connection
+        :param pid: Server process id of the sender.
+        :type pid: int
+        :param channel: Channel of the notification.
+        :type channel: str
+        :param payload: Payload of the notification.
+        :type payload: str
+        """
+
+        if pid in self.backend_pids:
+            return
+        for callback in list(self.listeners.get(channel, [])):
+            self.call_listener(callback = callback, channel = channel, payload = payload)
+
+    async def connect_listener(self) -> bool:
+        """
+        Open the connection of the subscriptions and LISTEN to all their channels.
+
+        :return: True if the connection is open, False if the database is unavailable.
+        :rtype: bool
+        """
+
+        connection = None
+        try:
+            connection = await asyncpg.connect(**self.get_connect_params())
+            for channel in self.listeners:
+                await connection.add_listener(channel, self.dispatch)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            self.logger.error(get_log('-', f"Connection of subscriptions wasn't opened: {e}")) if self.logger else None
+            if connection is not None:
+                connection.terminate()
+            return False
+        connection.add_termination_listener(self.on_listener_lost)
+        self.listen_connection = connection
+        return True
+
+    def on_listener_lost(self, connection: asyncpg.connection.Connection) -> None:
+        """
+        Start reconnecting when the connection of the subscriptions is lost (asyncpg termination listener).
+
+        :param connection: Closed connection.
+        :type connection: asyncpg.connection.Connection
+        """
+
+        if connection is not self.listen_connection:
+            return
+        self.listen_connection = None
+        self.logger.error(get_log('-', "Connection of subscriptions was lost")) if self.logger else None
+        if self.listen_task is None:
+            self.listen_task = asyncio.ensure_future(self.reconnect_listener())
+
+    async def reconnect_listener(self) -> None:
+        """
+        Reconnect the subscriptions with backoff and re-LISTEN to their channels.
+
+        Notifications sent while the connection was lost are missed, so after the reconnection
+        every callback is called with None (e.g. to clear a cache).
+        """
+
+        attempt = 0
+        try:
+            while not await self.connect_listener():
+                await asyncio.sleep(get_backoff(attempt = attempt))
+                attempt += 1
+            self.listen_reconnects += 1
+            self.logger.info(get_log('+', f"Subscriptions were restored: {sorted(self.listeners)}")) if self.logger else None
+            for channel, callbacks in list(self.listeners.items()):
+                for callback in list(callbacks):
+                    self.call_listener(callback = callback, channel = channel, payload = None)
+        finally:
+            self.listen_task = None
+
+    async def listen(self, channel: str, callback: Callable[[Optional[str]], Any]) -> bool:
+        """
+        Subscribe to notifications of a channel (LISTEN) on a dedicated connection.
+
+        The callback gets the payload of every notification sent by other processes,
+        or None after a lost connection was restored (notifications could be missed).
+        The subscription is restored automatically after a lost connection.
+
+        Example: await bd.listen("users_changed", lambda payload: cache.invalidate(payload))
+
+        :param channel: Name of the channel.
+        :type channel: str
+        :param callback: Function or coroutine function taking the payload.
+        :type callback: Callable[[Optional[str]], Any]
+        :return: True if the subscription is active, False if it will be active after the reconnection.
+        :rtype: bool
+        """
+
+        new = channel not in self.listeners
+        self.listeners.setdefault(channel, []).append(callback)
+        if self.listen_connection is None:
+            if self.listen_task is not None:
+                return False
+            if not await self.connect_listener():
+                self.listen_task = asyncio.ensure_future(self.reconnect_listener())
+                return False
+        elif new:
+            await self.listen_connection.add_listener(channel, self.dispatch)
+        self.logger.info(get_log('+', f"Subscribed to '{channel}'")) if self.logger else None
+        return True
+
+    async def unlisten(self, channel: str, callback: Callable[[Optional[str]], Any]) -> None:
+        """
+        Unsubscribe a callback from a channel (UNLISTEN when it was the last one).
+
+        :param channel: Name of the channel.
+        :type channel: str
+        :param callback: Callback passed to listen().
+        :type callback: Callable[[Optional[str]], Any]
+        """
+
+        callbacks = self.listeners.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks and channel in self.listeners:
+            del self.listeners[channel]
+            if self.listen_connection is not None:
+                await self.listen_connection.remove_listener(channel, self.dispatch)
+
+    async def notify(self, channel: str, payload: str = "") -> Optional[str]:
+        """
+        Send a notification to a channel (pg_notify).
+
+        Inside a unit of work the notification is delivered after the commit, and not at all on rollback.
+
+        :param channel: Name of the channel.
+        :type channel: str
+        :param payload: Payload of the notification with default value ''.
+        :type payload: str
+        :return: Result of the operation.
+        :rtype: Optional[str]
+        """
+
+        return await self.execute(query = "SELECT pg_notify($1, $2);", args = [channel, payload], prepared = True)
+
+    async def close_listener(self) -> None:
+        """
+        Close the connection of the subscriptions (the subscriptions are kept for the next listen()).
+        """
+
+        if self.listen_task is not None:
+            self.listen_task.cancel()
+            self.listen_task = None
+        connection, self.listen_connection = self.listen_connection, None
+        if connection is not None:
+            await connection.close()
+
     async def create_pool(self) -> None:
         """
-        Create a PostgreSQL connection pool.
+        Create a PostgreSQL connection pool and the pools of the replicas.
+
+        Replica pools take the sizes of the primary pool, an unavailable replica is skipped.
         """
 
         self.pool = await asyncpg.create_pool(**self.params)
         self.logger.info(get_log('+', f"PostgeSQL pool was created")) if self.logger else None
 
+        sizes = {key: value for key, value in self.params.items() if key in ['min_size', 'max_size', 'max_queries', 'statement_cache_size']}
+        for replica in self.replicas:
+            try:
+                replica.pool = await asyncpg.create_pool(replica.dsn, **sizes)
+                self.logger.info(get_log('+', f"PostgeSQL pool of replica {replica.index} was created")) if self.logger else None
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                self.logger.error(get_log('-', f"PostgeSQL pool of replica {replica.index} wasn't created: {e}")) if self.logger else None
+
     async def close_pool(self) -> None:
         """
-        Close the PostgreSQL connection pool.
+        Close the connection of the subscriptions, the PostgreSQL connection pool and the pools of the replicas.
         """
 
+        await self.close_listener()
+
+        for replica in self.replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+                replica.pool = None
         await self.pool.close()
+        self.backend_pids.clear()
         self.logger.info(get_log('+', f"PostgeSQL pool was closed")) if self.logger else None
 
 
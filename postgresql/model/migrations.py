@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+"""
+Versioned schema migrations for ClientPostgreSQL.
+
+Applied versions are stored in a table, so at startup a current schema costs a single query.
+
+:var lock_key: Key of the advisory lock that serializes migration runs of several processes
+:type lock_key: int
+"""
+
+import asyncpg
+
+from typing import List
+from typing import Set
+from typing import Optional
+
+from utils.helper import get_log
+
+lock_key = 7_314_159_265
+
+class Migration(object):
+    """
+    One step of the schema.
+
+    :ivar version: Unique number, migrations are applied in ascending order.
+    :type version: int
+    :ivar name: Short description of the migration.
+    :type name: str
+    :ivar statements: SQL statements of the migration.
+    :type statements: List[str]
+    :ivar transactional: Statements run in one transaction with recording of the version.
+                         False for statements that can't run in a transaction (CREATE INDEX CONCURRENTLY).
+    :type transactional: bool
+    """
+
+    def __init__(self, version: int, name: str, statements: List[str], transactional: bool = True) -> None:
+        """
+        Initialization Migration object.
+
+        :param version: Unique number, migrations are applied in ascending order.
+        :type version: int
+        :param name: Short description of the migration.
+        :type name: str
+        :param statements: SQL statements of the migration, idempotent if transactional is False.
+        :type statements: List[str]
+        :param transactional: Statements run in one transaction with recording of the version with default value True.
+        :type transactional: bool
+        """
+
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.transactional = transactional
+
+    @classmethod
+    def create_table(cls, version: int, table: str, columns: List[str]) -> 'Migration':
+        """
+        Migration creating a table (kept if it already exists).
+
+        :param version: Version of the migration.
+        :type version: int
+        :param table: Table name.
+        :type table: str
+        :param columns: Columns and their data types for the table.
+        :type columns: List[str]
+        :return: Migration object.
+        :rtype: Migration
+        """
+
+        columns = ",\n".join(columns)
+        return cls(version = version, name = f"create table {table}", statements = [f"CREATE TABLE IF NOT EXISTS {table}(\n{columns});"])
+
+    @classmethod
+    def create_index(cls, version: int, table: str, columns: List[str], unique: bool = False) -> 'Migration':
+        """
+        Migration building an index without locking writes to the table (CREATE INDEX CONCURRENTLY).
+
+        An interrupted concurrent build leaves an invalid index, so the index is dropped first
+        and the migration can be safely repeated.
+
+        :param version: Version of the migration.
+        :type version: int
+        :param table: Table name.
+        :type table: str
+        :param columns: Indexed columns.
+        :type columns: List[str]
+        :param unique: Build a unique index with default value False.
+        :type unique: bool
+        :return: Migration object.
+        :rtype: Migration
+        """
+
+        index = f"{table}_{'_'.join(columns)}_idx"
+        unique = "UNIQUE " if unique else ""
+        return cls(
+            version = version,
+            name = f"create index {index}",
+            statements = [
+                f"DROP INDEX CONCURRENTLY IF EXISTS {index};",
+                f"CREATE {unique}INDEX CONCURRENTLY {index} ON {table} ({', '.join(columns)});"
+            ],
+            transactional = False
+        )
+
+    @classmethod
+    def drop_index(cls, version: int, table: str, columns: List[str]) -> 'Migration':
+        """
+        Migration dropping an index built by create_index without locking the table (DROP INDEX CONCURRENTLY).
+
+        :param version: Version of the migration.
+        :type version: int
+        :param table: Table name.
+        :type table: str
+        :param columns: Indexed columns.
+        :type columns: List[str]
+        :return: Migration object.
+        :rtype: Migration
+        """
+
+        index = f"{table}_{'_'.join(columns)}_idx"
+        return cls(
+            version = version,
+            name = f"drop index {index}",
+            statements = [f"DROP INDEX CONCURRENTLY IF EXISTS {index};"],
+            transactional = False
+        )
+
+    @classmethod
+    def create_notify_trigger(cls, version: int, table: str, column: str = "id", channel: Optional[str] = None) -> 'Migration':
+        """
+        Migration adding a trigger that sends NOTIFY on every inserted, updated or deleted row of a table.
+
+        The payload is the value of the column of the row, so listeners (see ClientPostgreSQL.listen)
+        can invalidate their caches. Notifications of a transaction are delivered after its commit.
+
+        :param version: Version of the migration.
+        :type version: int
+        :param table: Table name.
+        :type table: str
+        :param column: Column sent as the payload with default value 'id'.
+        :type column: str
+        :param channel: Channel of the notifications with default value None ('<table>_changed').
+        :type channel: Optional[str]
+        :return: Migration object.
+        :rtype: Migration
+        """
+
+        channel = channel or f"{table}_changed"
+        return cls(
+            version = version,
+            name = f"create trigger {table}_notify",
+            statements = [
+                """CREATE OR REPLACE FUNCTION notify_row_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], CASE TG_OP WHEN 'DELETE' THEN to_jsonb(OLD) ELSE to_jsonb(NEW) END ->> TG_ARGV[1]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;""",
+                f"DROP TRIGGER IF EXISTS {table}_notify ON {table};",
+                f"CREATE TRIGGER {table}_notify AFTER INSERT OR UPDATE OR DELETE ON {table} FOR EACH ROW EXECUTE FUNCTION notify_row_change('{channel}', '{column}');"
+            ]
+        )
+
+class MigrationRunner(object):
+    """
+    Applies pending migrations and records their versions.
+
+    :ivar client: Object for DB communication.
+    :type client: ClientPostgreSQL
+    :ivar migrations: Migrations sorted by version.
+    :type migrations: List[Migration]
+    :ivar table: Table of applied versions.
+    :type table: str
+    """
+
+    def __init__(self, client: 'ClientPostgreSQL', migrations: List[Migration], table: str = "schema_migrations") -> None:
+        """
+        Initialization MigrationRunner object.
+
+        :param client: Object for DB communication.
+        :type client: ClientPostgreSQL
+        :param migrations: Migrations of the schema.
+        :type migrations: List[Migration]
+        :param table: Table of applied versions with default value 'schema_migrations'.
+        :type table: str
+
+        :raises ClientPostgreSQL.Error: If versions of migrations are not unique.
+        """
+
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise client.Error(f"Versions of migrations are not unique: {sorted(versions)}")
+
+        self.client = client
+        self.migrations = sorted(migrations, key = lambda migration: migration.version)
+        self.table = table
+
+    async def get_applied(self, connection: asyncpg.connection.Connection) -> Optional[Set[int]]:
+        """
+        Get applied versions.
+
+        :param connection: Connection of the run.
+        :type connection: asyncpg.connection.Connection
+        :return: Applied versions or None if the table of versions doesn't exist yet.
+        :rtype: Optional[Set[int]]
+        """
+
+        try:
+            return {row["version"] for row in await connection.fetch(f"SELECT version FROM {self.table}")}
+        except asyncpg.UndefinedTableError:
+            return None
+
+    async def apply(self, connection: asyncpg.connection.Connection, migration: Migration) -> None:
+        """
+        Apply one migration and record its version.
+
+        :param connection: Connection of the run.
+        :type connection: asyncpg.connection.Connection
+        :param migration: Migration to apply.
+        :type migration: Migration
+        """
+
+        record = f"INSERT INTO {self.table} (version, name) VALUES ($1, $2)"
+        if migration.transactional:
+            async with connection.transaction():
+                for statement in migration.statements:
+                    await connection.execute(statement)
+                await connection.execute(record, migration.version, migration.name)
+        else:
+            for statement in migration.statements:
+                await connection.execute(statement)
+            await connection.execute(record, migration.version, migration.name)
+
+    async def run(self) -> Optional[List[int]]:
+        """
+        Apply pending migrations in ascending order of versions.
+
+        When the schema is current this costs one query. Otherwise the run holds an advisory lock,
+        so processes starting at the same time (bot and API) don't apply a migration twice.
+
+        :return: Applied versions (empty if the schema is current) or None on error.
+        :rtype: Optional[List[int]]
+        """
+
+        logger = self.client.logger
+        applied = []
+        try:
+            async with self.client.acquire() as connection:
+                done = await self.get_applied(connection = connection)
+                if done is not None and all(migration.version in done for migration in self.migrations):
+                    logger.info(get_log('=', f"Schema is up to date ({len(done)} migrations)")) if logger else None
+                    return applied
+
+                await connection.execute("SELECT pg_advisory_lock($1)", lock_key)
+                try:
+                    await connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table}(\nversion INTEGER PRIMARY KEY,\nname TEXT NOT NULL,\napplied_at TIMESTAMPTZ NOT NULL DEFAULT now());")
+                    done = await self.get_applied(connection = connection)
+                    for migration in self.migrations:
+                        if migration.version in done:
+                            continue
+                        await self.apply(connection = connection, migration = migration)
+                        applied.append(migration.version)
+                        logger.info(get_log('+', f"Migration {migration.version} ({migration.name}) was applied")) if logger else None
+                finally:
+                    await connection.execute("SELECT pg_advisory_unlock($1)", lock_key)
+        except asyncpg.PostgresError as e:
+            logger.error(get_log('-', f"{e} (applied migrations: {applied})")) if logger else None
+            return None
+        return applied
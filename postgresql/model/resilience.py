@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Classification of transient errors, retry backoff and circuit breaker for ClientPostgreSQL.
+
+:var serialization_errors: Errors after which the transaction was rolled back and can be repeated
+:type serialization_errors: Tuple[type, ...]
+:var connection_errors: Errors of a lost or refused connection
+:type connection_errors: Tuple[type, ...]
+:var backoff_base: First retry delay in seconds (doubled on every attempt)
+:type backoff_base: float
+:var backoff_max: Maximum retry delay in seconds
+:type backoff_max: float
+"""
+
+import asyncio
+import asyncpg
+
+from random import uniform
+from time import monotonic
+
+from typing import Dict
+from typing import Any
+from typing import Optional
+
+serialization_errors = (
+    asyncpg.SerializationError,
+    asyncpg.DeadlockDetectedError
+)
+connection_errors = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError,
+    asyncpg.TooManyConnectionsError
+)
+
+backoff_base = 0.05
+backoff_max = 1.0
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Get the kind of a transient error.
+
+    :param error: Raised exception.
+    :type error: BaseException
+    :return: 'serialization', 'connection' or None if the error is not transient.
+    :rtype: Optional[str]
+    """
+
+    if isinstance(error, serialization_errors):
+        return "serialization"
+    if isinstance(error, connection_errors):
+        return "connection"
+    return None
+
+def get_backoff(attempt: int) -> float:
+    """
+    Get the delay before a retry (exponential backoff with full jitter).
+
+    :param attempt: Number of the failed attempt, from 0.
+    :type attempt: int
+    :return: Delay in seconds, random between 0 and min(backoff_max, backoff_base * 2 ** attempt).
+    :rtype: float
+    """
+
+    return uniform(0, min(backoff_max, backoff_base * 2 ** attempt))
+
+class CircuitBreaker(object):
+    """
+    Fails fast while the database is down.
+
+    After threshold connection failures in a row the breaker opens and rejects calls for reset_timeout seconds.
+    Then one call is let through (half-open): its success closes the breaker, its failure opens it again.
+
+    :ivar threshold: Connection failures in a row that open the breaker.
+    :type threshold: int
+    :ivar reset_timeout: Seconds the breaker stays open.
+    :type reset_timeout: float
+    :ivar failures: Connection failures in a row.
+    :type failures: int
+    :ivar opened_at: Time the breaker was opened (time.monotonic()) or None if it's closed.
+    :type opened_at: Optional[float]
+    :ivar trial: A half-open trial call is running.
+    :type trial: bool
+    :ivar rejected: Number of calls rejected while the breaker was open.
+    :type rejected: int
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 10.0) -> None:
+        """
+        Initialization CircuitBreaker object.
+
+        :param threshold: Connection failures in a row that open the breaker with default value 5.
+        :type threshold: int
+        :param reset_timeout: Seconds the breaker stays open with default value 10.
+        :type reset_timeout: float
+        """
+
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """
+        Get the state of the breaker.
+
+        :return: 'closed', 'open' or 'half_open'.
+        :rtype: str
+        """
+
+        if self.opened_at is None:
+            return "closed"
+        if monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go to the database.
+
+        :return: True if the breaker is closed or this is the half-open trial call.
+        :rtype: bool
+        """
+
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial:
+            self.trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        """
+        Record a call that reached the database, closing the breaker.
+        """
+
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self) -> None:
+        """
+        Record a connection failure, opening the breaker after threshold failures in a row or a failed trial.
+        """
+
+        self.failures += 1
+        if self.trial or self.failures >= self.threshold:
+            self.opened_at = monotonic()
+        self.trial = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the breaker as a dictionary.
+
+        :return: State, failures in a row and rejected calls.
+        :rtype: Dict[str, Any]
+        """
+
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected
+        }
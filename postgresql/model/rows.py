@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Row classes returned by ClientPostgreSQL instead of dictionaries.
+
+A row class is a subclass of asyncpg.Record: asyncpg builds the rows directly,
+so no dictionary is allocated and the values (long texts, arrays) are not copied.
+"""
+
+import asyncpg
+
+from typing import Dict
+from typing import Any
+from typing import List
+from typing import Type
+from typing import Tuple
+
+class Row(asyncpg.Record):
+    """
+    Base class of rows.
+
+    Supports row["column"], row.get("column"), row.keys(), dict(row) of asyncpg.Record,
+    and row.column for the columns of the table.
+
+    :cvar table: Name of the table.
+    :type table: str
+    :cvar columns: Names of the columns of the table.
+    :type columns: Tuple[str, ...]
+    """
+
+    __slots__ = ()
+
+    table = ""
+    columns = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the row as a dictionary (copies the row, use only where a dictionary is required).
+
+        :return: Dictionary of the row.
+        :rtype: Dict[str, Any]
+        """
+
+        return dict(self.items())
+
+def get_column_names(columns: List[str]) -> List[str]:
+    """
+    Get names of columns from their definitions.
+
+    :param columns: Definitions of the columns (e.g. 'id BIGINT PRIMARY KEY').
+    :type columns: List[str]
+    :return: Names of the columns.
+    :rtype: List[str]
+    """
+
+    return list(get_column_types(columns = columns))
+
+def get_column_types(columns: List[str]) -> Dict[str, str]:
+    """
+    Get PostgreSQL types of columns from their definitions (serial types are given as their integer types).
+
+    :param columns: Definitions of the columns (e.g. 'id BIGINT PRIMARY KEY').
+    :type columns: List[str]
+    :return: Types of the columns by names (e.g. {'id': 'bigint'}).
+    :rtype: Dict[str, str]
+    """
+
+    serials = {"smallserial": "smallint", "serial": "integer", "bigserial": "bigint"}
+    types = {}
+    for column in columns:
+        parts = column.split()
+        if parts[0].upper() in ("PRIMARY", "UNIQUE", "CONSTRAINT", "FOREIGN", "CHECK"):
+            continue
+        column_type = parts[1].lower() if len(parts) > 1 else ""
+        types[parts[0]] = serials.get(column_type, column_type)
+    return types
+
+class RowOverlay(object):
+    """
+    Row with values that are not written to the database yet (see WriteBehind).
+
+    Supports row["column"], row.get("column"), row.keys(), row.items() and row.column like Row.
+
+    :ivar row: Row read from the database.
+    :type row: Row
+    :ivar values: Pending values by columns, they hide the values of the row.
+    :type values: Dict[str, Any]
+    """
+
+    __slots__ = ("row", "values")
+
+    def __init__(self, row: Row, values: Dict[str, Any]) -> None:
+        """
+        Initialization RowOverlay object.
+
+        :param row: Row read from the database.
+        :type row: Row
+        :param values: Pending values by columns.
+        :type values: Dict[str, Any]
+        """
+
+        self.row = row
+        self.values = values
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.values:
+            return self.values[key]
+        return self.row[key]
+
+    def __getattr__(self, name: str) -> Any:
+        values = object.__getattribute__(self, "values")
+        if name in values:
+            return values[name]
+        return getattr(object.__getattribute__(self, "row"), name)
+
+    def __eq__(self, other: Any) -> bool:
+        return self.to_dict() == dict(other.items() if hasattr(other, "items") else other)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get the value of a column.
+
+        :param key: Name of the column.
+        :type key: str
+        :param default: Value if the column is missing with default value None.
+        :type default: Any
+        :return: Pending value, value of the row or default.
+        :rtype: Any
+        """
+
+        if key in self.values:
+            return self.values[key]
+        return self.row.get(key, default)
+
+    def keys(self) -> List[str]:
+        """
+        Get names of the columns of the row.
+
+        :return: Names of the columns.
+        :rtype: List[str]
+        """
+
+        return list(self.row.keys())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """
+        Get the columns and the values of the row with the pending values.
+
+        :return: Pairs of columns and values.
+        :rtype: List[Tuple[str, Any]]
+        """
+
+        return [(key, self[key]) for key in self.row.keys()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the row with the pending values as a dictionary.
+
+        :return: Dictionary of the row.
+        :rtype: Dict[str, Any]
+        """
+
+        return dict(self.items())
+
+def row_class(table: str, columns: List[str]) -> Type[Row]:
+    """
+    Generate a row class for a table template ({"table": ..., "columns": [...]}).
+
+    Example: UserRow = row_class(**table_users())
+
+    :param table: Name of the table.
+    :type table: str
+    :param columns: Definitions of the columns.
+    :type columns: List[str]
+    :return: Subclass of Row with a read-only property for every column.
+    :rtype: Type[Row]
+    """
+
+    names = get_column_names(columns = columns)
+    namespace = {
+        "__slots__": (),
+        "table": table,
+        "columns": tuple(names)
+    }
+    for name in names:
+        namespace[name] = property(lambda self, name = name: self.get(name), doc = f"Column '{name}' (None if it wasn't selected)")
+    return type(f"{table.title().replace('_', '')}Row", (Row,), namespace)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+Histograms and counters for instrumentation of ClientPostgreSQL.
+
+:var latency_buckets: Upper bounds (seconds) of the latency histograms
+:type latency_buckets: List[float]
+:var rows_buckets: Upper bounds of the row-count histograms
+:type rows_buckets: List[float]
+"""
+
+from typing import Dict
+from typing import Any
+from typing import List
+from typing import Optional
+
+latency_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+rows_buckets = [0, 1, 10, 100, 1000, 10000, 100000]
+
+class Histogram(object):
+    """
+    Histogram with fixed buckets.
+
+    :ivar buckets: Upper bounds of the buckets.
+    :type buckets: List[float]
+    :ivar counts: Number of values in each bucket (the last one is +Inf).
+    :type counts: List[int]
+    :ivar count: Number of values.
+    :type count: int
+    :ivar sum: Sum of values.
+    :type sum: float
+    :ivar max: Maximum value.
+    :type max: float
+    """
+
+    def __init__(self, buckets: List[float]) -> None:
+        """
+        Initialization Histogram object.
+
+        :param buckets: Upper bounds of the buckets in ascending order.
+        :type buckets: List[float]
+        """
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add a value to the histogram.
+
+        :param value: Observed value.
+        :type value: float
+        """
+
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the histogram as a dictionary.
+
+        :return: count, sum, avg, max and number of values in each bucket ('le_<bound>' and 'le_inf').
+        :rtype: Dict[str, Any]
+        """
+
+        buckets = {f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": buckets
+        }
+
+class QueryStats(object):
+    """
+    Latency and row-count histograms of one query shape.
+
+    :ivar latency: Histogram of query latency in seconds.
+    :type latency: Histogram
+    :ivar rows: Histogram of returned or affected rows.
+    :type rows: Histogram
+    :ivar errors: Number of failed queries.
+    :type errors: int
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialization QueryStats object.
+        """
+
+        self.latency = Histogram(latency_buckets)
+        self.rows = Histogram(rows_buckets)
+        self.errors = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the stats as a dictionary.
+
+        :return: Latency and rows histograms and number of errors.
+        :rtype: Dict[str, Any]
+        """
+
+        return {
+            "latency": self.latency.to_dict(),
+            "rows": self.rows.to_dict(),
+            "errors": self.errors
+        }
+
+class ClientStats(object):
+    """
+    Instrumentation of ClientPostgreSQL.
+
+    :ivar acquire_wait: Histogram of waiting for a pool connection in seconds.
+    :type acquire_wait: Histogram
+    :ivar queries: Stats by query shape (SQL of memoized queries, first keyword of other queries).
+    :type queries: Dict[str, QueryStats]
+    :ivar errors: Number of errors by exception class.
+    :type errors: Dict[str, int]
+    :ivar retries: Number of retries by kind of transient error.
+    :type retries: Dict[str, int]
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialization ClientStats object.
+        """
+
+        self.acquire_wait = Histogram(latency_buckets)
+        self.queries = {}
+        self.errors = {}
+        self.retries = {}
+
+    def observe_acquire(self, seconds: float) -> None:
+        """
+        Record waiting for a pool connection.
+
+        :param seconds: Wait time.
+        :type seconds: float
+        """
+
+        self.acquire_wait.observe(seconds)
+
+    def observe_query(self, name: str, seconds: float, rows: Optional[int] = None) -> None:
+        """
+        Record a finished query.
+
+        :param name: Query shape.
+        :type name: str
+        :param seconds: Latency of the query.
+        :type seconds: float
+        :param rows: Returned or affected rows, if known.
+        :type rows: Optional[int]
+        """
+
+        stats = self.queries.get(name)
+        if stats is None:
+            stats = self.queries[name] = QueryStats()
+        stats.latency.observe(seconds)
+        if rows is not None:
+            stats.rows.observe(rows)
+
+    def observe_error(self, error: Exception, name: Optional[str] = None) -> None:
+        """
+        Record a failed query.
+
+        :param error: Raised exception.
+        :type error: Exception
+        :param name: Query shape, if known.
+        :type name: Optional[str]
+        """
+
+        key = type(error).__name__
+        self.errors[key] = self.errors.get(key, 0) + 1
+        if name is not None:
+            stats = self.queries.get(name)
+            if stats is None:
+                stats = self.queries[name] = QueryStats()
+            stats.errors += 1
+
+    def observe_retry(self, kind: str) -> None:
+        """
+        Record a retry of a transient error.
+
+        :param kind: Kind of the error ('serialization' or 'connection').
+        :type kind: str
+        """
+
+        self.retries[kind] = self.retries.get(kind, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get all stats as a dictionary.
+
+        :return: Acquire wait histogram, stats by query shape, error and retry counters.
+        :rtype: Dict[str, Any]
+        """
+
+        return {
+            "acquire_wait": self.acquire_wait.to_dict(),
+            "queries": {name: stats.to_dict() for name, stats in self.queries.items()},
+            "errors": dict(self.errors),
+            "retries": dict(self.retries)
+        }
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+Write-behind buffer of updates for ClientPostgreSQL.
+
+Updates of a row are merged in memory and written by a batched UPDATE ... FROM UNNEST
+on an interval or at shutdown, reads see them through an overlay.
+"""
+
+import asyncio
+
+from typing import Dict
+from typing import Any
+from typing import List
+from typing import Hashable
+from typing import Callable
+from typing import Optional
+from typing import Type
+from typing import Tuple
+
+from utils.helper import get_log
+from .rows import Row
+from .rows import RowOverlay
+
+class WriteBehind(object):
+    """
+    Merges pending column updates per key and flushes them in one query per set of columns.
+
+    A pending value is lost if the process crashes before the flush, so only values
+    that may be lost (state of a dialog, username) should be written behind.
+
+    :ivar client: Object for DB communication.
+    :type client: ClientPostgreSQL
+    :ivar table: Name of the table.
+    :type table: str
+    :ivar key: Column the rows are found by (usually 'id').
+    :type key: str
+    :ivar types: PostgreSQL types of the columns (see rows.get_column_types).
+    :type types: Dict[str, str]
+    :ivar interval: Seconds between flushes.
+    :type interval: float
+    :ivar returning_columns: Columns of the updated rows passed to on_flush.
+    :type returning_columns: List[str]
+    :ivar record_class: Row class of the updated rows.
+    :type record_class: Optional[Type[Row]]
+    :ivar on_flush: Function called with the updated rows after every flush (e.g. writing them to a cache).
+    :type on_flush: Optional[Callable[[List[Any]], Any]]
+    :ivar pending: Merged updates by keys.
+    :type pending: Dict[Hashable, Dict[str, Any]]
+    :ivar flushing: Updates being written now, they are still visible to reads.
+    :type flushing: Dict[Hashable, Dict[str, Any]]
+    :ivar lock: Lock allowing one flush at a time.
+    :type lock: asyncio.Lock
+    :ivar task: Task flushing on the interval.
+    :type task: Optional[asyncio.Task]
+    :ivar stats: Counters of merged updates, flushes, written rows and failed flushes.
+    :type stats: Dict[str, int]
+    """
+
+    def __init__(self, client: 'ClientPostgreSQL', table: str, key: str, types: Dict[str, str], interval: float = 0.5, returning_columns: List[str] = [], record_class: Optional[Type[Row]] = None, on_flush: Optional[Callable[[List[Any]], Any]] = None) -> None:
+        """
+        Initialization WriteBehind object.
+
+        :param client: Object for DB communication.
+        :type client: ClientPostgreSQL
+        :param table: Name of the table.
+        :type table: str
+        :param key: Column the rows are found by.
+        :type key: str
+        :param types: PostgreSQL types of the columns.
+        :type types: Dict[str, str]
+        :param interval: Seconds between flushes with default value 0.5.
+        :type interval: float
+        :param returning_columns: Columns of the updated rows passed to on_flush with default value [].
+        :type returning_columns: List[str]
+        :param record_class: Row class of the updated rows with default value None.
+        :type record_class: Optional[Type[Row]]
+        :param on_flush: Function called with the updated rows after every flush with default value None.
+        :type on_flush: Optional[Callable[[List[Any]], Any]]
+        """
+
+        self.client = client
+        self.table = table
+        self.key = key
+        self.types = types
+        self.interval = interval
+        self.returning_columns = returning_columns
+        self.record_class = record_class
+        self.on_flush = on_flush
+        self.pending = {}
+        self.flushing = {}
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.stats = {
+            "updates": 0,
+            "merged": 0,
+            "flushes": 0,
+            "rows": 0,
+            "failures": 0
+        }
+
+    def update(self, key: Hashable, values: Dict[str, Any]) -> bool:
+        """
+        Buffer an update of a row, merging it with the pending update of the same row.
+
+        :param key: Value of the key column of the row.
+        :type key: Hashable
+        :param values: New values by columns.
+        :type values: Dict[str, Any]
+        :return: True if the update is buffered, False if it's empty or has unknown or array columns.
+        :rtype: bool
+        """
+
+        unknown = [column for column in values if column not in self.types or column == self.key or self.types[column].endswith("]")]
+        if not values or unknown:
+            self.client.logger.warning(get_log('-', f"Can't write behind values {values} of '{self.table}' (unknown columns: {unknown})")) if self.client.logger else None
+            return False
+        self.stats["updates"] += 1
+        if key in self.pending:
+            self.stats["merged"] += 1
+        self.pending.setdefault(key, {}).update(values)
+        return True
+
+    def discard(self, key: Hashable, columns: List[str]) -> None:
+        """
+        Drop pending values of columns written directly (so the flush doesn't overwrite them with older values).
+        A batch already sent to the database is not recalled.
+
+        :param key: Value of the key column of the row.
+        :type key: Hashable
+        :param columns: Written columns.
+        :type columns: List[str]
+        """
+
+        for pending in (self.pending, self.flushing):
+            values = pending.get(key)
+            if values is None:
+                continue
+            for column in columns:
+                values.pop(column, None)
+            if not values:
+                del pending[key]
+
+    def get(self, key: Hashable) -> Dict[str, Any]:
+        """
+        Get values of a row that are not written yet.
+
+        :param key: Value of the key column of the row.
+        :type key: Hashable
+        :return: Pending values by columns (empty if there are none).
+        :rtype: Dict[str, Any]
+        """
+
+        values = dict(self.flushing.get(key, {}))
+        values.update(self.pending.get(key, {}))
+        return values
+
+    def overlay(self, key: Hashable, row: Optional[Row]) -> Optional[Any]:
+        """
+        Apply pending values to a row read from the database or a cache (read-your-writes).
+
+        :param key: Value of the key column of the row.
+        :type key: Hashable
+        :param row: Row or None if it's not found.
+        :type row: Optional[Row]
+        :return: The row itself if there are no pending values, otherwise RowOverlay.
+        :rtype: Optional[Any]
+        """
+
+        if row is None:
+            return None
+        values = self.get(key = key)
+        if not values:
+            return row
+        return RowOverlay(row = row, values = values)
+
+    def get_batches(self, updates: Dict[Hashable, Dict[str, Any]]) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+        """
+        Group updates by their sets of columns (one UPDATE ... FROM UNNEST per set).
+
+        :param updates: Updates by keys.
+        :type updates: Dict[Hashable, Dict[str, Any]]
+        :return: Items (key and values) by sorted columns.
+        :rtype: Dict[Tuple[str, ...], List[Dict[str, Any]]]
+        """
+
+        batches = {}
+        for key, values in updates.items():
+            columns = tuple(sorted(values))
+            item = {self.key: key}
+            item.update((column, values[column]) for column in columns)
+            batches.setdefault(columns, []).append(item)
+        return batches
+
+    async def flush(self) -> int:
+        """
+        Write the pending updates. If the database is unavailable, updates of the batch are kept
+        for the next flush (newer updates of the same rows win), a batch failed with an error of the query is dropped.
+
+        :return: Number of written rows.
+        :rtype: int
+        """
+
+        async with self.lock:
+            if not self.pending:
+                return 0
+            self.flushing, self.pending = self.pending, {}
+            written = 0
+            try:
+                for columns, items in self.get_batches(updates = self.flushing).items():
+                    try:
+                        result = await self.client.update_items(
+                            table = self.table,
+                            by_column = self.key,
+                            items = items,
+                            types = self.types,
+                            returning_columns = self.returning_columns,
+                            record_class = self.record_class
+                        )
+                    except self.client.Unavailable as e:
+                        self.stats["failures"] += 1
+                        self.client.logger.error(get_log('-', f"{e} (write-behind of {len(items)} rows of '{self.table}' is kept)")) if self.client.logger else None
+                        for item in items:
+                            key = item[self.key]
+                            values = {column: item[column] for column in columns if column in self.flushing.get(key, {})}
+                            values.update(self.pending.get(key, {}))
+                            if values:
+                                self.pending[key] = values
+                        continue
+                    if result is None:
+                        self.stats["failures"] += 1
+                        self.client.logger.error(get_log('-', f"Write-behind of {len(items)} rows of '{self.table}' was dropped: {list(columns)}")) if self.client.logger else None
+                        continue
+                    written += len(items)
+                    if self.on_flush is not None and self.returning_columns:
+                        self.on_flush(result)
+            finally:
+                self.flushing = {}
+            self.stats["flushes"] += 1
+            self.stats["rows"] += written
+            return written
+
+    async def run(self) -> None:
+        """
+        Flush on the interval until cancelled.
+        """
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.client.logger.error(get_log('-', f"Write-behind flush of '{self.table}' failed: {e}")) if self.client.logger else None
+
+    def start(self) -> None:
+        """
+        Start flushing on the interval.
+        """
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> int:
+        """
+        Stop flushing on the interval and write the pending updates (call before the pool is closed).
+
+        :return: Number of written rows.
+        :rtype: int
+        """
+
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        return await self.flush()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the counters of the buffer.
+
+        :return: Pending rows, buffered and merged updates, flushes, written rows and failed flushes.
+        :rtype: Dict[str, Any]
+        """
+
+        stats = dict(self.stats)
+        stats["pending"] = len(set(self.pending) | set(self.flushing))
+        return stats
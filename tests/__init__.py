@@ -1,8 +1,46 @@
 """
 Module for tests
+
+:var environ: Minimal settings for importing the app package without a configured environment (see unittest.mock.patch.dict)
+:type environ: Dict[str, str]
 """
 
 import unittest
+import tempfile
+
+environ = {
+	"TELEGRAM_token": "123456:test",
+	"TELEGRAM_webhook_host": "https://example.com",
+	"TELEGRAM_webhook_path": "/bot",
+	"TELEGRAM_webhook_url": "https://example.com/bot",
+	"TELEGRAM_webapp_host": "127.0.0.1",
+	"TELEGRAM_webapp_port": "3001",
+	"POSTGRESQL_host": "127.0.0.1",
+	"POSTGRESQL_port": "5432",
+	"POSTGRESQL_user": "user",
+	"POSTGRESQL_password": "password",
+	"POSTGRESQL_database": "database",
+	"POSTGRESQL_min_size": "1",
+	"POSTGRESQL_max_size": "2",
+	"POSTGRESQL_max_queries": "10",
+	"PROXY_socks": "socks5",
+	"PROXY_host": "127.0.0.1",
+	"PROXY_port": "1080",
+	"PROXY_user": "user",
+	"PROXY_password": "password",
+	"OPENAI_api_token": "token",
+	"OPENAI_model": "gpt-4"
+}
+for prefix in ("TELEGRAM_LOGGING_", "POSTGRESQL_LOGGING_"):
+	environ.update({
+		f"{prefix}level": "INFO",
+		f"{prefix}fmt": "%(message)s",
+		f"{prefix}datefmt": "%Y-%m-%d %H:%M:%S",
+		f"{prefix}name": prefix.lower().rstrip("_"),
+		f"{prefix}path": tempfile.gettempdir() + "/",
+		f"{prefix}max_bytes": "1048576",
+		f"{prefix}backup_count": "1"
+	})
 
 def run_tests() -> None:
 	"""
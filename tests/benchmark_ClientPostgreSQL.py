@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the ClientPostgreSQL read path.
+
+Every text message reads the user row three times (isAccess, inState, get_state).
+Compares these reads wrapped in a transaction (BEGIN + SELECT + COMMIT) with the autocommit reads
+of ClientPostgreSQL.fetch (SELECT only). The statements sent to the server are counted by CountingConnection,
+including the reset query the pool sends when a connection is released.
+
+Start: python3 -m tests.benchmark_ClientPostgreSQL
+
+:var reads_per_update: Number of reads of the user row per update
+:type reads_per_update: int
+:var updates: Number of simulated updates
+:type updates: int
+"""
+
+import asyncio
+import asyncpg
+from time import perf_counter
+
+from typing import Any
+from typing import Dict
+
+from pydantic import SecretStr
+
+from postgresql import ClientPostgreSQL
+
+reads_per_update = 3
+updates = 1000
+
+class CountingConnection(asyncpg.Connection):
+    """
+    Connection counting the statements it sends to the server (transactions send BEGIN and COMMIT through execute).
+
+    :cvar statements: Number of statements sent by all connections.
+    :type statements: int
+    """
+
+    statements = 0
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        """
+        Count and execute a statement.
+        """
+
+        CountingConnection.statements += 1
+        return await super().execute(query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Count and execute a query.
+        """
+
+        CountingConnection.statements += 1
+        return await super().fetch(query, *args, **kwargs)
+
+def postgres_cfg() -> Dict[str, Any]:
+    """
+    Returns settings of the test database.
+
+    :return: Settings of the test database.
+    :rtype: Dict[str, Any]
+    """
+
+    return {
+        "host": SecretStr("127.0.0.1"),
+        "port": SecretStr("5432"),
+        "user": SecretStr("myuser"),
+        "password": SecretStr("mypass"),
+        "database": SecretStr("mybase"),
+        "min_size": SecretStr("3"),
+        "max_size": SecretStr("10"),
+        "max_queries": SecretStr("50000"),
+        "connection_class": CountingConnection
+    }
+
+async def read_in_transaction(client: ClientPostgreSQL, query: str, id: int) -> Any:
+    """
+    Read the way fetch did before: inside BEGIN/COMMIT.
+
+    :param client: Object for DB communication.
+    :type client: ClientPostgreSQL
+    :param query: Query of the read.
+    :type query: str
+    :param id: User ID.
+    :type id: int
+    :return: Fetched rows.
+    :rtype: Any
+    """
+
+    async with client.pool.acquire() as connection:
+        async with connection.transaction():
+            return await connection.fetch(query, id)
+
+async def read_in_autocommit(client: ClientPostgreSQL, query: str, id: int) -> Any:
+    """
+    Read with ClientPostgreSQL.fetch (autocommit).
+
+    :param client: Object for DB communication.
+    :type client: ClientPostgreSQL
+    :param query: Query of the read.
+    :type query: str
+    :param id: User ID.
+    :type id: int
+    :return: Fetched rows.
+    :rtype: Any
+    """
+
+    return await client.fetch(query = query, args = [id])
+
+async def main() -> None:
+    """
+    Run both read modes and print latency and sent statements per update.
+    """
+
+    client = ClientPostgreSQL(params = postgres_cfg())
+    await client.create_pool()
+    await client.execute(query = "CREATE TABLE IF NOT EXISTS benchmark_users(id BIGINT PRIMARY KEY, access BOOLEAN NOT NULL, state TEXT);")
+    await client.upsert_item(table = "benchmark_users", item = {"id": 1, "access": True, "state": "cards_5"}, conflict_columns = ["id"])
+    query = "SELECT access, state FROM benchmark_users WHERE id = $1"
+
+    try:
+        for name, read in [("transaction", read_in_transaction), ("autocommit", read_in_autocommit)]:
+            CountingConnection.statements = 0
+            start = perf_counter()
+            for _ in range(updates):
+                for _ in range(reads_per_update):
+                    await read(client, query, 1)
+            elapsed = (perf_counter() - start) / updates
+            print(f"{name:>12}: {elapsed * 1000:.3f} ms/update, {CountingConnection.statements / updates:.1f} statements/update")
+    finally:
+        await client.execute(query = "DROP TABLE IF EXISTS benchmark_users;")
+        await client.close_pool()
+
+if __name__ == '__main__':
+    asyncio.run(main())
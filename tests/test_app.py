@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing the startup of Telegram-bot
+"""
+
+import os
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from . import environ
+from postgresql import ClientPostgreSQL
+from postgresql import MigrationRunner
+
+with patch.dict(os.environ, environ):
+    from app import start_bd
+
+class TestStartBD(unittest.IsolatedAsyncioTestCase):
+    """
+    Class for testing the start of the database
+
+    :ivar mock_db: Async mock PostgreSQL data base
+    :type mock_db: AsyncMock
+    """
+
+    async def asyncSetUp(self) -> None:
+        """
+        Called at the beginning of each function for testing
+        """
+        self.mock_db = AsyncMock()
+
+    async def test_failed_migrations(self) -> None:
+        """
+        Check startup is aborted before subscribing when a migration failed
+        """
+        with patch.object(MigrationRunner, "run", AsyncMock(return_value = None)):
+            with self.assertRaises(ClientPostgreSQL.Error):
+                await start_bd(bd_var = self.mock_db)
+        self.mock_db.listen.assert_not_awaited()
+
+    async def test_applied_migrations(self) -> None:
+        """
+        Check the subscription starts after the migrations
+        """
+        with patch.object(MigrationRunner, "run", AsyncMock(return_value = [])), patch("app.users_writes", None):
+            await start_bd(bd_var = self.mock_db)
+        self.mock_db.listen.assert_awaited_once()
+
+if __name__ == '__main__':
+    unittest.main()
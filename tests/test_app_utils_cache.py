@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing the in-process cache
+"""
+
+import unittest
+from unittest.mock import patch
+
+from app.utils.cache import TTLCache
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Class for testing the TTL/LRU cache
+
+    :ivar cache: Cache for 2 entries
+    :type cache: TTLCache
+    """
+
+    def setUp(self) -> None:
+        """
+        Called at the beginning of each function for testing
+        """
+        self.cache = TTLCache(max_size = 2, ttl = 10)
+
+    def test_get(self) -> None:
+        """
+        Check stored values are found and counted as hits
+        """
+        self.assertIsNone(self.cache.get(1))
+        self.assertTrue(self.cache.put(1, "a"))
+        self.assertEqual(self.cache.get(1), "a")
+        self.assertEqual(self.cache.to_dict()["hits"], 1)
+        self.assertEqual(self.cache.to_dict()["misses"], 1)
+        self.assertEqual(self.cache.to_dict()["hit_rate"], 0.5)
+
+    def test_ttl(self) -> None:
+        """
+        Check expired values are treated as missing
+        """
+        with patch("app.utils.cache.monotonic", return_value = 100.0):
+            self.cache.put(1, "a")
+        with patch("app.utils.cache.monotonic", return_value = 109.0):
+            self.assertEqual(self.cache.get(1), "a")
+        with patch("app.utils.cache.monotonic", return_value = 110.0):
+            self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.to_dict()["size"], 0)
+
+    def test_lru(self) -> None:
+        """
+        Check the least recently used value is evicted
+        """
+        self.cache.put(1, "a")
+        self.cache.put(2, "b")
+        self.cache.get(1)
+        self.cache.put(3, "c")
+        self.assertEqual(self.cache.get(1), "a")
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.to_dict()["evictions"], 1)
+
+    def test_invalidate(self) -> None:
+        """
+        Check a value read before an invalidation is not stored
+        """
+        self.cache.put(1, "a")
+        generation = self.cache.get_generation()
+        self.cache.invalidate(1)
+        self.assertIsNone(self.cache.get(1))
+        self.assertFalse(self.cache.put(1, "old", generation))
+        self.assertTrue(self.cache.put(2, "b", generation))
+        self.assertTrue(self.cache.put(1, "new", self.cache.get_generation()))
+        self.assertEqual(self.cache.get(1), "new")
+
+    def test_clear(self) -> None:
+        """
+        Check clear removes values and refuses values read before
+        """
+        self.cache.put(1, "a")
+        generation = self.cache.get_generation()
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(1))
+        self.assertFalse(self.cache.put(2, "b", generation))
+
+if __name__ == '__main__':
+    unittest.main()
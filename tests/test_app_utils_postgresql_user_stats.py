@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing app/utils/postgresql/user_stats.py
+"""
+
+import unittest
+from unittest.mock import AsyncMock
+
+from app.utils.postgresql.user_stats import get_user_stats
+from app.utils.postgresql.user_stats import get_users_stats
+from app.utils.postgresql.user_stats import get_spread_histogram
+from app.utils.templates.user_stats import UserStatsRow
+
+class TestUserStatsFunctions(unittest.IsolatedAsyncioTestCase):
+    """
+    Class for testing auxiliary table user_stats's functions
+
+    :ivar mock_db: Async mock PostgreSQL data base
+    :type mock_db: AsyncMock
+    :ivar stats_data: Example user's stats
+    :type stats_data: Dict[str, Any]
+    """
+
+    async def asyncSetUp(self) -> None:
+        """
+        Called at the beginning of each function for testing
+        """
+        self.mock_db = AsyncMock()
+        self.stats_data = {"user_id": 1, "requests": 3, "last_request_id": 42, "last_request_at": None, "spread_sizes": '{"5": 2, "3": 1}'}
+
+    async def test_get_user_stats(self) -> None:
+        """
+        Check the stats of a user are read as one row by user_id
+        """
+        self.mock_db.get_items.return_value = [self.stats_data]
+        result = await get_user_stats(self.mock_db, 1)
+        self.assertEqual(result, self.stats_data)
+        self.assertEqual(self.mock_db.get_items.await_args.kwargs["by_values"], {"user_id": 1})
+        self.assertIs(self.mock_db.get_items.await_args.kwargs["record_class"], UserStatsRow)
+
+        self.mock_db.get_items.return_value = []
+        self.assertIsNone(await get_user_stats(self.mock_db, 2))
+
+    async def test_get_users_stats(self) -> None:
+        """
+        Check the stats of many users are read with one query
+        """
+        self.mock_db.get_items_many.return_value = {1: self.stats_data}
+        result = await get_users_stats(self.mock_db, [1, 2])
+        self.assertEqual(result, {1: self.stats_data})
+        self.assertEqual(self.mock_db.get_items_many.await_args.kwargs["by_column"], "user_id")
+
+    async def test_get_spread_histogram(self) -> None:
+        """
+        Check the histogram of spread sizes is parsed from the stats row
+        """
+        self.assertEqual(get_spread_histogram(self.stats_data), {3: 1, 5: 2})
+        self.assertEqual(get_spread_histogram(None), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,8 +7,14 @@ Testing app/utils/postgresql/users.py
 import unittest
 import asyncio
 from unittest.mock import AsyncMock
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from postgresql import ClientPostgreSQL
 
 from app.utils.postgresql.users import get_user_by_id
+from app.utils.postgresql.users import get_users_by_ids
+from app.utils.postgresql.users import load_user_context
 from app.utils.postgresql.users import set_user
 from app.utils.postgresql.users import isAccess
 from app.utils.postgresql.users import isAdmin
@@ -16,6 +22,13 @@ from app.utils.postgresql.users import update_user
 from app.utils.postgresql.users import get_state
 from app.utils.postgresql.users import isState
 from app.utils.postgresql.users import inState
+from app.utils.postgresql.users import update_state
+from app.utils.postgresql.users import cache
+from app.utils.postgresql.users import on_user_changed
+from app.utils.postgresql.users import setup_write_behind
+from app.utils.postgresql.users import get_spread_size
+from app.utils.templates.users import parse_state
+from app.utils.postgresql import users
 
 class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
     """
@@ -33,6 +46,12 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         """
         # Настройка моковой базы данных
         self.mock_db = AsyncMock()
+        self.mock_db.get_unit_of_work = Mock(return_value = None)
+        cache.clear()
+        # Отложенная запись выключена, кроме тестов буфера
+        writes = patch.object(users, "writes", None)
+        writes.start()
+        self.addCleanup(writes.stop)
         # Настройка примеров пользователей
         self.user_data = {"id": 1, "name": "Test User", "access": True, "admin": True, "state": "active_1337"}
 
@@ -45,14 +64,68 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         result = await get_user_by_id(self.mock_db, 1)
         self.assertEqual(result, self.user_data)
 
+    async def test_get_users_by_ids(self) -> None:
+        """
+        Check find many user's rows by ids
+        """
+        self.mock_db.get_items_many.return_value = {1: self.user_data}
+        result = await get_users_by_ids(self.mock_db, [1, 2])
+        self.assertEqual(result, {1: self.user_data})
+        self.assertEqual(self.mock_db.get_items_many.await_args.kwargs["values"], [1, 2])
+        self.assertFalse(self.mock_db.get_items_many.await_args.kwargs["readonly"])
+
+    async def test_get_users_by_ids_cache(self) -> None:
+        """
+        Check cached rows are served without a query, only the missing ones are read and cached
+        """
+        cache.put(1, self.user_data, cache.get_generation())
+        other = dict(self.user_data, id = 2)
+        self.mock_db.get_items_many.return_value = {2: other}
+        result = await get_users_by_ids(self.mock_db, [1, 2, 2])
+        self.assertEqual(result, {1: self.user_data, 2: other})
+        self.assertEqual(self.mock_db.get_items_many.await_args.kwargs["values"], [2])
+        self.assertEqual(cache.get(2), other)
+
+        self.assertEqual(await get_users_by_ids(self.mock_db, [1, 2]), {1: self.user_data, 2: other})
+        self.assertEqual(self.mock_db.get_items_many.await_count, 1)
+
+        self.mock_db.get_items_many.return_value = None
+        self.assertIsNone(await get_users_by_ids(self.mock_db, [3]))
+
+    async def test_get_users_by_ids_unit_of_work(self) -> None:
+        """
+        Check rows read inside a unit of work are not cached
+        """
+        self.mock_db.get_unit_of_work.return_value = Mock()
+        self.mock_db.get_items_many.return_value = {1: self.user_data}
+        self.assertEqual(await get_users_by_ids(self.mock_db, [1]), {1: self.user_data})
+        self.assertIsNone(cache.get(1))
+
+    async def test_load_user_context(self) -> None:
+        """
+        Check the user's context is loaded with one query
+        """
+        self.mock_db.get_items.return_value = [self.user_data]
+        result = await load_user_context(self.mock_db, 1)
+        self.assertEqual(result, self.user_data)
+        self.assertEqual(self.mock_db.get_items.await_count, 1)
+        for column in ("username", "access", "admin", "state"):
+            self.assertIn(column, self.mock_db.get_items.await_args.kwargs["columns"])
+        self.assertFalse(self.mock_db.get_items.await_args.kwargs["readonly"])
+
+        self.mock_db.get_items.return_value = []
+        self.assertIsNone(await load_user_context(self.mock_db, 2))
+
     async def test_set_user(self) -> None:
         """
         Check try add user's row
         """
         # Тестирование добавления нового пользователя
-        self.mock_db.append_item.return_value = None
+        self.mock_db.upsert_item.return_value = None
         result = await set_user(self.mock_db, self.user_data)
         self.assertIsNone(result)
+        self.mock_db.upsert_item.assert_awaited_once()
+        self.assertEqual(self.mock_db.upsert_item.await_args.kwargs["conflict_columns"], ["id"])
 
     async def test_isAccess(self) -> None:
         """
@@ -63,6 +136,14 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         result = await isAccess(self.mock_db, 1)
         self.assertTrue(result)
 
+    async def test_isAccess_unavailable(self) -> None:
+        """
+        Check unavailable database is not treated as denied access
+        """
+        self.mock_db.get_items.side_effect = ClientPostgreSQL.Unavailable("down")
+        with self.assertRaises(ClientPostgreSQL.Unavailable):
+            await isAccess(self.mock_db, 1)
+
     async def test_isAdmin(self) -> None:
         """
         Check user's admin status
@@ -106,5 +187,102 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         result = await inState(self.mock_db, 1, "active_\d+")
         self.assertTrue(result)
 
+    async def test_cache(self) -> None:
+        """
+        Check a user's row is read from the database once and then from the cache
+        """
+        self.mock_db.get_items.return_value = [self.user_data]
+        self.assertEqual(await get_user_by_id(self.mock_db, 1), self.user_data)
+        self.assertTrue(await isAccess(self.mock_db, 1))
+        self.assertTrue(await isAdmin(self.mock_db, 1))
+        self.assertEqual(await get_state(self.mock_db, 1), "active_1337")
+        self.assertEqual(self.mock_db.get_items.await_count, 1)
+
+    async def test_cache_write_through(self) -> None:
+        """
+        Check an updated row is written through to the cache
+        """
+        self.mock_db.get_items.return_value = [self.user_data]
+        await get_user_by_id(self.mock_db, 1)
+        updated = dict(self.user_data, state = "main")
+        self.mock_db.update_item.return_value = [updated]
+        await update_state(self.mock_db, 1, "main")
+        self.assertEqual(await get_state(self.mock_db, 1), "main")
+        self.assertEqual(self.mock_db.get_items.await_count, 1)
+
+        self.mock_db.update_item.return_value = None
+        await update_state(self.mock_db, 1, "main")
+        await get_state(self.mock_db, 1)
+        self.assertEqual(self.mock_db.get_items.await_count, 2)
+
+    async def test_cache_unit_of_work(self) -> None:
+        """
+        Check rows written in a unit of work get to the cache only after the commit
+        """
+        unit_of_work = Mock()
+        self.mock_db.get_unit_of_work.return_value = unit_of_work
+        self.mock_db.upsert_item.return_value = [self.user_data]
+        await set_user(self.mock_db, self.user_data)
+        self.assertIsNone(cache.get(1))
+
+        unit_of_work.after_commit.call_args.args[0]()
+        self.assertEqual(cache.get(1), self.user_data)
+
+    async def test_on_user_changed(self) -> None:
+        """
+        Check notifications of other processes invalidate cached rows
+        """
+        cache.put(1, self.user_data)
+        cache.put(2, self.user_data)
+        on_user_changed("1")
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(2), self.user_data)
+        on_user_changed(None)
+        self.assertIsNone(cache.get(2))
+
+    async def test_write_behind(self) -> None:
+        """
+        Check updates of a user are merged, visible at once and written in one batch
+        """
+        self.mock_db.get_items.return_value = [self.user_data]
+        self.mock_db.update_items.return_value = [dict(self.user_data, username = "new", state = "cards", state_param = 3)]
+        writes = setup_write_behind(self.mock_db, 10)
+        await update_user(self.mock_db, {"username": "new"}, 1)
+        await update_state(self.mock_db, 1, "cards", 7)
+        await update_state(self.mock_db, 1, "cards", 3)
+        self.mock_db.update_item.assert_not_awaited()
+        self.assertEqual(get_spread_size(await load_user_context(self.mock_db, 1)), 3)
+        self.assertEqual((await load_user_context(self.mock_db, 1)).username, "new")
+        self.assertEqual((await get_users_by_ids(self.mock_db, [1]))[1].username, "new")
+
+        self.assertEqual(await writes.stop(), 1)
+        self.mock_db.update_items.assert_awaited_once()
+        self.assertEqual(self.mock_db.update_items.await_args.kwargs["items"], [{"id": 1, "state": "cards", "state_param": 3, "username": "new"}])
+        self.assertEqual(self.mock_db.update_items.await_args.kwargs["types"]["state_param"], "integer")
+        self.assertEqual(writes.to_dict()["merged"], 2)
+        self.assertEqual(cache.get(1)["state_param"], 3)
+
+        await update_user(self.mock_db, {"access": False}, 1)
+        self.mock_db.update_item.assert_awaited_once()
+
+    async def test_update_state(self) -> None:
+        """
+        Check the state is written as a kind and an integer parameter
+        """
+        self.mock_db.update_item.return_value = []
+        await update_state(self.mock_db, 1, *parse_state("cards_7"))
+        self.assertEqual(self.mock_db.update_item.await_args.kwargs["update_values"], {"state": "cards", "state_param": 7})
+
+    async def test_get_spread_size(self) -> None:
+        """
+        Check the spread size is read from the user's row without queries
+        """
+        self.assertEqual(get_spread_size(dict(self.user_data, state = "cards", state_param = 3)), 3)
+        self.assertEqual(get_spread_size(dict(self.user_data, state = "main", state_param = None)), 5)
+        self.assertEqual(get_spread_size(None), 5)
+        self.assertEqual(parse_state("cards_8"), ("cards", 8))
+        self.assertEqual(parse_state("main"), ("main", None))
+        self.assertEqual(parse_state("cards_x"), ("cards_x", None))
+
 if __name__ == '__main__':
     unittest.main()
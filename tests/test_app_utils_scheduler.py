@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing the queue of OpenAI requests
+"""
+
+import asyncio
+import unittest
+
+from app.utils.scheduler import LLMScheduler
+from app.utils.scheduler import priority_admin
+from app.utils.scheduler import priority_returning
+from app.utils.scheduler import priority_new
+
+class TestLLMScheduler(unittest.IsolatedAsyncioTestCase):
+    """
+    Class for testing the bounded priority queue
+
+    :ivar scheduler: Scheduler with one slot and a queue of 3
+    :type scheduler: LLMScheduler
+    """
+
+    async def asyncSetUp(self) -> None:
+        """
+        Called at the beginning of each function for testing
+        """
+        self.scheduler = LLMScheduler(concurrency = 1, max_queue = 3, notify_depth = 2)
+
+    async def test_priority(self) -> None:
+        """
+        Check waiting readings get the slot by priority and then by arrival
+        """
+        order = []
+        positions = {}
+
+        async def reading(name: str, priority: int) -> None:
+            async def on_queued(position: int) -> None:
+                positions[name] = position
+            async with self.scheduler.slot(priority = priority, on_queued = on_queued):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await self.scheduler.acquire()
+        self.assertTrue(self.scheduler.is_busy())
+        tasks = [asyncio.ensure_future(reading(name, priority)) for name, priority in (("returning", priority_returning), ("new", priority_new), ("admin", priority_admin))]
+        await asyncio.sleep(0)
+        self.assertEqual(self.scheduler.to_dict()["depth"], 3)
+        self.assertEqual(positions, {"new": 2})
+        self.scheduler.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(order, ["admin", "returning", "new"])
+        stats = self.scheduler.to_dict()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["started"], 4)
+        self.assertEqual(stats["queued"], 3)
+        self.assertEqual(stats["max_depth"], 3)
+
+    async def test_full(self) -> None:
+        """
+        Check readings are rejected when the queue is full
+        """
+        await self.scheduler.acquire()
+        tasks = [asyncio.ensure_future(self.scheduler.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        with self.assertRaises(LLMScheduler.Full):
+            await self.scheduler.acquire(priority = priority_admin)
+        self.assertEqual(self.scheduler.to_dict()["rejected"], 1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+
+    async def test_cancel(self) -> None:
+        """
+        Check a cancelled reading leaves the queue and doesn't keep the slot
+        """
+        await self.scheduler.acquire()
+        task = asyncio.ensure_future(self.scheduler.acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions = True)
+        self.assertEqual(self.scheduler.to_dict()["depth"], 0)
+        self.assertEqual(self.scheduler.to_dict()["cancelled"], 1)
+
+        self.scheduler.release()
+        self.assertFalse(self.scheduler.is_busy())
+        await asyncio.wait_for(self.scheduler.acquire(), 1)
+        self.assertEqual(self.scheduler.running, 1)
+
+    async def test_weight(self) -> None:
+        """
+        Check a speculative reading takes two slots and the first waiting reading isn't passed by lighter ones
+        """
+        scheduler = LLMScheduler(concurrency = 2, max_queue = 3)
+        await scheduler.acquire()
+        self.assertTrue(scheduler.is_busy(weight = 2))
+        self.assertFalse(scheduler.is_busy())
+
+        heavy = asyncio.ensure_future(scheduler.acquire(weight = 2))
+        await asyncio.sleep(0)
+        light = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.to_dict()["depth"], 2)
+
+        scheduler.release()
+        await asyncio.wait_for(heavy, 1)
+        self.assertFalse(light.done())
+        self.assertEqual(scheduler.running, 2)
+
+        scheduler.release(weight = 2)
+        await asyncio.wait_for(light, 1)
+        self.assertEqual(scheduler.running, 1)
+
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire(weight = 5), 1)
+        self.assertEqual(scheduler.running, 2)
+        scheduler.release(weight = 5)
+        self.assertEqual(scheduler.running, 0)
+
+if __name__ == '__main__':
+    unittest.main()
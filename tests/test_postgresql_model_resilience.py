@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing postgresql/model/resilience.py and ClientPostgreSQL.retry
+"""
+
+import unittest
+import asyncpg
+
+from postgresql import ClientPostgreSQL
+from postgresql.model import resilience
+from postgresql.model.resilience import CircuitBreaker
+from postgresql.model.resilience import classify_error
+from postgresql.model.resilience import get_backoff
+
+class TestResilience(unittest.IsolatedAsyncioTestCase):
+    """
+    Class for testing retries and circuit breaker of ClientPostgreSQL
+    """
+
+    def setUp(self) -> None:
+        """
+        Called at the beginning of each function for testing, removes retry delays
+        """
+        self.backoff_base = resilience.backoff_base
+        resilience.backoff_base = 0
+
+    def tearDown(self) -> None:
+        """
+        Called at the end of each function for testing, restores retry delays
+        """
+        resilience.backoff_base = self.backoff_base
+
+    def test_classify_error(self) -> None:
+        """
+        Check kinds of transient errors
+        """
+        self.assertEqual(classify_error(asyncpg.SerializationError()), "serialization")
+        self.assertEqual(classify_error(asyncpg.DeadlockDetectedError()), "serialization")
+        self.assertEqual(classify_error(ConnectionResetError()), "connection")
+        self.assertEqual(classify_error(asyncpg.ConnectionDoesNotExistError()), "connection")
+        self.assertIsNone(classify_error(asyncpg.UndefinedColumnError()))
+
+    def test_get_backoff(self) -> None:
+        """
+        Check retry delays grow and are capped
+        """
+        resilience.backoff_base = self.backoff_base
+        for attempt in range(10):
+            self.assertLessEqual(get_backoff(attempt), min(resilience.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def test_circuit_breaker(self) -> None:
+        """
+        Check breaker opens after failures in a row and closes after a successful trial
+        """
+        breaker = CircuitBreaker(threshold = 2, reset_timeout = 60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        breaker.reset_timeout = 0
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.to_dict()["rejected"], 2)
+
+    async def test_retry_serialization(self) -> None:
+        """
+        Check a serialization failure is repeated
+        """
+        client = ClientPostgreSQL({})
+        errors = [asyncpg.SerializationError()]
+
+        async def operation() -> str:
+            if errors:
+                raise errors.pop()
+            return "UPDATE 1"
+
+        result = await client.retry(operation = operation, name = "UPDATE", idempotent = lambda: False)
+        self.assertEqual(result, "UPDATE 1")
+        self.assertEqual(client.get_stats()["retries"], {"serialization": 1})
+
+    async def test_retry_connection(self) -> None:
+        """
+        Check a lost connection is not repeated for a sent write and opens the breaker when it persists
+        """
+        client = ClientPostgreSQL({"retry_attempts": "2", "breaker_threshold": "3"})
+
+        async def operation() -> str:
+            raise ConnectionResetError("reset")
+
+        with self.assertRaises(ClientPostgreSQL.Unavailable):
+            await client.retry(operation = operation, name = "INSERT", idempotent = lambda: False)
+        self.assertEqual(client.breaker.failures, 1)
+        with self.assertRaises(ClientPostgreSQL.Unavailable):
+            await client.retry(operation = operation, name = "SELECT", idempotent = lambda: True)
+        self.assertEqual(client.get_stats()["retries"], {"connection": 1})
+        self.assertEqual(client.breaker.state, "open")
+        with self.assertRaises(ClientPostgreSQL.Unavailable):
+            await client.retry(operation = operation, name = "SELECT", idempotent = lambda: True)
+        self.assertEqual(client.breaker.failures, 3)
+
+if __name__ == '__main__':
+    unittest.main()
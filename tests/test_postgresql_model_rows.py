@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing postgresql/model/rows.py
+"""
+
+import unittest
+
+from postgresql.model.rows import Row
+from postgresql.model.rows import row_class
+from postgresql.model.rows import get_column_names
+from postgresql.model.rows import get_column_types
+from postgresql.model.rows import RowOverlay
+from app.utils.templates.users import table_users
+from app.utils.templates.users import UserRow
+
+class TestRows(unittest.TestCase):
+    """
+    Class for testing row classes generated from table templates
+    """
+
+    def test_get_column_names(self) -> None:
+        """
+        Check names are taken from column definitions, constraints are skipped
+        """
+        result = get_column_names(["id serial PRIMARY KEY", "data TEXT", "PRIMARY KEY (id)"])
+        self.assertEqual(result, ["id", "data"])
+
+    def test_row_class(self) -> None:
+        """
+        Check generated class of a table template
+        """
+        self.assertTrue(issubclass(UserRow, Row))
+        self.assertEqual(UserRow.__name__, "UsersRow")
+        self.assertEqual(UserRow.table, "users")
+        self.assertEqual(UserRow.columns, ("id", "username", "access", "admin", "state", "state_param"))
+        self.assertEqual(UserRow.__slots__, ())
+        self.assertIsInstance(UserRow.access, property)
+        self.assertEqual(row_class(**table_users()).columns, UserRow.columns)
+
+    def test_get_column_types(self) -> None:
+        """
+        Check types are taken from column definitions, serial types are given as integer types
+        """
+        result = get_column_types(["id serial PRIMARY KEY", "user_id BIGINT NOT NULL", "data TEXT", "PRIMARY KEY (id)"])
+        self.assertEqual(result, {"id": "integer", "user_id": "bigint", "data": "text"})
+
+    def test_row_overlay(self) -> None:
+        """
+        Check pending values hide the values of the row
+        """
+        row = {"id": 1, "state": "main", "access": True}
+        result = RowOverlay(row = row, values = {"state": "cards_3"})
+        self.assertEqual(result["state"], "cards_3")
+        self.assertEqual(result.get("access"), True)
+        self.assertEqual(result.get("missing", 0), 0)
+        self.assertEqual(result.values["state"], "cards_3")
+        self.assertEqual(result.to_dict(), {"id": 1, "state": "cards_3", "access": True})
+        self.assertEqual(result, {"id": 1, "state": "cards_3", "access": True})
+
+if __name__ == '__main__':
+    unittest.main()
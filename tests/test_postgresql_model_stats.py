@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing postgresql/model/stats.py
+"""
+
+import unittest
+
+from postgresql.model.stats import Histogram
+from postgresql.model.stats import ClientStats
+
+class TestStats(unittest.TestCase):
+    """
+    Class for testing histograms and counters of ClientPostgreSQL
+    """
+
+    def test_histogram(self) -> None:
+        """
+        Check values are counted in their buckets
+        """
+        histogram = Histogram([1, 10])
+        for value in [0.5, 1, 5, 50]:
+            histogram.observe(value)
+        result = histogram.to_dict()
+        self.assertEqual(result["buckets"], {"le_1": 2, "le_10": 1, "le_inf": 1})
+        self.assertEqual(result["count"], 4)
+        self.assertEqual(result["max"], 50)
+        self.assertEqual(result["avg"], 56.5 / 4)
+
+    def test_client_stats(self) -> None:
+        """
+        Check query and error counters
+        """
+        stats = ClientStats()
+        stats.observe_acquire(0.002)
+        stats.observe_query("SELECT 1", 0.01, 1)
+        stats.observe_error(ValueError("error"), "SELECT 1")
+        result = stats.to_dict()
+        self.assertEqual(result["acquire_wait"]["count"], 1)
+        self.assertEqual(result["queries"]["SELECT 1"]["latency"]["count"], 1)
+        self.assertEqual(result["queries"]["SELECT 1"]["errors"], 1)
+        self.assertEqual(result["errors"], {"ValueError": 1})
+
+if __name__ == '__main__':
+    unittest.main()
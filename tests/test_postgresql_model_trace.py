@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Testing the query log of ClientPostgreSQL
+"""
+
+import logging
+import unittest
+
+from pydantic import SecretStr
+
+from postgresql import ClientPostgreSQL
+from postgresql.model.client import QueryTrace
+
+class TestTrace(unittest.TestCase):
+    """
+    Class for testing slow query log and sampling of ClientPostgreSQL
+
+    :ivar logger: Logger of the client
+    :type logger: logging.Logger
+    """
+
+    def setUp(self) -> None:
+        """
+        Called at the beginning of each function for testing
+        """
+        self.logger = logging.getLogger("test_postgresql_trace")
+        self.logger.setLevel(logging.DEBUG)
+
+    def get_client(self, slow_query_seconds: str, sample_rate: str) -> ClientPostgreSQL:
+        """
+        Returns a client with the given query log settings.
+
+        :param slow_query_seconds: Slow query threshold.
+        :type slow_query_seconds: str
+        :param sample_rate: Share of logged queries.
+        :type sample_rate: str
+        :return: Client without pool.
+        :rtype: ClientPostgreSQL
+        """
+        trace_params = {
+            "slow_query_seconds": SecretStr(slow_query_seconds),
+            "sample_rate": SecretStr(sample_rate),
+            "max_payload": SecretStr("20")
+        }
+        return ClientPostgreSQL({}, self.logger, trace_params)
+
+    def test_slow_query(self) -> None:
+        """
+        Check a slow query is logged as a warning even without sampling
+        """
+        client = self.get_client("0.1", "0")
+        with self.assertLogs(self.logger, logging.DEBUG) as logs:
+            client.trace(0.2, query = "SELECT 1", args = [], result = None)
+            client.trace(0.01, query = "SELECT 2", args = [], result = None)
+            self.logger.debug("end")
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(logs.records[0].levelno, logging.WARNING)
+        self.assertIn("Slow query (200.0 ms)", logs.records[0].getMessage())
+
+    def test_sample_rate(self) -> None:
+        """
+        Check queries are logged at DEBUG level only if sampled
+        """
+        client = self.get_client("0", "1")
+        with self.assertLogs(self.logger, logging.DEBUG) as logs:
+            client.trace(5.0, query = "SELECT 1", args = [1], result = [{"id": 1}])
+        self.assertEqual(logs.records[0].levelno, logging.DEBUG)
+        self.assertEqual(logs.records[0].getMessage(), "[+] <query>: SELECT 1, <args>: [1], <result>: [{'id': 1}]")
+
+    def test_truncate(self) -> None:
+        """
+        Check long payloads are shortened
+        """
+        result = QueryTrace.truncate(value = ["a" * 100] * 100, max_payload = 20)
+        self.assertTrue(result.startswith("['aaaaaaa..."))
+        self.assertTrue(result.endswith("... (+117 chars)"))
+        self.assertEqual(QueryTrace.truncate(value = "SELECT 1", max_payload = 20), "SELECT 1")
+
+if __name__ == '__main__':
+    unittest.main()